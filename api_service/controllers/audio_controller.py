@@ -8,14 +8,14 @@ import uuid
 from common.database import get_db
 from common.redis_client import RedisClient
 from common.rabbitmq_client import RabbitMQClient
+from common.config import settings
 from common.logger import get_logger
 from common.file_upload import FileUploadManager
 
 router = APIRouter(prefix="/audio", tags=["audio"])
 logger = get_logger()
-mq_client = RabbitMQClient()
 
-base_path = '/home/featurize/clonevoice/uploads'
+base_path = settings.services.upload_base_path
 
 @router.post("/upload")
 async def upload_audio(file: UploadFile = File(...)):
@@ -50,7 +50,7 @@ async def clone_audio(background_tasks: BackgroundTasks, db: Session = Depends(g
         redis_client.set(f"task:{task_id}", json.dumps(task_data))
         
         # 发送任务到音频服务
-        mq_client.publish(
+        RabbitMQClient.shared().publish(
             exchange="ai_service",
             routing_key="audio",
             message=json.dumps(task_data)
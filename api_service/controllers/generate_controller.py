@@ -1,26 +1,74 @@
+import asyncio
+import os
 import time
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
 import uuid
 import json
-from typing import List, Optional
+from typing import List, Optional, Literal
 from common.redis_client import RedisClient
 from common.rabbitmq_client import RabbitMQClient
+from common.config import settings
 from common.logger import get_logger
+from common.result_cache import result_cache
+from common.metrics import TASKS_TOTAL
+from common.tracing import tracer
+from common.cancellation import cancellation
+from common.tunables import tunables
+from api_service.services.admission import admission_controller, AdmissionRejected
 
 router = APIRouter(prefix="/generate", tags=["generate"])
 logger = get_logger()
 
+base_path = settings.services.upload_base_path
+
+# Share of the pipeline a task has completed at each status, used for batch progress
+STATUS_PROGRESS = {"0": 0.0, "1": 0.25, "2": 0.5, "3": 0.75, "4": 1.0, "failed": 1.0, "cancelled": 1.0}
+FINAL_STATUSES = {"4", "failed", "cancelled"}
+
 class GenerationRequest(BaseModel):
     text: str
     video_path: str
     audio_path: str
+    preview: bool = False  # 先渲染低步数、低分辨率的预览草稿
+    full_render: Literal["auto", "confirm"] = "auto"  # 预览后自动完整渲染，或等待用户确认
+    use_cache: bool = True  # 相同请求直接复用已有结果
+
+class BatchGenerationRequest(BaseModel):
+    texts: List[str] = Field(..., min_length=1)
+    video_path: str
+    audio_path: str
+    preview: bool = False
+    full_render: Literal["auto", "confirm"] = "auto"
+    use_cache: bool = True
+
+def admit_or_reject(items: int = 1) -> dict:
+    """Admission check before queueing; 429 with Retry-After once the backlog or ETA limit would be exceeded"""
+    try:
+        return admission_controller.admit(items)
+    except AdmissionRejected as e:
+        logger.warning(f"Admission rejected: {e.reason}, retry after {e.retry_after}s")
+        TASKS_TOTAL.labels(service="api", outcome="rejected").inc()
+        raise HTTPException(
+            status_code=429,
+            detail={"reason": e.reason, "retry_after": e.retry_after, **e.estimate},
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+async def make_result_key(text: str, audio_path: str, video_path: str) -> str:
+    """Result cache key for a request; inputs that do not exist are a client error, not a 500"""
+    try:
+        return await run_in_threadpool(result_cache.make_key, text, audio_path, video_path)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=400, detail=f"Input file not found: {e.filename}")
 
 @router.post("/task")
 async def create_generation_task(request: GenerationRequest):
     try:
         # Generate unique task ID
         task_id = str(uuid.uuid4())
+        trace_id = tracer.start_trace(task_id)
         
         # Create task data
         task_data = {
@@ -29,33 +77,246 @@ async def create_generation_task(request: GenerationRequest):
             "text": request.text,
             "video_path": request.video_path,
             "audio_path": request.audio_path,
+            "trace_id": trace_id,
+            "preview": request.preview,
+            "full_render": request.full_render,
             "create_time": int(time.time()),
         }
         
         # Store in Redis
         redis_client = RedisClient()
+
+        # Identical requests complete instantly from the result cache
+        if request.use_cache and result_cache.enabled:
+            result_key = await make_result_key(request.text, request.audio_path, request.video_path)
+            task_data["result_key"] = result_key
+            cached = result_cache.lookup(result_key)
+            if cached:
+                task_data.update({
+                    "status": "4",
+                    "audio_output_path": cached["audio_output_path"],
+                    "video_output_path": cached["video_output_path"],
+                    "cached_from": cached["task_id"],
+                    "end_time": int(time.time()),
+                })
+                redis_client.set(f"task:{task_id}", json.dumps(task_data))
+                logger.info(f"Result cache hit: {task_id} -> {cached['task_id']}")
+                TASKS_TOTAL.labels(service="api", outcome="cached").inc()
+                return {
+                    "task_id": task_id,
+                    "status": "4",
+                    "cached": True,
+                    "video_output_path": cached["video_output_path"],
+                }
+
+        estimate = admit_or_reject()
+        task_data["estimated_completion"] = estimate["estimated_completion"]
         redis_client.set(f"task:{task_id}", json.dumps(task_data))
         
         # Send to RabbitMQ
-        rabbitmq_client = RabbitMQClient()
-
-        rabbitmq_client.declare_exchange("ai_service")
-        rabbitmq_client.declare_queue("audio_tasks")
-        rabbitmq_client.bind_queue("audio_tasks", "ai_service", "audio_tasks")
-
-        rabbitmq_client.publish(
-            "ai_service",
-            "audio_tasks",
-            json.dumps(task_data)
-        )
+        with tracer.span("api.submit"):
+            # 交换机和队列绑定在服务启动时声明，复用共享连接
+            RabbitMQClient.shared().publish(
+                "ai_service",
+                "audio_tasks",
+                json.dumps(task_data)
+            )
         
         logger.info(f"Created generation task: {task_id}")
-        return {"task_id": task_id, "status": "0"}# status 0 start, 1 audio start 2 video start 3 finish
-        
+        # status 0 start, 1 audio start 2 video start 3 finish
+        return {"task_id": task_id, "status": "0", "eta_seconds": estimate["eta_seconds"],
+                "estimated_completion": estimate["estimated_completion"]}
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating generation task: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/batch")
+async def create_generation_batch(request: BatchGenerationRequest):
+    """Many texts for one voice/video pair, published as one message per item tagged with batch_id
+
+    Items spread across audio replicas like single tasks; each replica conditions the voice once
+    per reference and video workers reuse the avatar preprocessing.
+    """
+    batch_max_items = tunables.get("batch_max_items")
+    if len(request.texts) > batch_max_items:
+        raise HTTPException(status_code=400, detail=f"A batch holds at most {batch_max_items} texts")
+
+    try:
+        batch_id = str(uuid.uuid4())
+        create_time = int(time.time())
+        records = {}
+        pending = []
+        items = []
+
+        for index, text in enumerate(request.texts):
+            task_id = str(uuid.uuid4())
+            task_data = {
+                "task_id": task_id,
+                "status": "0",
+                "text": text,
+                "video_path": request.video_path,
+                "audio_path": request.audio_path,
+                "trace_id": tracer.start_trace(task_id),
+                "preview": request.preview,
+                "full_render": request.full_render,
+                "create_time": create_time,
+                "batch_id": batch_id,
+                "batch_index": index,
+            }
+
+            if request.use_cache and result_cache.enabled:
+                result_key = await make_result_key(text, request.audio_path, request.video_path)
+                task_data["result_key"] = result_key
+                cached = result_cache.lookup(result_key)
+                if cached:
+                    task_data.update({
+                        "status": "4",
+                        "audio_output_path": cached["audio_output_path"],
+                        "video_output_path": cached["video_output_path"],
+                        "cached_from": cached["task_id"],
+                        "end_time": create_time,
+                    })
+                    TASKS_TOTAL.labels(service="api", outcome="cached").inc()
+
+            records[f"task:{task_id}"] = json.dumps(task_data)
+            items.append({"task_id": task_id, "status": task_data["status"]})
+            if task_data["status"] == "0":
+                pending.append(task_data)
+
+        estimate = admit_or_reject(len(pending)) if pending else None
+        for task_data in pending:
+            task_data["estimated_completion"] = estimate["estimated_completion"]
+            records[f"task:{task_data['task_id']}"] = json.dumps(task_data)
+
+        records[f"batch:{batch_id}"] = json.dumps({
+            "batch_id": batch_id,
+            "task_ids": [item["task_id"] for item in items],
+            "video_path": request.video_path,
+            "audio_path": request.audio_path,
+            "create_time": create_time,
+        })
+        redis_client = RedisClient()
+        if not redis_client.set_many(records):
+            raise Exception("Failed to store batch tasks")
+
+        if pending:
+            mq_client = RabbitMQClient.shared()
+
+            def publish_items():
+                # Each item is published inside its own trace, on the pika thread in one hop
+                for task_data in pending:
+                    with tracer.task_context(task_data), tracer.span("api.submit", batch_id=batch_id):
+                        mq_client.publish("ai_service", "audio_tasks", json.dumps(task_data))
+
+            await asyncio.wrap_future(mq_client.submit(publish_items))
+
+        logger.info(f"Created generation batch: {batch_id} ({len(pending)} queued, "
+                    f"{len(items) - len(pending)} cached)")
+        return {
+            "batch_id": batch_id,
+            "total": len(items),
+            "queued": len(pending),
+            "eta_seconds": estimate["eta_seconds"] if estimate else 0,
+            "estimated_completion": estimate["estimated_completion"] if estimate else create_time,
+            "items": items,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creating generation batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/batch/{batch_id}")
+async def get_batch_status(batch_id: str):
+    """Per-item status and aggregate progress of a batch"""
+    redis_client = RedisClient()
+    batch_data = redis_client.get(f"batch:{batch_id}")
+    if not batch_data:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    batch = json.loads(batch_data)
+    task_ids = batch["task_ids"]
+    values = redis_client.get_many([f"task:{task_id}" for task_id in task_ids])
+
+    items = []
+    for task_id, value in zip(task_ids, values):
+        task = json.loads(value) if value else {}
+        items.append({
+            "task_id": task_id,
+            "batch_index": task.get("batch_index"),
+            "status": task.get("status", "missing"),
+            "audio_output_path": task.get("audio_output_path"),
+            "video_output_path": task.get("video_output_path"),
+            "error": task.get("error"),
+        })
+
+    completed = sum(1 for item in items if item["status"] == "4")
+    failed = sum(1 for item in items if item["status"] == "failed")
+    cancelled = sum(1 for item in items if item["status"] == "cancelled")
+    progress = sum(STATUS_PROGRESS.get(item["status"], 0.0) for item in items) / len(items)
+    return {
+        "batch_id": batch_id,
+        "total": len(items),
+        "completed": completed,
+        "failed": failed,
+        "cancelled": cancelled,
+        "in_progress": len(items) - completed - failed - cancelled,
+        "progress": round(progress, 4),
+        "create_time": batch["create_time"],
+        "items": items,
+    }
+
+@router.get("/capacity")
+async def get_capacity():
+    """Current backlog, per-stage service times and the ETA a new task would get, without admitting it"""
+    try:
+        return {
+            "enabled": admission_controller.enabled,
+            "max_backlog": admission_controller.max_backlog,
+            "max_eta_seconds": admission_controller.max_eta_seconds,
+            "queues": admission_controller.snapshot(),
+            **admission_controller.estimate(),
+        }
+    except Exception as e:
+        logger.error(f"Error getting capacity: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/task/{task_id}/confirm")
+async def confirm_full_render(task_id: str):
+    """确认预览后开始完整质量渲染"""
+    redis_client = RedisClient()
+    task_data = redis_client.get(f"task:{task_id}")
+    if not task_data:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    task = json.loads(task_data)
+    if not task.get("awaiting_confirmation"):
+        raise HTTPException(status_code=409, detail="Task is not awaiting confirmation")
+
+    try:
+        task["render_tier"] = "full"
+        task["awaiting_confirmation"] = False
+        redis_client.set(f"task:{task_id}", json.dumps(task))
+
+        # Publish inside the task's own trace so the full render shows up in its timeline
+        with tracer.task_context(task), tracer.span("api.confirm_full_render"):
+            RabbitMQClient.shared().publish(
+                "ai_service",
+                "video_tasks",
+                json.dumps(task)
+            )
+
+        logger.info(f"Confirmed full render: {task_id}")
+        return {"task_id": task_id, "status": task["status"]}
+
+    except Exception as e:
+        logger.error(f"Error confirming full render: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/task/{task_id}")
 async def get_task_status(task_id: str):
     try:
@@ -71,6 +332,81 @@ async def get_task_status(task_id: str):
         logger.error(f"Error getting task status: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.delete("/task/{task_id}", status_code=202)
+async def cancel_generation_task(task_id: str):
+    """Cancel a task; workers skip it on dequeue or stop at the next segment, chunk or inference step"""
+    redis_client = RedisClient()
+    task_data = redis_client.get(f"task:{task_id}")
+    if not task_data:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    task = json.loads(task_data)
+    if task.get("status") in FINAL_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Task already finished with status {task.get('status')}")
+
+    try:
+        cancellation.request(task_id)
+        # Queued tasks and previews waiting for confirmation hold no worker; mark them right away
+        if task.get("status") == "0" or task.get("awaiting_confirmation"):
+            task["status"] = "cancelled"
+            task["awaiting_confirmation"] = False
+            redis_client.set(f"task:{task_id}", json.dumps(task))
+            # Running tasks are counted by the worker that stops them
+            TASKS_TOTAL.labels(service="api", outcome="cancelled").inc()
+        logger.info(f"Cancellation requested: {task_id}")
+        return {"task_id": task_id, "status": "cancelled" if task["status"] == "cancelled" else "cancelling"}
+
+    except Exception as e:
+        logger.error(f"Error cancelling task: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/task/{task_id}/timeline")
+async def get_task_timeline(task_id: str):
+    """Per-stage breakdown of queue wait and compute time"""
+    redis_client = RedisClient()
+    task_data = redis_client.get(f"task:{task_id}")
+    if not task_data:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    trace_id = json.loads(task_data).get("trace_id")
+    if not trace_id:
+        raise HTTPException(status_code=404, detail="Task has no trace")
+
+    try:
+        timeline = await run_in_threadpool(tracer.timeline, trace_id)
+        return {"task_id": task_id, **timeline}
+
+    except Exception as e:
+        logger.error(f"Error getting task timeline: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/task/{task_id}/playlist.m3u8")
+async def get_task_playlist(task_id: str):
+    """HLS master playlist; variant playlists and segments are served from /static"""
+    redis_client = RedisClient()
+    task_data = redis_client.get(f"task:{task_id}")
+    if not task_data:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    master_path = json.loads(task_data).get("hls_master_path")
+    if not master_path or "uploads/" not in master_path:
+        raise HTTPException(status_code=404, detail="Task has no HLS renditions")
+
+    # 工作进程记录的是相对uploads的路径，与 /static 挂载目录对应
+    relative_dir = os.path.dirname(master_path.split("uploads/", 1)[1])
+    try:
+        with open(os.path.join(base_path, relative_dir, os.path.basename(master_path)), 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Playlist not found")
+
+    playlist = "\n".join(
+        line if not line or line.startswith("#") else f"/static/{relative_dir}/{line}"
+        for line in lines
+    )
+    return Response(content=playlist + "\n", media_type="application/vnd.apple.mpegurl",
+                    headers={"Cache-Control": "no-cache"})
+
 @router.get("/tasks", response_model=dict)
 async def list_tasks(
     page: int = Query(default=1, ge=1, description="Page number"),
@@ -90,7 +426,6 @@ async def list_tasks(
         # Fetch task data for each key
         for key in task_keys:
             task_data = redis_client.get(key)
-            print(task_data)
             if task_data:
                 task = json.loads(task_data)
                 tasks.append(task)
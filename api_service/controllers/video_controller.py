@@ -8,14 +8,14 @@ from datetime import datetime
 from common.database import get_db
 from common.redis_client import RedisClient
 from common.rabbitmq_client import RabbitMQClient
+from common.config import settings
 from common.logger import get_logger
 from common.file_upload import FileUploadManager
 
 router = APIRouter(prefix="/video", tags=["video"])
 logger = get_logger()
-mq_client = RabbitMQClient()
 
-base_path = '/home/featurize/clonevoice/uploads'
+base_path = settings.services.upload_base_path
 
 @router.post("/upload")
 async def upload_video(file: UploadFile = File(...)):
@@ -49,7 +49,7 @@ async def generate_video(background_tasks: BackgroundTasks, db: Session = Depend
         redis_client.set(f"task:{task_id}", json.dumps(task_data))
         
         # 发送任务到视频服务
-        mq_client.publish(
+        RabbitMQClient.shared().publish(
             exchange="ai_service",
             routing_key="video",
             message=json.dumps(task_data)
@@ -1,85 +1,101 @@
 import sys
 import os
-import asyncio
-from threading import Thread
-from fastapi import FastAPI, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
-from sse_starlette.sse import EventSourceResponse
-import uvicorn
-import json
-from dotenv import load_dotenv
-from fastapi.openapi.utils import get_openapi
-from typing import Dict, Set
-from collections import defaultdict
 
 # Add the parent directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# 导入公共组件
-from common.redis_client import RedisClient
-from common.rabbitmq_client import RabbitMQClient
-from common.logger import setup_logger, get_logger
-
-# 导入控制器
-from api_service.controllers.video_controller import router as video_router
-from api_service.controllers.audio_controller import router as audio_router
-from api_service.controllers.generate_controller import router as generate_router
-
-# 加载环境变量
-load_dotenv()
+from common.startup_profiler import startup_profiler
+
+with startup_profiler.phase("imports", trace_imports=True):
+    import asyncio
+    from fastapi import FastAPI, Request
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import JSONResponse
+    from sse_starlette.sse import EventSourceResponse
+    import uvicorn
+    import json
+    from fastapi.openapi.utils import get_openapi
+    from typing import Dict, Set
+    from contextlib import asynccontextmanager
+
+    # 导入公共组件
+    from common.redis_client import RedisClient
+    from common.rabbitmq_client import RabbitMQClient
+    from common.logger import setup_logger, get_logger
+    from common.tracing import tracer
+    from common.metrics import SSE_CLIENTS, QUEUE_DEPTH, metrics_response
+    from common.health import service_health
+    from common.config import settings
+    from common.tunables import tunables
+    from common.queue_stats import PIPELINE_BINDINGS
+
+    # 导入控制器
+    from api_service.controllers.video_controller import router as video_router
+    from api_service.controllers.audio_controller import router as audio_router
+    from api_service.controllers.generate_controller import router as generate_router
+    from api_service.services.static_files import OutputStaticFiles
+    from api_service.services.admission import admission_controller
 
 # 初始化日志系统
-setup_logger("api_service")
-logger = get_logger()
+with startup_profiler.phase("logging"):
+    setup_logger("api_service")
+    tracer.set_service("api_service")
+    logger = get_logger()
 
 # 创建FastAPI应用
 
-from contextlib import asynccontextmanager
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    startup_profiler.mark_ready()
+    tunables.start_watching()
+    # 首次在线程中读取队列状态，之后由后台线程刷新，准入检查不在事件循环中访问RabbitMQ
+    await asyncio.to_thread(admission_controller.refresh)
+    admission_controller.start_refreshing()
+    service_health.set_state(service_health.READY)
     logger.info("API服务启动")
+    startup_profiler.report(logger)
     yield
     mq_client.close()
     RedisClient.close()
     logger.info("API服务关闭")
 
-app = FastAPI(title="AI Service API", version="1.0.0", lifespan=lifespan)
+with startup_profiler.phase("app"):
+    app = FastAPI(title="AI Service API", version="1.0.0", lifespan=lifespan)
 
-# 配置CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    # 配置CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="/home/featurize/clonevoice/uploads"), name="static")
+    # Mount static files，支持Range、ETag条件请求和长期缓存
+    app.mount("/static", OutputStaticFiles(directory=settings.services.upload_base_path), name="static")
 
-# 初始化RabbitMQ客户端
-mq_client = RabbitMQClient()
+    # 注册路由
+    app.include_router(video_router)
+    app.include_router(audio_router)
+    app.include_router(generate_router)
+    app.include_router(service_health.router())
+    app.include_router(tunables.router())
 
-# 声明交换机和队列
-mq_client.declare_exchange("ai_service")
-mq_client.declare_queue("video_tasks")
-mq_client.declare_queue("audio_tasks")
-mq_client.bind_queue("video_tasks", "ai_service", "video")
-mq_client.bind_queue("audio_tasks", "ai_service", "audio")
+# 初始化RabbitMQ客户端，与控制器共用同一连接
+with startup_profiler.phase("rabbitmq"):
+    mq_client = RabbitMQClient.shared()
 
-# 注册路由
-app.include_router(video_router)
-app.include_router(audio_router)
-app.include_router(generate_router)
+    # 声明交换机和队列
+    mq_client.declare_exchange("ai_service")
+    for queue_name, routing_keys in PIPELINE_BINDINGS.items():
+        mq_client.declare_queue(queue_name)
+        for routing_key in routing_keys:
+            mq_client.bind_queue(queue_name, "ai_service", routing_key)
 
 # 存储所有活跃的SSE连接
 connected_clients: Set[asyncio.Queue] = set()
 
 async def broadcast_message(message: dict):
-    print(message)
     """广播消息到所有连接的客户端"""
     for queue in connected_clients:
         await queue.put(message)
@@ -89,7 +105,6 @@ async def send_event(request: Request):
     """推送事件接口"""
     try:
         message = await request.json()
-        print(f'request:{message}')
         if not connected_clients:
             return JSONResponse(content={"status": "No connected clients."})
         
@@ -108,6 +123,7 @@ async def events():
         # 为每个连接创建一个消息队列
         queue = asyncio.Queue()
         connected_clients.add(queue)
+        SSE_CLIENTS.inc()
         
         try:
             while True:
@@ -124,9 +140,25 @@ async def events():
         finally:
             # 清理连接
             connected_clients.remove(queue)
+            SSE_CLIENTS.dec()
     
     return EventSourceResponse(event_generator())
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus指标接口，采集时刷新任务队列积压数
+
+    队列查询在共享客户端的专用线程中执行，不阻塞事件循环，也不与控制器的发布并发使用连接。
+    """
+    for queue_name in ("audio_tasks", "video_tasks"):
+        try:
+            depth = await asyncio.wrap_future(mq_client.submit(mq_client.queue_depth, queue_name))
+            QUEUE_DEPTH.labels(queue=queue_name).set(depth)
+        except Exception as e:
+            logger.warning(f"获取队列积压失败: {queue_name} - {str(e)}")
+            await asyncio.wrap_future(mq_client.submit(mq_client.reconnect))
+    return metrics_response()
+
 def custom_openapi():
     """自定义OpenAPI文档"""
     if app.openapi_schema:
@@ -143,5 +175,5 @@ def custom_openapi():
 app.openapi = custom_openapi
 
 if __name__ == "__main__":
-    port = int(os.getenv("API_SERVICE_PORT", 8000))
+    port = settings.services.api_port
     uvicorn.run("api_service.main:app", host="0.0.0.0", port=port, reload=True)
\ No newline at end of file
@@ -0,0 +1,188 @@
+import math
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from common.rabbitmq_client import RabbitMQClient
+from common.queue_stats import queue_stats
+from common.metrics import QUEUE_DEPTH
+from common.tunables import tunables
+from common.logger import get_logger
+
+logger = get_logger()
+
+# 准入控制配置
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# 后台刷新队列积压和处理耗时的间隔，请求只读取缓存的结果
+ADMISSION_REFRESH_SECONDS = float(os.getenv("ADMISSION_REFRESH_SECONDS", 2))
+ADMISSION_MAX_RETRY_AFTER = int(os.getenv("ADMISSION_MAX_RETRY_AFTER", 600))
+# 工作进程尚未上报处理耗时时使用的默认值（秒）
+ADMISSION_DEFAULT_SERVICE_TIMES = {
+    "audio_tasks": float(os.getenv("ADMISSION_DEFAULT_AUDIO_SECONDS", 20)),
+    "video_tasks": float(os.getenv("ADMISSION_DEFAULT_VIDEO_SECONDS", 120)),
+}
+
+# 任务依次经过的队列
+PIPELINE_QUEUES = ("audio_tasks", "video_tasks")
+
+
+class AdmissionRejected(Exception):
+    """积压或预计完成时间超出限制，客户端应在retry_after秒后重试"""
+
+    def __init__(self, reason: str, retry_after: int, estimate: Dict):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+        self.estimate = estimate
+
+
+class AdmissionController:
+    """按队列积压和各阶段处理耗时对新任务做准入控制，并估算完成时间
+
+    新任务排在两个队列现有积压之后：音频队列中的任务之后也会进入视频队列，
+    因此排空前序任务的时间取决于吞吐最低的阶段（积压 * 处理耗时 / 消费者数），
+    再加上新任务自身在各阶段的处理耗时。
+    积压取RabbitMQ的message_count与queue_stats记录的已发布未完成任务数中的较大值，后者包含已投递未确认的消息。
+    队列状态由后台线程按refresh_seconds刷新，请求处理中不访问RabbitMQ。
+    """
+
+    def __init__(self, enabled: bool = ADMISSION_ENABLED, max_backlog: Optional[int] = None,
+                 max_eta_seconds: Optional[float] = None, refresh_seconds: float = ADMISSION_REFRESH_SECONDS):
+        self.enabled = enabled
+        # 未指定时使用运行时可调整的admission_max_backlog和admission_max_eta_seconds
+        self._max_backlog = max_backlog
+        self._max_eta_seconds = max_eta_seconds
+        self.refresh_seconds = refresh_seconds
+        self._snapshot: Optional[Dict[str, Dict]] = None
+        self._refreshed_at = 0.0
+        # 上次刷新后已准入、但可能尚未计入队列积压的任务数
+        self._admitted_since_refresh = 0
+        self._lock = threading.Lock()
+        self._refresher: Optional[threading.Thread] = None
+
+    @property
+    def max_backlog(self) -> int:
+        """两个队列合计积压的任务数上限，0表示不限"""
+        return self._max_backlog if self._max_backlog is not None else tunables.get("admission_max_backlog")
+
+    @property
+    def max_eta_seconds(self) -> float:
+        """预计完成时间的SLO（秒），新任务预计超过该时间时拒绝，0表示不限"""
+        return self._max_eta_seconds if self._max_eta_seconds is not None else tunables.get("admission_max_eta_seconds")
+
+    def _refresh(self) -> Dict[str, Dict]:
+        snapshot = {}
+        for queue in PIPELINE_QUEUES:
+            depth, consumers = RabbitMQClient.shared().queue_info(queue)
+            QUEUE_DEPTH.labels(queue=queue).set(depth)
+            backlog = queue_stats.backlog(queue)
+            service_time = queue_stats.service_time(queue) or ADMISSION_DEFAULT_SERVICE_TIMES[queue]
+            snapshot[queue] = {
+                "depth": max(depth, backlog or 0),
+                "consumers": consumers,
+                "service_time": service_time,
+            }
+        return snapshot
+
+    def refresh(self) -> bool:
+        """读取队列状态并替换缓存，失败时保留上次结果，会阻塞调用线程"""
+        try:
+            snapshot = self._refresh()
+        except Exception as e:
+            logger.warning(f"获取队列状态失败，沿用上次结果: {str(e)}")
+            RabbitMQClient.shared().reconnect()
+            return False
+        with self._lock:
+            self._snapshot = snapshot
+            self._refreshed_at = time.monotonic()
+            self._admitted_since_refresh = 0
+        return True
+
+    def start_refreshing(self) -> None:
+        """启动后台线程定期刷新队列状态"""
+        if self._refresher is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(self.refresh_seconds)
+                self.refresh()
+
+        self._refresher = threading.Thread(target=run, name="admission-refresher", daemon=True)
+        self._refresher.start()
+
+    def snapshot(self) -> Optional[Dict[str, Dict]]:
+        """各队列的积压数、消费者数和平均处理耗时，返回后台线程最近一次刷新的结果，尚未获取时返回None"""
+        with self._lock:
+            return self._snapshot
+
+    def estimate(self, items: int = 1) -> Dict:
+        """估算在当前积压下新提交items个任务时，最后一个任务的完成时间
+
+        尚未获取队列状态（如启动时RabbitMQ不可达）时各项为None。
+        """
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return {"backlog": None, "eta_seconds": None, "estimated_completion": None,
+                    "bottleneck_seconds_per_task": None}
+        with self._lock:
+            ahead = self._admitted_since_refresh
+        drain_seconds = 0.0
+        own_seconds = 0.0
+        upstream = 0
+        for queue in PIPELINE_QUEUES:
+            stats = snapshot[queue]
+            # 上游队列中的任务之后也会经过该阶段
+            upstream += stats["depth"]
+            per_task = stats["service_time"] / max(1, stats["consumers"])
+            drain_seconds = max(drain_seconds, (upstream + ahead + items - 1) * per_task)
+            own_seconds += stats["service_time"]
+
+        eta_seconds = drain_seconds + own_seconds
+        return {
+            "backlog": upstream + ahead,
+            "eta_seconds": round(eta_seconds, 1),
+            "estimated_completion": int(time.time() + eta_seconds),
+            "bottleneck_seconds_per_task": round(max(
+                snapshot[queue]["service_time"] / max(1, snapshot[queue]["consumers"]) for queue in PIPELINE_QUEUES
+            ), 3),
+        }
+
+    def admit(self, items: int = 1) -> Dict:
+        """准入items个任务并返回完成时间估计，超出积压上限或SLO时抛出AdmissionRejected
+
+        未启用或尚未获取队列状态时直接准入，不因RabbitMQ暂时不可达而拒绝提交。
+        """
+        estimate = self.estimate(items)
+        if not self.enabled:
+            return estimate
+        if estimate["eta_seconds"] is None:
+            logger.warning("尚未获取队列状态，跳过准入检查")
+            return estimate
+
+        per_task = estimate["bottleneck_seconds_per_task"]
+        max_backlog, max_eta_seconds = self.max_backlog, self.max_eta_seconds
+        if max_backlog and estimate["backlog"] + items > max_backlog:
+            excess = estimate["backlog"] + items - max_backlog
+            raise AdmissionRejected(
+                f"Backlog of {estimate['backlog']} tasks exceeds the limit of {max_backlog}",
+                self._retry_after(excess * per_task), estimate,
+            )
+        if max_eta_seconds and estimate["eta_seconds"] > max_eta_seconds:
+            raise AdmissionRejected(
+                f"Estimated completion in {estimate['eta_seconds']:.0f}s exceeds the SLO of {max_eta_seconds:.0f}s",
+                self._retry_after(estimate["eta_seconds"] - max_eta_seconds), estimate,
+            )
+
+        with self._lock:
+            self._admitted_since_refresh += items
+        return estimate
+
+    @staticmethod
+    def _retry_after(seconds: float) -> int:
+        return max(1, min(ADMISSION_MAX_RETRY_AFTER, math.ceil(seconds)))
+
+
+# 创建全局准入控制实例
+admission_controller = AdmissionController()
@@ -0,0 +1,55 @@
+import mimetypes
+import os
+from os import PathLike
+
+from fastapi.staticfiles import StaticFiles
+from starlette.responses import FileResponse, Response
+from starlette.types import Scope
+
+from common.logger import get_logger
+
+logger = get_logger()
+
+# 静态文件分发配置
+# 生成结果的文件名包含任务ID，内容不再变化，浏览器可长期缓存
+STATIC_OUTPUT_DIRS = {"out_video", "out_audio"}
+STATIC_OUTPUT_MAX_AGE = int(os.getenv("STATIC_OUTPUT_MAX_AGE", 30 * 24 * 3600))
+# 前置nginx时设置为内部location前缀（如 /protected/），由nginx以sendfile发送文件
+STATIC_ACCEL_REDIRECT = os.getenv("STATIC_ACCEL_REDIRECT", "")
+
+# HLS播放列表和fMP4分片的MIME类型
+mimetypes.add_type("application/vnd.apple.mpegurl", ".m3u8")
+mimetypes.add_type("video/iso.segment", ".m4s")
+
+
+class OutputStaticFiles(StaticFiles):
+    """上传目录的静态文件服务
+
+    FileResponse自带强ETag、条件请求（304）和Range请求（206）；
+    在此基础上为生成结果添加长期缓存头。ASGI服务器支持 http.response.pathsend 扩展时
+    由服务器零拷贝发送文件，配置STATIC_ACCEL_REDIRECT时改由nginx通过X-Accel-Redirect发送。
+    """
+
+    def file_response(self, full_path: PathLike, stat_result: os.stat_result, scope: Scope,
+                      status_code: int = 200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+
+        relative_path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        if relative_path.split("/", 1)[0] in STATIC_OUTPUT_DIRS:
+            response.headers["Cache-Control"] = f"public, max-age={STATIC_OUTPUT_MAX_AGE}, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+
+        if STATIC_ACCEL_REDIRECT and isinstance(response, FileResponse):
+            # nginx自行处理Range和条件请求，这里只传递缓存相关的头
+            return Response(
+                status_code=status_code,
+                headers={
+                    "X-Accel-Redirect": STATIC_ACCEL_REDIRECT.rstrip("/") + "/" + relative_path,
+                    "Content-Type": response.media_type,
+                    "ETag": response.headers["etag"],
+                    "Last-Modified": response.headers["last-modified"],
+                    "Cache-Control": response.headers["cache-control"],
+                },
+            )
+        return response
@@ -5,7 +5,6 @@ import json
 import uuid
 
 logger = get_logger()
-mq_client = RabbitMQClient()
 
 class TaskService:
     @staticmethod
@@ -30,7 +29,7 @@ class TaskService:
             redis_client.set(f"task:{task_id}", json.dumps(task_data))
             
             # 发送任务到对应的服务
-            mq_client.publish(
+            RabbitMQClient.shared().publish(
                 exchange="ai_service",
                 routing_key=task_type,
                 message=json.dumps(task_data)
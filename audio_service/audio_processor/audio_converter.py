@@ -1,3 +1,4 @@
+import os
 import subprocess
 from common.logger import get_logger
 
@@ -26,18 +27,20 @@ class AudioConverter:
     @staticmethod
     def merge_audio_files(input_files: list, output_file: str) -> bool:
         """合并多个音频文件"""
+        # 文件列表与分段放在同一任务目录中，避免并发任务互相覆盖
+        list_file = os.path.join(os.path.dirname(os.path.abspath(input_files[0])), "concat_list.txt")
         try:
             # 创建文件列表
-            with open('temp_files.txt', 'w', encoding='utf-8') as f:
+            with open(list_file, 'w', encoding='utf-8') as f:
                 for file in input_files:
-                    f.write(f"file '{file}'\n")
+                    f.write(f"file '{os.path.abspath(file)}'\n")
 
             # 使用ffmpeg合并文件
             command = [
                 'ffmpeg',
                 '-f', 'concat',
                 '-safe', '0',
-                '-i', 'temp_files.txt',
+                '-i', list_file,
                 '-c', 'copy',
                 '-y',
                 output_file
@@ -45,8 +48,7 @@ class AudioConverter:
             subprocess.run(command, check=True, capture_output=True)
             
             # 清理临时文件
-            import os
-            os.remove('temp_files.txt')
+            os.remove(list_file)
             return True
         except subprocess.CalledProcessError as e:
             logger.error(f"音频合并失败: {str(e)}")
@@ -0,0 +1,125 @@
+import os
+from typing import TYPE_CHECKING, Optional
+
+from common.logger import get_logger
+
+if TYPE_CHECKING:
+    import torch
+
+logger = get_logger()
+
+# 推理设备配置
+TTS_DEVICE = os.getenv("TTS_DEVICE", "auto")  # auto | cuda | cpu
+TTS_CPU_QUANTIZE = os.getenv("TTS_CPU_QUANTIZE", "false").lower() == "true"
+TTS_CPU_INTRA_OP_THREADS = int(os.getenv("TTS_CPU_INTRA_OP_THREADS", 0))  # 0 表示使用全部CPU核心
+TTS_CPU_INTER_OP_THREADS = int(os.getenv("TTS_CPU_INTER_OP_THREADS", 1))
+
+
+class DeviceManager:
+    """选择TTS推理设备
+
+    有CUDA时使用GPU，否则回退到CPU并设置算子内/算子间线程数，
+    CPU模式下可选对XTTS的线性层做int8动态量化。
+    """
+
+    def __init__(self, preferred: str = TTS_DEVICE, quantize: bool = TTS_CPU_QUANTIZE,
+                 intra_op_threads: int = TTS_CPU_INTRA_OP_THREADS, inter_op_threads: int = TTS_CPU_INTER_OP_THREADS):
+        self.preferred = preferred
+        self.quantize = quantize
+        self.intra_op_threads = intra_op_threads or os.cpu_count() or 1
+        self.inter_op_threads = inter_op_threads
+        self._device: Optional["torch.device"] = None
+
+    @property
+    def device(self) -> "torch.device":
+        if self._device is None:
+            self._device = self._select_device()
+        return self._device
+
+    @property
+    def is_cpu(self) -> bool:
+        return self.device.type == "cpu"
+
+    def _select_device(self) -> "torch.device":
+        # torch导入耗时较长，首次选择设备时才加载
+        import torch
+
+        if self.preferred in ("auto", "cuda") and torch.cuda.is_available():
+            device = torch.device("cuda:0")
+        else:
+            if self.preferred == "cuda":
+                logger.warning("未检测到CUDA，TTS推理回退到CPU")
+            device = torch.device("cpu")
+            self._configure_cpu_threads()
+        logger.info(f"TTS推理设备: {device}")
+        return device
+
+    def _configure_cpu_threads(self) -> None:
+        import torch
+
+        torch.set_num_threads(self.intra_op_threads)
+        # 算子间线程数只能在首次并行计算前设置一次，同一进程再次设置会抛出RuntimeError
+        if torch.get_num_interop_threads() != self.inter_op_threads:
+            try:
+                torch.set_num_interop_threads(self.inter_op_threads)
+            except RuntimeError as e:
+                logger.warning(f"设置算子间线程数失败，沿用{torch.get_num_interop_threads()}: {str(e)}")
+        logger.info(f"CPU线程数: intra-op={self.intra_op_threads}, inter-op={self.inter_op_threads}")
+
+    def load_tts(self, model_path: str, config_path: str, quantize: Optional[bool] = None):
+        """加载XTTS模型到所选设备"""
+        from TTS.api import TTS
+
+        tts = TTS(model_path=model_path, config_path=config_path).to(self.device)
+        quantize = self.quantize if quantize is None else quantize
+        if quantize:
+            if self.is_cpu:
+                self.quantize_model(tts)
+            else:
+                logger.warning("int8动态量化仅用于CPU推理，已忽略")
+        return tts
+
+    @staticmethod
+    def quantize_model(tts) -> None:
+        """对XTTS的线性层做int8动态量化
+
+        XTTS的GPT-2主干使用transformers的Conv1D（权重为转置的线性层），quantize_dynamic只识别nn.Linear，
+        因此先把Conv1D等价替换为nn.Linear，否则量化几乎不覆盖主要计算。
+        """
+        import torch
+
+        model = tts.synthesizer.tts_model
+        model.eval()
+        converted = DeviceManager._convert_conv1d_to_linear(model)
+        torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        logger.info(f"XTTS已切换为int8动态量化模型（Conv1D转换为Linear: {converted}个）")
+
+    @staticmethod
+    def _convert_conv1d_to_linear(module: "torch.nn.Module") -> int:
+        """将transformers的Conv1D原地替换为等价的nn.Linear，返回替换的层数"""
+        import torch
+
+        try:
+            from transformers.pytorch_utils import Conv1D
+        except ImportError:
+            from transformers.modeling_utils import Conv1D
+
+        converted = 0
+        for name, child in module.named_children():
+            if isinstance(child, Conv1D):
+                # Conv1D的权重形状为(in_features, out_features)，计算 x @ W + b
+                in_features, out_features = child.weight.shape
+                linear = torch.nn.Linear(in_features, out_features, bias=child.bias is not None)
+                with torch.no_grad():
+                    linear.weight.copy_(child.weight.t())
+                    if child.bias is not None:
+                        linear.bias.copy_(child.bias)
+                setattr(module, name, linear)
+                converted += 1
+            else:
+                converted += DeviceManager._convert_conv1d_to_linear(child)
+        return converted
+
+
+# 创建全局设备管理器实例
+device_manager = DeviceManager()
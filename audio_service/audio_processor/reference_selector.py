@@ -0,0 +1,264 @@
+import hashlib
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+from common.logger import get_logger
+from common.metrics import STAGE_DURATION
+from common.result_cache import content_hash
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = get_logger()
+
+# 参考音频预处理配置
+REFERENCE_SELECT_ENABLED = os.getenv("REFERENCE_SELECT_ENABLED", "true").lower() == "true"
+# 选取的语音总时长（秒），XTTS计算条件潜变量时最多使用配置中max_ref_len秒
+REFERENCE_WINDOW_SECONDS = float(os.getenv("REFERENCE_WINDOW_SECONDS", 12))
+# 低于峰值该分贝数的片段视为静音
+REFERENCE_TOP_DB = float(os.getenv("REFERENCE_TOP_DB", 35))
+# 去除静音时在语音片段两侧保留的停顿，避免拼接后语流过于紧凑
+REFERENCE_KEEP_PAUSE_MS = int(os.getenv("REFERENCE_KEEP_PAUSE_MS", 150))
+REFERENCE_CACHE_DIR = os.getenv("REFERENCE_CACHE_DIR", "cache/references")
+REFERENCE_CACHE_MAX_MB = int(os.getenv("REFERENCE_CACHE_MAX_MB", 256))
+
+FRAME_LENGTH = 2048
+HOP_LENGTH = 512
+# 候选窗口的滑动步长（秒）
+WINDOW_STEP_SECONDS = 0.5
+# 幅度达到该值的采样点视为削波
+CLIP_LEVEL = 0.99
+
+
+def decode_reference(audio_path: str, sample_rate: int) -> "np.ndarray":
+    """将参考音频解码为指定采样率的单声道float32数组
+
+    soundfile支持的格式（WAV/FLAC/OGG/MP3等）在进程内解码并用soxr重采样，
+    其余格式通过ffmpeg管道输出原始PCM，不落盘。
+    """
+    import numpy as np
+
+    with STAGE_DURATION.labels(stage="reference_decode").time():
+        try:
+            import soundfile as sf
+
+            audio, source_rate = sf.read(audio_path, dtype="float32", always_2d=True)
+            audio = audio.mean(axis=1)
+            if source_rate != sample_rate:
+                import librosa
+                audio = librosa.resample(audio, orig_sr=source_rate, target_sr=sample_rate, res_type="soxr_hq")
+            return np.ascontiguousarray(audio, dtype=np.float32)
+        except Exception as e:
+            logger.info(f"参考音频无法在进程内解码，使用ffmpeg: {str(e)}")
+        return _decode_with_ffmpeg(audio_path, sample_rate)
+
+
+def _decode_with_ffmpeg(audio_path: str, sample_rate: int) -> "np.ndarray":
+    import numpy as np
+
+    command = [
+        'ffmpeg',
+        '-v', 'error',
+        '-i', audio_path,
+        '-f', 'f32le',
+        '-acodec', 'pcm_f32le',
+        '-ac', '1',
+        '-ar', str(sample_rate),
+        'pipe:1'
+    ]
+    result = subprocess.run(command, check=True, capture_output=True)
+    return np.frombuffer(result.stdout, dtype=np.float32).copy()
+
+
+def trim_silence(audio: "np.ndarray", sample_rate: int, top_db: float = REFERENCE_TOP_DB,
+                 keep_pause_ms: int = REFERENCE_KEEP_PAUSE_MS) -> "np.ndarray":
+    """去除静音片段，语音片段两侧保留keep_pause_ms的停顿后拼接"""
+    import numpy as np
+    import librosa
+
+    intervals = librosa.effects.split(audio, top_db=top_db, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH)
+    if len(intervals) == 0:
+        return audio
+
+    pad = int(sample_rate * keep_pause_ms / 1000)
+    merged: List[List[int]] = []
+    for start, end in intervals:
+        start, end = max(0, start - pad), min(len(audio), end + pad)
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return np.concatenate([audio[start:end] for start, end in merged])
+
+
+def score_windows(audio: "np.ndarray", sample_rate: int, window_seconds: float,
+                  top_db: float = REFERENCE_TOP_DB) -> List[Tuple[float, int]]:
+    """为每个候选窗口打分，返回 (得分, 起始采样点) 列表
+
+    得分由三部分组成：有声帧占比（越连续越好）、窗口内信噪比估计
+    （第90与第10百分位帧能量之差）以及削波惩罚。
+    """
+    import numpy as np
+    import librosa
+
+    rms = librosa.feature.rms(y=audio, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH)[0]
+    frame_db = 20 * np.log10(np.maximum(rms, 1e-10))
+    speech_threshold = frame_db.max() - top_db
+    clipped = np.abs(audio) >= CLIP_LEVEL
+
+    window_frames = max(1, int(window_seconds * sample_rate / HOP_LENGTH))
+    step_frames = max(1, int(WINDOW_STEP_SECONDS * sample_rate / HOP_LENGTH))
+    window_samples = int(window_seconds * sample_rate)
+
+    scores = []
+    for first_frame in range(0, max(1, len(frame_db) - window_frames + 1), step_frames):
+        window_db = frame_db[first_frame:first_frame + window_frames]
+        start = first_frame * HOP_LENGTH
+        speech_ratio = float(np.mean(window_db > speech_threshold))
+        noise_floor, speech_level = np.percentile(window_db, [10, 90])
+        snr = float(np.clip((speech_level - noise_floor) / 40.0, 0.0, 1.0))
+        clip_ratio = float(np.mean(clipped[start:start + window_samples]))
+        scores.append((0.6 * speech_ratio + 0.4 * snr - 20.0 * clip_ratio, start))
+    return scores
+
+
+class ReferenceSelector:
+    """参考音频预处理：去除静音并选取得分最高的一段语音作为条件输入
+
+    用户上传的参考音频常有数分钟且夹杂长时间静音，整段送入模型只增加计算量而不提升音色质量。
+    处理结果按(文件内容, 采样率, 预处理参数)缓存为npy文件，同一参考音频再次提交时跳过解码和打分。
+    """
+
+    def __init__(self, cache_dir: str = REFERENCE_CACHE_DIR, max_bytes: int = REFERENCE_CACHE_MAX_MB * 1024 * 1024,
+                 window_seconds: float = REFERENCE_WINDOW_SECONDS, enabled: bool = REFERENCE_SELECT_ENABLED):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.window_seconds = window_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "input_seconds": 0.0,
+            "selected_seconds": 0.0,
+            "prepare_seconds": 0.0,
+            "hit_load_seconds": 0.0,
+        }
+
+    def make_key(self, audio_path: str, sample_rate: int) -> str:
+        raw = "\x1f".join([
+            content_hash(audio_path), str(sample_rate), str(self.window_seconds),
+            str(REFERENCE_TOP_DB), str(REFERENCE_KEEP_PAUSE_MS),
+        ])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def select(self, audio: "np.ndarray", sample_rate: int) -> "np.ndarray":
+        """去除静音后选取得分最高的窗口"""
+        trimmed = trim_silence(audio, sample_rate)
+        if len(trimmed) <= self.window_seconds * sample_rate:
+            return trimmed
+        _, start = max(score_windows(trimmed, sample_rate, self.window_seconds))
+        return trimmed[start:start + int(self.window_seconds * sample_rate)]
+
+    def load(self, audio_path: str, sample_rate: int) -> "np.ndarray":
+        """获取预处理后的参考音频，优先读取缓存"""
+        import numpy as np
+
+        if not self.enabled:
+            return decode_reference(audio_path, sample_rate)
+
+        start_time = time.perf_counter()
+        entry_path = self.cache_dir / f"{self.make_key(audio_path, sample_rate)}.npy"
+        try:
+            audio = np.load(entry_path)
+            os.utime(entry_path, None)
+            with self._lock:
+                self._stats["hits"] += 1
+                self._stats["hit_load_seconds"] += time.perf_counter() - start_time
+            return audio
+        except (OSError, ValueError):
+            pass
+
+        audio = decode_reference(audio_path, sample_rate)
+        with STAGE_DURATION.labels(stage="reference_selection").time():
+            selected = np.ascontiguousarray(self.select(audio, sample_rate), dtype=np.float32)
+        elapsed = time.perf_counter() - start_time
+
+        input_seconds = len(audio) / sample_rate
+        selected_seconds = len(selected) / sample_rate
+        logger.info(f"参考音频预处理: {audio_path} {input_seconds:.1f}s -> {selected_seconds:.1f}s，"
+                    f"耗时 {elapsed:.2f}s")
+        with self._lock:
+            self._stats["misses"] += 1
+            self._stats["input_seconds"] += input_seconds
+            self._stats["selected_seconds"] += selected_seconds
+            self._stats["prepare_seconds"] += elapsed
+            self._store(entry_path, selected)
+        return selected
+
+    def _store(self, entry_path: Path, audio: "np.ndarray") -> None:
+        import numpy as np
+
+        # 临时文件名带进程和线程标识，多个实例同时写入同一条目时互不覆盖
+        tmp_path = entry_path.with_name(f"{entry_path.stem}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                np.save(f, audio)
+            os.replace(tmp_path, entry_path)
+        except Exception as e:
+            logger.warning(f"写入参考音频缓存失败: {entry_path.name} - {str(e)}")
+            tmp_path.unlink(missing_ok=True)
+            return
+        self._evict()
+
+    def _evict(self) -> None:
+        """按最近使用时间淘汰至容量上限以内，其他实例同时淘汰的条目直接跳过"""
+        entries = []
+        for path in self.cache_dir.glob("*.npy"):
+            try:
+                stats = path.stat()
+            except OSError:
+                continue
+            entries.append((stats.st_mtime, stats.st_size, path))
+        entries.sort()
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total_size <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_size -= size
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存命中率以及预处理带来的加速
+
+        条件潜变量的计算量与参考音频时长成正比，length_reduction 为原始时长与选取时长之比；
+        cache_speedup 为未命中时的平均预处理耗时与命中时的平均加载耗时之比。
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        hits, misses = stats["hits"], stats["misses"]
+        mean_prepare = stats["prepare_seconds"] / misses if misses else 0.0
+        mean_hit = stats["hit_load_seconds"] / hits if hits else 0.0
+        return {
+            "enabled": self.enabled,
+            "entries": len(list(self.cache_dir.glob("*.npy"))),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "input_seconds": round(stats["input_seconds"], 2),
+            "selected_seconds": round(stats["selected_seconds"], 2),
+            "length_reduction": round(stats["input_seconds"] / stats["selected_seconds"], 2)
+            if stats["selected_seconds"] else 0.0,
+            "mean_prepare_seconds": round(mean_prepare, 4),
+            "mean_hit_load_seconds": round(mean_hit, 4),
+            "cache_speedup": round(mean_prepare / mean_hit, 1) if mean_hit else 0.0,
+        }
+
+
+# 创建全局参考音频预处理实例
+reference_selector = ReferenceSelector()
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, Any
+
+from common.logger import get_logger
+from common.result_cache import MODEL_VERSIONS
+
+logger = get_logger()
+
+# 分句合成缓存配置
+TTS_SEGMENT_CACHE_ENABLED = os.getenv("TTS_SEGMENT_CACHE_ENABLED", "true").lower() == "true"
+TTS_SEGMENT_CACHE_DIR = os.getenv("TTS_SEGMENT_CACHE_DIR", "cache/tts_segments")
+TTS_SEGMENT_CACHE_MAX_MB = int(os.getenv("TTS_SEGMENT_CACHE_MAX_MB", 1024))
+TTS_SEGMENT_CACHE_MAX_AGE_DAYS = int(os.getenv("TTS_SEGMENT_CACHE_MAX_AGE_DAYS", 30))
+
+
+def _entry_sizes(paths) -> list:
+    """各条目的字节数，已被其他实例删除的条目跳过"""
+    sizes = []
+    for path in paths:
+        try:
+            sizes.append(path.stat().st_size)
+        except OSError:
+            pass
+    return sizes
+
+
+class SegmentCache:
+    """分句合成结果缓存，在任务之间共享
+
+    问候语、免责声明等固定句子在相同音色下只需合成一次，
+    按(规范化句子, 音色哈希, 语言, 模型版本)索引合成的WAV文件。
+    """
+
+    def __init__(self, cache_dir: str = TTS_SEGMENT_CACHE_DIR, max_bytes: int = TTS_SEGMENT_CACHE_MAX_MB * 1024 * 1024,
+                 max_age_days: int = TTS_SEGMENT_CACHE_MAX_AGE_DAYS, enabled: bool = TTS_SEGMENT_CACHE_ENABLED):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_days * 24 * 3600
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """统一Unicode形式并合并空白字符"""
+        return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', text)).strip()
+
+    def make_key(self, text: str, voice_hash: str, language: str) -> str:
+        """生成分句缓存键"""
+        raw = "\x1f".join([self.normalize_text(text), voice_hash, language, MODEL_VERSIONS["tts"]])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.wav"
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """命中时将缓存的音频复制到输出路径，条目被其他实例同时淘汰时按未命中处理"""
+        entry_path = self._entry_path(key)
+        with self._lock:
+            try:
+                if time.time() - entry_path.stat().st_mtime > self.max_age_seconds:
+                    raise FileNotFoundError(entry_path)
+                shutil.copyfile(entry_path, output_path)
+                os.utime(entry_path, None)
+            except OSError:
+                self.misses += 1
+                return False
+            self.hits += 1
+            return True
+
+    def store(self, key: str, segment_path: str) -> None:
+        """保存新合成的分句音频"""
+        entry_path = self._entry_path(key)
+        # 临时文件名带进程和线程标识，多个实例同时写入同一条目时互不覆盖
+        tmp_path = entry_path.with_name(f"{entry_path.stem}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with self._lock:
+            try:
+                shutil.copyfile(segment_path, tmp_path)
+                os.replace(tmp_path, entry_path)
+            except Exception as e:
+                logger.warning(f"写入分句缓存失败: {key} - {str(e)}")
+                tmp_path.unlink(missing_ok=True)
+                return
+            self._evict()
+
+    def _evict(self) -> None:
+        """先淘汰过期条目，再按最近使用时间淘汰至容量上限以内，其他实例同时淘汰的条目直接跳过"""
+        now = time.time()
+        entries = []
+        for path in self.cache_dir.glob("*.wav"):
+            try:
+                stats = path.stat()
+            except OSError:
+                continue
+            if now - stats.st_mtime > self.max_age_seconds:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((stats.st_mtime, stats.st_size, path))
+
+        entries.sort()
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total_size <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_size -= size
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存命中率和占用空间"""
+        with self._lock:
+            sizes = _entry_sizes(self.cache_dir.glob("*.wav"))
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(sizes),
+                "size_bytes": sum(sizes),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# 创建全局分句缓存实例
+segment_cache = SegmentCache()
@@ -10,6 +10,36 @@ class TextProcessor:
         # 过滤空字符串并添加标点
         return [seg.strip() for seg in segments if seg.strip()]
 
+    # 句末标点：中文标点后直接分句，英文标点后须跟空白，避免拆开小数和时间（3.14、10.30）
+    SENTENCE_BOUNDARY = re.compile(r'(?<=[。！？])\s*|(?<=[.!?])\s+')
+    # 以这些缩写结尾的片段不是句末（Dr. Jansen、bijv. morgen）
+    ABBREVIATIONS = {
+        "dr", "mr", "mrs", "ms", "prof", "st", "nr", "no", "vs", "ca", "etc", "enz",
+        "bijv", "bv", "dhr", "mevr", "mw", "ir", "ing", "drs", "jl", "jr", "sr",
+    }
+
+    @staticmethod
+    def split_sentences(text: str) -> list:
+        """按句末标点分句，保留标点以维持语调"""
+        sentences = []
+        for piece in TextProcessor.SENTENCE_BOUNDARY.split(text.strip()):
+            piece = piece.strip()
+            if not piece:
+                continue
+            if sentences and TextProcessor._ends_with_abbreviation(sentences[-1]):
+                sentences[-1] = f"{sentences[-1]} {piece}"
+            else:
+                sentences.append(piece)
+        return sentences
+
+    @staticmethod
+    def _ends_with_abbreviation(sentence: str) -> bool:
+        if not sentence.endswith("."):
+            return False
+        last_word = sentence[:-1].rsplit(None, 1)[-1] if sentence[:-1].strip() else ""
+        # 缩写或单个大写字母的姓名首字母（J. Jansen）
+        return last_word.lower() in TextProcessor.ABBREVIATIONS or (len(last_word) == 1 and last_word.isupper())
+
     @staticmethod
     def validate_text(text: str) -> bool:
         """验证文本是否有效"""
@@ -0,0 +1,105 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Tuple
+
+from common.metrics import STAGE_DURATION
+from audio_service.audio_processor.device_manager import device_manager
+from audio_service.audio_processor.reference_selector import reference_selector
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# 进程内按参考音频内容保留的条件潜变量数，同一批量任务的条目分散到各实例后每个实例只计算一次，0表示不保留
+XTTS_CONDITIONING_MEMO_SIZE = int(os.getenv("XTTS_CONDITIONING_MEMO_SIZE", 8))
+
+
+class XttsVoice:
+    """以数组形式向XTTS提供参考音频
+
+    tts_to_file(speaker_wav=路径) 每合成一个分段都会重新读取参考音频并计算条件潜变量；
+    这里将参考音频直接解码为XTTS加载参考音频时使用的采样率，每个任务只计算一次条件潜变量。
+    """
+
+    # XTTS计算条件潜变量时以22.05kHz单声道加载参考音频（Xtts.get_conditioning_latents的load_sr）
+    CONDITIONING_SAMPLE_RATE = 22050
+
+    def __init__(self, tts):
+        self.tts = tts
+        self.model = tts.synthesizer.tts_model
+        self.config = self.model.config
+        self._conditioning_memo: "OrderedDict[str, Tuple[Any, Any]]" = OrderedDict()
+        self._memo_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, model_path: str, config_path: str) -> "XttsVoice":
+        return cls(device_manager.load_tts(model_path, config_path))
+
+    @property
+    def output_sample_rate(self) -> int:
+        return self.config.audio.output_sample_rate
+
+    def load_reference(self, audio_path: str) -> "np.ndarray":
+        """解码参考音频并选取用于计算条件潜变量的语音片段"""
+        return reference_selector.load(audio_path, self.CONDITIONING_SAMPLE_RATE)
+
+    def condition(self, reference: "np.ndarray") -> Tuple[Any, Any]:
+        """计算GPT条件潜变量和说话人嵌入，与Xtts.get_conditioning_latents处理方式一致"""
+        import torch
+
+        sample_rate = self.CONDITIONING_SAMPLE_RATE
+        with torch.inference_mode(), STAGE_DURATION.labels(stage="voice_conditioning").time():
+            audio = torch.from_numpy(reference).unsqueeze(0)
+            audio = audio[:, : sample_rate * self.config.max_ref_len].to(self.model.device)
+            if self.config.sound_norm_refs:
+                audio = (audio / torch.abs(audio).max()) * 0.75
+            speaker_embedding = self.model.get_speaker_embedding(audio, sample_rate)
+            gpt_cond_latent = self.model.get_gpt_cond_latents(
+                audio, sample_rate, length=self.config.gpt_cond_len, chunk_length=self.config.gpt_cond_chunk_len
+            )
+        return gpt_cond_latent, speaker_embedding
+
+    def conditioning_for(self, audio_path: str) -> Tuple[Any, Any]:
+        """获取参考音频的条件潜变量，按文件内容在进程内复用最近使用的结果"""
+        key = reference_selector.make_key(audio_path, self.CONDITIONING_SAMPLE_RATE)
+        with self._memo_lock:
+            if key in self._conditioning_memo:
+                self._conditioning_memo.move_to_end(key)
+                return self._conditioning_memo[key]
+
+        conditioning = self.condition(self.load_reference(audio_path))
+        if XTTS_CONDITIONING_MEMO_SIZE > 0:
+            with self._memo_lock:
+                self._conditioning_memo[key] = conditioning
+                while len(self._conditioning_memo) > XTTS_CONDITIONING_MEMO_SIZE:
+                    self._conditioning_memo.popitem(last=False)
+        return conditioning
+
+    def synthesize_to_file(self, text: str, conditioning: Tuple[Any, Any], language: str, file_path: str) -> str:
+        """使用已计算的条件潜变量合成一个分段并写入WAV
+
+        未启用分句缓存时整段文本作为一个分段传入，由XTTS按句切分，避免超出模型的单次输入长度。
+        """
+        import numpy as np
+        import soundfile as sf
+        import torch
+
+        gpt_cond_latent, speaker_embedding = conditioning
+        with torch.inference_mode():
+            output = self.model.inference(
+                text,
+                language,
+                gpt_cond_latent,
+                speaker_embedding,
+                temperature=self.config.temperature,
+                length_penalty=self.config.length_penalty,
+                repetition_penalty=self.config.repetition_penalty,
+                top_k=self.config.top_k,
+                top_p=self.config.top_p,
+                enable_text_splitting=True,
+            )
+        wav = output["wav"]
+        if isinstance(wav, torch.Tensor):
+            wav = wav.cpu().numpy()
+        sf.write(file_path, np.asarray(wav, dtype=np.float32).squeeze(), self.output_sample_rate)
+        return file_path
@@ -4,32 +4,45 @@ import os
 # Add the parent directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import FastAPI
-from dotenv import load_dotenv
-import uvicorn
-import os
-from pathlib import Path
-from threading import Thread
+from common.startup_profiler import startup_profiler
+
+with startup_profiler.phase("imports", trace_imports=True):
+    from fastapi import FastAPI
+    import uvicorn
+    from threading import Thread
 
-# 导入公共组件
-from common.redis_client import RedisClient
-from common.rabbitmq_client import RabbitMQClient
-from common.logger import setup_logger, get_logger
-from audio_service.task_handler.audio_task_handler import AudioTaskHandler
+    # 导入公共组件
+    from common.redis_client import RedisClient
+    from common.rabbitmq_client import RabbitMQClient
+    from common.logger import setup_logger, get_logger
+    from common.tracing import tracer
+    from common.metrics import metrics_response
+    from common.health import service_health
+    from common.config import settings
+    from common.tunables import tunables
 
-# 加载环境变量
-load_dotenv()
+    # torch和TTS在首次合成时才导入
+    from audio_service.task_handler.audio_task_handler import AudioTaskHandler
+    from audio_service.audio_processor.segment_cache import segment_cache
+    from audio_service.audio_processor.reference_selector import reference_selector
+    from common.scratch import scratch_space
 
 # 初始化日志系统
-setup_logger("audio_service")
-logger = get_logger()
+with startup_profiler.phase("logging"):
+    setup_logger("audio_service")
+    tracer.set_service("audio_service")
+    logger = get_logger()
 
 # 创建FastAPI应用
 app = FastAPI(title="Audio Clone Service", version="1.0.0")
+app.include_router(service_health.router())
+app.include_router(tunables.router())
 
 # 初始化RabbitMQ客户端和音频任务处理器
-mq_client = RabbitMQClient()
-task_handler = AudioTaskHandler()
+with startup_profiler.phase("rabbitmq"):
+    mq_client = RabbitMQClient()
+with startup_profiler.phase("handler_init"):
+    task_handler = AudioTaskHandler()
 
 @app.on_event("startup")
 async def startup_event():
@@ -38,13 +51,31 @@ async def startup_event():
         # 确保音频输出目录存在
         os.makedirs("output", exist_ok=True)
         os.makedirs("output/temp", exist_ok=True)
+        tunables.start_watching()
         
-        # 开始消费音频任务队列
-        Thread(target=mq_client.consume, args=("audio_tasks", task_handler.handle_message)).start()
-        logger.info("音频克隆服务启动成功")
+        # 模型预热完成后才开始消费音频任务队列
+        service_health.start_when_warm(
+            warmup=task_handler.warm_up,
+            on_ready=lambda: Thread(target=mq_client.consume, args=("audio_tasks", task_handler.handle_message)).start()
+        )
+        logger.info("音频克隆服务启动成功，等待模型预热")
     except Exception as e:
         logger.error(f"服务启动失败: {str(e)}")
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """分句合成缓存和参考音频预处理缓存的命中率，以及临时目录占用"""
+    return {
+        "tts_segments": segment_cache.stats(),
+        "references": reference_selector.stats(),
+        "scratch": scratch_space.stats(),
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus指标接口"""
+    return metrics_response()
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """服务关闭时的处理"""
@@ -54,5 +85,5 @@ async def shutdown_event():
     logger.info("音频克隆服务关闭")
 
 if __name__ == "__main__":
-    port = int(os.getenv("AUDIO_SERVICE_PORT", 8002))
+    port = settings.services.audio_port
     uvicorn.run("audio_service.main:app", host="0.0.0.0", port=port, reload=True)
\ No newline at end of file
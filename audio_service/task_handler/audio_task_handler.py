@@ -1,97 +1,175 @@
 import json
 import os
-import torch
+import shutil
 from pathlib import Path
-from threading import Thread
-from TTS.api import TTS
+from threading import Lock, Thread
 from common.redis_client import RedisClient
 from common.logger import get_logger
 from common.rabbitmq_client import RabbitMQClient
-from common.message_pusher import MessagePusher
+from common.message_pusher import message_pusher
+from common.metrics import STAGE_DURATION, TASKS_TOTAL, TASKS_IN_FLIGHT
+from common.tracing import tracer
+from common.result_cache import GENERATION_PARAMS, content_hash
+from common.scratch import scratch_space
+from common.cancellation import cancellation, TaskCancelled
+from common.progress import progress_reporter
 from audio_service.audio_processor.audio_converter import AudioConverter
 from audio_service.audio_processor.text_processor import TextProcessor
+from audio_service.audio_processor.segment_cache import segment_cache
+from audio_service.audio_processor.xtts_voice import XttsVoice
 
 logger = get_logger()
 
+# XTTS模型路径
+XTTS_MODEL_PATH = os.getenv("XTTS_MODEL_PATH", "/home/featurize/training/tts_models/nl/mozilla/xtts2/")
+XTTS_CONFIG_PATH = os.getenv("XTTS_CONFIG_PATH", "/home/featurize/training/tts_models/nl/mozilla/xtts2/config.json")
+
+# 音频阶段已结束的任务状态，重新投递的消息遇到这些状态时直接跳过
+FINAL_STATUSES = {"2", "3", "4", "failed", "cancelled"}
+
+# 预热配置：未提供参考音频时只加载模型，不做推理
+AUDIO_WARMUP_REFERENCE = os.getenv("AUDIO_WARMUP_REFERENCE", "")
+AUDIO_WARMUP_TEXT = os.getenv("AUDIO_WARMUP_TEXT", "Dit is een opwarmzin.")
+
 class AudioTaskHandler:
     def __init__(self):
         self.redis_client = RedisClient.get_client()
         self.output_dir = Path("uploads")
         self.finial_dir = self.output_dir / "out_audio"
-        self.temp_dir = self.output_dir / "temp"
+        self._voice = None
+        self._voice_lock = Lock()
         
         # 确保输出目录存在
         self.output_dir.mkdir(exist_ok=True)
         self.finial_dir.mkdir(exist_ok=True)
-        self.temp_dir.mkdir(exist_ok=True)
+
+    def get_voice(self) -> XttsVoice:
+        """获取常驻的XTTS模型，首次调用时加载"""
+        if self._voice is None:
+            with self._voice_lock:
+                if self._voice is None:
+                    self._voice = XttsVoice.load(XTTS_MODEL_PATH, XTTS_CONFIG_PATH)
+        return self._voice
+
+    def warm_up(self):
+        """加载模型并合成一句预热文本，使首个任务不承担冷启动开销"""
+        voice = self.get_voice()
+        if not AUDIO_WARMUP_REFERENCE:
+            logger.warning("未配置AUDIO_WARMUP_REFERENCE，仅加载模型，跳过预热推理")
+            return
+        with scratch_space.task_dir(f"warmup_{os.getpid()}", "audio", ram=True) as work_dir, \
+                STAGE_DURATION.labels(stage="tts_warmup").time():
+            conditioning = voice.conditioning_for(AUDIO_WARMUP_REFERENCE)
+            voice.synthesize_to_file(
+                text=AUDIO_WARMUP_TEXT,
+                conditioning=conditioning,
+                language=GENERATION_PARAMS["language"],
+                file_path=str(work_dir / "warmup.wav"),
+            )
+        logger.info("TTS模型预热完成")
+
+    def _already_processed(self, task_id: str) -> bool:
+        """消息确认前进程退出或连接断开时消息会被重新投递，已完成音频阶段的任务不再重复合成"""
+        stored = self.redis_client.get(f"task:{task_id}")
+        if not stored:
+            return False
+        try:
+            return json.loads(stored).get("status") in FINAL_STATUSES
+        except (TypeError, ValueError):
+            return False
 
     def process_audio_task(self, task_data: dict):
-        """处理音频生成任务"""
+        """处理音频生成任务
+
+        条件潜变量在首个未命中缓存的分段前获取，同一参考音频（如批量任务的各条目）在进程内复用。
+        """
+        conditioning = None
         try:
             task_id = task_data["task_id"]
             task_type = task_data.get("type", "tts")
             logger.info(f"开始处理音频任务: {task_id}, 类型: {task_type}")
+            # 排队期间已取消的任务直接跳过
+            cancellation.check(task_id)
+            if self._already_processed(task_id):
+                logger.info(f"音频任务已处理，跳过重新投递的消息: {task_id}")
+                return
 
             # 更新任务状态为处理中
             task_data["status"] = "1"
             self.redis_client.set(f"task:{task_id}", json.dumps(task_data))
 
-            # 先将参考音频转换为WAV格式
-            reference_audio = task_data["audio_path"]
-            if reference_audio and not reference_audio.endswith(".wav"):
-                wav_reference = self.temp_dir / f"ref_{task_id}.wav"
-                if AudioConverter.convert_to_wav(reference_audio, str(wav_reference)):
-                    reference_audio = str(wav_reference)
-                    task_data["reference_audio_wav"] = str(wav_reference)
-                    self.redis_client.set(f"task:{task_id}", json.dumps(task_data))
-            device = torch.device('cuda:0')
-            # 初始化TTS引擎
-            tts = TTS(
-                model_path="/home/featurize/training/tts_models/nl/mozilla/xtts2/",
-                config_path="/home/featurize/training/tts_models/nl/mozilla/xtts2/config.json"
-            ).to(device)
-
-            # 分段处理文本
-            text = task_data.get("text", "")
-            segments = TextProcessor.split_text(text)
-            segment_files = []
-
-            for i, segment in enumerate(segments):
-                if not segment:
-                    continue
-                print(segment)
-                # 生成每个分段的临时文件路径
-                temp_path = self.temp_dir / f"segment_{task_id}_{i}.wav"
-                
-                # 根据任务类型生成音频
-                tts.tts_to_file(
-                        text=segment,
-                        file_path=str(temp_path),
-                        speaker_wav=reference_audio,
-                        language="nl",
-                    )
-                
-                segment_files.append(str(temp_path))
-
-            # 合并所有音频片段
-            final_output = self.finial_dir / f"audio_{task_id}.wav"
-            if len(segment_files) > 1:
-                success = AudioConverter.merge_audio_files(segment_files, str(final_output))
-            elif len(segment_files) == 1:
-                # 如果只有一个片段，直接重命名
-                os.rename(segment_files[0], str(final_output))
-                success = True
-            else:
-                success = False
+            # 分段音频等中间文件放在任务临时目录中，任务结束后统一删除
+            with scratch_space.task_dir(task_id, "audio", ram=True) as work_dir, \
+                    progress_reporter.track(task_id, "audio"):
+                # 参考音频在进程内直接解码为模型采样率的数组，条件潜变量在首个未命中缓存的分段前获取
+                voice = self.get_voice()
+                language = GENERATION_PARAMS["language"]
+
+                # 分段处理文本，启用分句缓存时按句切分以便复用
+                text = task_data.get("text", "")
+                if segment_cache.enabled:
+                    segments = TextProcessor.split_sentences(text)
+                    voice_hash = content_hash(task_data["audio_path"])
+                else:
+                    segments = TextProcessor.split_text(text)
+                segment_files = []
+                progress_reporter.set_total(sum(1 for segment in segments if segment))
+
+                for i, segment in enumerate(segments):
+                    if not segment:
+                        continue
+                    cancellation.check(task_id)
+                    # 生成每个分段的临时文件路径
+                    temp_path = work_dir / f"segment_{i}.wav"
+
+                    cache_key = segment_cache.make_key(segment, voice_hash, language) if segment_cache.enabled else None
+                    if cache_key and segment_cache.fetch(cache_key, str(temp_path)):
+                        segment_files.append(str(temp_path))
+                        progress_reporter.advance()
+                        continue
+
+                    # 根据任务类型生成音频
+                    if conditioning is None:
+                        conditioning = voice.conditioning_for(task_data["audio_path"])
+                    with STAGE_DURATION.labels(stage="tts_segment").time():
+                        voice.synthesize_to_file(
+                            text=segment,
+                            conditioning=conditioning,
+                            language=language,
+                            file_path=str(temp_path),
+                        )
+                    if cache_key:
+                        segment_cache.store(cache_key, str(temp_path))
+
+                    segment_files.append(str(temp_path))
+                    progress_reporter.advance()
+
+                if segment_cache.enabled:
+                    logger.info(f"分句缓存统计: {segment_cache.stats()}")
+
+                # 合并所有音频片段
+                final_output = self.finial_dir / f"audio_{task_id}.wav"
+                if len(segment_files) > 1:
+                    with STAGE_DURATION.labels(stage="audio_merge").time():
+                        success = AudioConverter.merge_audio_files(segment_files, str(final_output))
+                elif len(segment_files) == 1:
+                    # 如果只有一个片段，直接移动（临时目录可能位于内存文件系统上）
+                    shutil.move(segment_files[0], str(final_output))
+                    success = True
+                else:
+                    success = False
+
 
             if success:
+                # 合并期间被取消时不再通知视频服务
+                cancellation.check(task_id)
                 # 更新任务状态为完成
                 task_data["status"] = "2"
                 task_data["audio_output_path"] = str(final_output)
                 self.redis_client.set(f"task:{task_id}", json.dumps(task_data))
                 url = str(final_output).replace("uploads", "static")
                 # 发送SSE通知
-                MessagePusher.push_message(task_id,
+                message_pusher.push_message(task_id,
                                            f"audio_task_completed,path:<a>{url}</a>","1")
 
                 # 发送MQ消息通知视频服务
@@ -118,18 +196,22 @@ class AudioTaskHandler:
                 )
 
                 logger.info(f"音频克隆任务完成: {task_id}")
-
-                # 清理临时文件
-                for file in segment_files:
-                    try:
-                        os.remove(file)
-                    except Exception as e:
-                        logger.warning(f"清理临时文件失败: {str(e)}")
+                TASKS_TOTAL.labels(service="audio", outcome="completed").inc()
             else:
                 raise Exception("音频处理失败")
 
+        except TaskCancelled:
+            logger.info(f"音频任务已取消: {task_id}")
+            TASKS_TOTAL.labels(service="audio", outcome="cancelled").inc()
+            # 分段文件随临时目录删除，这里只需删除已合并的输出
+            (self.finial_dir / f"audio_{task_id}.wav").unlink(missing_ok=True)
+            task_data["status"] = "cancelled"
+            self.redis_client.set(f"task:{task_id}", json.dumps(task_data))
+            message_pusher.push_message(task_id, "task_cancelled", "cancelled")
+
         except Exception as e:
             logger.error(f"音频克隆任务失败: {str(e)}")
+            TASKS_TOTAL.labels(service="audio", outcome="failed").inc()
             task_data["status"] = "failed"
             task_data["error"] = str(e)
             self.redis_client.set(f"task:{task_id}", json.dumps(task_data))
@@ -137,9 +219,9 @@ class AudioTaskHandler:
     def handle_message(self, ch, method, properties, body):
         """处理从消息队列接收到的音频任务"""
         try:
-            print(f"收到消息:{body}")
             task_data = json.loads(body)
             # 在新线程中处理任务，避免阻塞消息队列
-            self.process_audio_task(task_data)
+            with TASKS_IN_FLIGHT.labels(service="audio").track_inprogress(), tracer.span("audio.process"):
+                self.process_audio_task(task_data)
         except Exception as e:
             logger.error(f"处理音频任务消息失败: {str(e)}")
@@ -0,0 +1,258 @@
+"""API服务HTTP压测，包括SSE广播扇出
+
+在子进程中启动 api_service.main:app（Redis/RabbitMQ使用进程内替身），
+并发请求上传、任务提交、任务列表和任务查询接口，同时建立N个 /events 订阅，
+统计各接口延迟分布、事件送达延迟以及每个SSE连接占用的服务端内存。
+
+用法:
+    python -m benchmarks.api_load_test --sse-clients 500 --requests 200 --concurrency 20
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+# Add the parent directory to the Python path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+from benchmarks.pipeline_benchmark import prepare_environment, summarize
+
+
+def serve(port: int) -> None:
+    """子进程入口：安装替身后启动API服务"""
+    import uvicorn
+
+    prepare_environment(Path(tempfile.mkdtemp(prefix="api_load_")))
+
+    from benchmarks import standins
+    standins.install_backends(standins.InProcessBroker(), standins.FakeRedis())
+
+    from api_service.main import app
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def server_rss_kb(pid: int) -> Optional[int]:
+    """读取服务进程常驻内存（KB），仅支持Linux"""
+    try:
+        with open(f"/proc/{pid}/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def sample_wav() -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(24000)
+        f.writeframes(b"\x00\x00" * 24000)
+    return buffer.getvalue()
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 30) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if (await client.get("/health/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError("API服务启动超时")
+
+
+async def run_endpoint(client: httpx.AsyncClient, name: str, make_request, total: int, concurrency: int) -> Dict:
+    """以固定并发执行同一接口的请求，统计延迟和错误数"""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await make_request(i)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "endpoint": name,
+        "requests": total,
+        "errors": errors,
+        "rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "latency": summarize(latencies),
+    }
+
+
+async def run_sse(base_url: str, pid: int, clients: int, events: int, event_interval: float) -> Dict:
+    """建立N个SSE订阅，广播事件并测量送达延迟和每连接内存"""
+    lags: List[float] = []
+    connect_times: List[float] = []
+    connected = 0
+    all_connected = asyncio.Event()
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+
+    rss_before = server_rss_kb(pid)
+
+    async def subscriber(client: httpx.AsyncClient):
+        nonlocal connected
+        start = time.perf_counter()
+        received = 0
+        async with client.stream("GET", "/events") as response:
+            connect_times.append(time.perf_counter() - start)
+            connected += 1
+            if connected == clients:
+                all_connected.set()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = json.loads(line[5:].strip())
+                lags.append(time.time() - payload["message"]["sent_at"])
+                received += 1
+                if received >= events:
+                    return
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=None) as client:
+        tasks = [asyncio.create_task(subscriber(client)) for _ in range(clients)]
+        await asyncio.wait_for(all_connected.wait(), timeout=120)
+        # SSE生成器在首次读取队列前才注册连接，稍作等待
+        await asyncio.sleep(0.5)
+        rss_connected = server_rss_kb(pid)
+
+        async with httpx.AsyncClient(base_url=base_url) as sender:
+            for seq in range(events):
+                await sender.post("/send_event", json={"seq": seq, "sent_at": time.time()})
+                await asyncio.sleep(event_interval)
+
+        await asyncio.wait(tasks, timeout=60)
+        for task in tasks:
+            task.cancel()
+
+    per_connection_kb = None
+    if rss_before is not None and rss_connected is not None:
+        per_connection_kb = round((rss_connected - rss_before) / clients, 2)
+
+    return {
+        "clients": clients,
+        "events": events,
+        "delivered": len(lags),
+        "expected": clients * events,
+        "connect": summarize(connect_times),
+        "delivery_lag": summarize(lags),
+        "server_rss_kb_before": rss_before,
+        "server_rss_kb_connected": rss_connected,
+        "rss_kb_per_connection": per_connection_kb,
+    }
+
+
+async def run_load(args, pid: int) -> Dict:
+    base_url = f"http://127.0.0.1:{args.port}"
+    wav_bytes = sample_wav()
+    mp4_bytes = os.urandom(64 * 1024)
+    task_ids: List[str] = []
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        await wait_ready(client)
+
+        audio = await client.post("/audio/upload", files={"file": ("ref.wav", wav_bytes, "audio/wav")})
+        video = await client.post("/video/upload", files={"file": ("avatar.mp4", mp4_bytes, "video/mp4")})
+        audio_path = audio.json()["file_path"]
+        video_path = video.json()["file_path"]
+
+        async def generate(i):
+            response = await client.post("/generate/task", json={
+                "text": f"Load test script #{i}.",
+                "audio_path": audio_path,
+                "video_path": video_path,
+                "use_cache": False,
+            })
+            if response.status_code == 200:
+                task_ids.append(response.json()["task_id"])
+            return response
+
+        endpoints = [
+            ("POST /audio/upload", lambda i: client.post("/audio/upload", files={"file": ("ref.wav", wav_bytes, "audio/wav")})),
+            ("POST /video/upload", lambda i: client.post("/video/upload", files={"file": ("avatar.mp4", mp4_bytes, "video/mp4")})),
+            ("POST /generate/task", generate),
+            ("GET /generate/tasks", lambda i: client.get("/generate/tasks", params={"page": 1, "page_size": 20})),
+            ("GET /generate/task/{id}", lambda i: client.get(f"/generate/task/{task_ids[i % len(task_ids)]}")),
+        ]
+        results = []
+        for name, make_request in endpoints:
+            results.append(await run_endpoint(client, name, make_request, args.requests, args.concurrency))
+
+    sse = await run_sse(base_url, pid, args.sse_clients, args.events, args.event_interval)
+    return {"endpoints": results, "sse": sse}
+
+
+def print_report(result: Dict) -> None:
+    print(f"{'endpoint':<26} {'reqs':>6} {'err':>5} {'rps':>9} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for item in result["endpoints"]:
+        latency = item["latency"]
+        print(f"{item['endpoint']:<26} {item['requests']:>6} {item['errors']:>5} {item['rps']:>9} "
+              f"{latency['mean']:>8.4f} {latency['p50']:>8.4f} {latency['p95']:>8.4f} {latency['p99']:>8.4f}")
+
+    sse = result["sse"]
+    print(f"\nSSE: {sse['clients']} clients, delivered {sse['delivered']}/{sse['expected']} events")
+    print(f"  connect      p50 {sse['connect']['p50']:.4f}s  p95 {sse['connect']['p95']:.4f}s  p99 {sse['connect']['p99']:.4f}s")
+    print(f"  delivery lag p50 {sse['delivery_lag']['p50']:.4f}s  p95 {sse['delivery_lag']['p95']:.4f}s  p99 {sse['delivery_lag']['p99']:.4f}s")
+    print(f"  server RSS {sse['server_rss_kb_before']} KB -> {sse['server_rss_kb_connected']} KB, "
+          f"{sse['rss_kb_per_connection']} KB/connection")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API服务HTTP压测")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--requests", type=int, default=200, help="每个接口的请求数")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--sse-clients", type=int, default=200)
+    parser.add_argument("--events", type=int, default=20, help="广播事件数")
+    parser.add_argument("--event-interval", type=float, default=0.05)
+    parser.add_argument("--output", help="结果保存为JSON文件")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port)
+        return
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.api_load_test", "--serve", "--port", str(args.port)],
+        cwd=PROJECT_ROOT,
+    )
+    try:
+        result = asyncio.run(run_load(args, server.pid))
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    print_report(result)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
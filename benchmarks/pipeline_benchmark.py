@@ -0,0 +1,282 @@
+"""端到端流水线基准测试
+
+在单进程内运行真实的 api_service、AudioTaskHandler 和 VideoTaskHandler 代码，
+Redis/RabbitMQ 使用进程内替身，模型使用可配置延迟的替身，无需GPU和模型权重。
+统计吞吐量、端到端延迟分位数和各阶段框架开销，结果保存为JSON以便跨版本对比。
+
+用法:
+    python -m benchmarks.pipeline_benchmark --tasks 200 --audio-workers 2 --video-workers 2
+    python -m benchmarks.pipeline_benchmark --compare benchmarks/results/pipeline_20260101_120000.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+# Add the parent directory to the Python path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+RESULTS_DIR = Path(PROJECT_ROOT) / "benchmarks" / "results"
+
+DEFAULT_TEXT = "Halo! Selamat datang di sesi pengetahuan finansial bersama kami. Terima kasih."
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """最近秩法计算分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "mean": round(sum(values) / len(values), 6) if values else 0.0,
+        "p50": round(percentile(values, 50), 6),
+        "p95": round(percentile(values, 95), 6),
+        "p99": round(percentile(values, 99), 6),
+    }
+
+
+def prepare_environment(workspace: Path, result_cache: bool = False, segment_cache: bool = False) -> None:
+    """在导入服务模块之前设置环境变量，所有文件写入临时工作目录"""
+    os.environ.update({
+        "UPLOAD_BASE_PATH": str(workspace / "uploads"),
+        "TRACE_DIR": str(workspace / "traces"),
+        "LOG_DIR": str(workspace / "logs"),
+        "LOG_LEVEL": "WARNING",
+        "VIDEO_CHUNK_ENABLED": "false",
+        "RESULT_CACHE_ENABLED": "true" if result_cache else "false",
+        "TTS_SEGMENT_CACHE_ENABLED": "true" if segment_cache else "false",
+        "TTS_SEGMENT_CACHE_DIR": str(workspace / "cache" / "tts_segments"),
+        "AUDIO_FEATURE_CACHE_DIR": str(workspace / "cache" / "audio_features"),
+        "SCRATCH_DIR": str(workspace / "scratch"),
+        # 突发提交时替身模型尚未上报处理耗时，按默认耗时估算会触发准入拒绝
+        "ADMISSION_ENABLED": "false",
+    })
+    for sub in ("uploads/audio", "uploads/video", "uploads/out_audio", "uploads/out_video"):
+        (workspace / sub).mkdir(parents=True, exist_ok=True)
+    os.chdir(workspace)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def run_benchmark(args) -> Dict:
+    workspace = Path(tempfile.mkdtemp(prefix="pipeline_bench_"))
+    prepare_environment(workspace, args.result_cache, args.segment_cache)
+
+    from benchmarks import standins
+
+    broker = standins.InProcessBroker()
+    redis = standins.FakeRedis()
+    standins.install_backends(broker, redis)
+
+    from fastapi.testclient import TestClient
+    from api_service.main import app
+    from audio_service.task_handler.audio_task_handler import AudioTaskHandler
+    from video_service.task_handler.video_task_handler import VideoTaskHandler
+    from common.rabbitmq_client import RabbitMQClient
+    from common.message_pusher import message_pusher
+    from common.tracing import tracer
+
+    standins.StubTTS.latency = args.tts_latency
+    standins.StubLatentSyncGenerator.latency = args.lipsync_latency
+    tts_factory = standins.load_object(args.tts_stub) if args.tts_stub else standins.StubTTS
+    lipsync_cls = standins.load_object(args.lipsync_stub) if args.lipsync_stub else standins.StubLatentSyncGenerator
+    standins.install_models(tts_factory, lipsync_cls)
+
+    client = TestClient(app)
+    # SSE通知走API服务真实的 /send_event 路由
+    message_pusher.send_event_notification = lambda task_id, event=None: client.post(
+        "/send_event", json=message_pusher.event_body(task_id, event)
+    ).status_code == 200
+
+    # 输入文件：WAV参考音频跳过ffmpeg转换，视频内容仅用于复制
+    audio_path = workspace / "uploads" / "audio" / "reference.wav"
+    video_path = workspace / "uploads" / "video" / "avatar.mp4"
+    standins.write_silence(str(audio_path), 3.0)
+    video_path.write_bytes(os.urandom(256 * 1024))
+
+    # 启动工作线程，每个线程独立的MQ客户端，与服务进程中的消费方式一致
+    audio_handler = AudioTaskHandler()
+    video_handler = VideoTaskHandler()
+    workers = []
+    for queue_name, handler, count in (("audio_tasks", audio_handler, args.audio_workers),
+                                       ("video_tasks", video_handler, args.video_workers)):
+        for _ in range(count):
+            mq_client = RabbitMQClient()
+            mq_client.declare_exchange("ai_service")
+            mq_client.declare_queue(queue_name)
+            mq_client.bind_queue(queue_name, "ai_service", queue_name)
+            worker = threading.Thread(target=mq_client.consume, args=(queue_name, handler.handle_message), daemon=True)
+            worker.start()
+            workers.append(worker)
+
+    # TestClient不执行lifespan，与API服务启动时一致先读取一次队列状态供准入控制使用
+    from api_service.services.admission import admission_controller
+    admission_controller.refresh()
+
+    submitted: Dict[str, float] = {}
+    finished: Dict[str, float] = {}
+    failed: List[str] = []
+
+    bench_start = time.perf_counter()
+    texts = [args.text if args.repeat_text else f"{args.text} #{i}" for i in range(args.tasks)]
+    if args.batch:
+        # 所有文本在一个批量请求中提交
+        response = client.post("/generate/batch", json={
+            "texts": texts,
+            "audio_path": str(audio_path),
+            "video_path": str(video_path),
+        })
+        response.raise_for_status()
+        for item in response.json()["items"]:
+            submitted[item["task_id"]] = time.perf_counter()
+    for text in ([] if args.batch else texts):
+        response = client.post("/generate/task", json={
+            "text": text,
+            "audio_path": str(audio_path),
+            "video_path": str(video_path),
+        })
+        response.raise_for_status()
+        submitted[response.json()["task_id"]] = time.perf_counter()
+        if args.interval:
+            time.sleep(args.interval)
+
+    deadline = time.time() + args.timeout
+    pending = set(submitted)
+    while pending and time.time() < deadline:
+        for task_id in list(pending):
+            task = json.loads(redis.get(f"task:{task_id}") or "{}")
+            if task.get("status") == "4":
+                finished[task_id] = time.perf_counter()
+                pending.discard(task_id)
+            elif task.get("status") == "failed":
+                failed.append(task_id)
+                pending.discard(task_id)
+        time.sleep(0.005)
+    wall_time = time.perf_counter() - bench_start
+    broker.stop()
+
+    latencies = [finished[t] - submitted[t] for t in finished]
+
+    # 按阶段汇总追踪数据，工作进程的计算耗时减去替身模型耗时即为框架开销
+    stage_durations = defaultdict(list)
+    framework_overhead = []
+    for task_id in finished:
+        trace_id = json.loads(redis.get(f"task:{task_id}"))["trace_id"]
+        compute_seconds = 0.0
+        for stage in tracer.timeline(trace_id)["stages"]:
+            stage_durations[stage["name"]].append(stage["duration"])
+            if stage["kind"] == "compute" and stage["name"] != "api.submit":
+                compute_seconds += stage["duration"]
+        framework_overhead.append(compute_seconds - standins.model_clock.seconds.get(task_id, 0.0))
+
+    return {
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(),
+        "config": {
+            "tasks": args.tasks,
+            "audio_workers": args.audio_workers,
+            "video_workers": args.video_workers,
+            "tts_latency": args.tts_latency,
+            "lipsync_latency": args.lipsync_latency,
+            "interval": args.interval,
+            "result_cache": args.result_cache,
+            "segment_cache": args.segment_cache,
+            "batch": args.batch,
+        },
+        "completed": len(finished),
+        "failed": len(failed),
+        "timed_out": len(pending),
+        "wall_seconds": round(wall_time, 3),
+        "tasks_per_second": round(len(finished) / wall_time, 3) if wall_time else 0.0,
+        "latency": summarize(latencies),
+        "stages": {name: summarize(values) for name, values in sorted(stage_durations.items())},
+        "framework_overhead": summarize(framework_overhead),
+    }
+
+
+def print_report(result: Dict, baseline: Dict = None) -> None:
+    print(f"revision {result['revision']}  completed {result['completed']}  failed {result['failed']}  "
+          f"timed out {result['timed_out']}")
+    line = f"throughput {result['tasks_per_second']} tasks/s"
+    if baseline:
+        line += f"  (baseline {baseline['tasks_per_second']}, {_delta(result['tasks_per_second'], baseline['tasks_per_second'])})"
+    print(line)
+
+    print(f"\n{'metric':<28} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    rows = [("end_to_end", result["latency"], (baseline or {}).get("latency"))]
+    rows += [(name, values, (baseline or {}).get("stages", {}).get(name)) for name, values in result["stages"].items()]
+    rows.append(("framework_overhead", result["framework_overhead"], (baseline or {}).get("framework_overhead")))
+    for name, values, base in rows:
+        print(f"{name:<28} {values['mean']:>9.4f} {values['p50']:>9.4f} {values['p95']:>9.4f} {values['p99']:>9.4f}")
+        if base:
+            print(f"{'  vs baseline p95':<28} {'':>9} {'':>9} {_delta(values['p95'], base['p95']):>9}")
+
+
+def _delta(current: float, baseline: float) -> str:
+    if not baseline:
+        return "n/a"
+    return f"{(current - baseline) / baseline * 100:+.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端流水线基准测试")
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--audio-workers", type=int, default=1)
+    parser.add_argument("--video-workers", type=int, default=1)
+    parser.add_argument("--tts-latency", type=float, default=0.05, help="替身TTS每个分段的延迟（秒）")
+    parser.add_argument("--lipsync-latency", type=float, default=0.2, help="替身LatentSync每个任务的延迟（秒）")
+    parser.add_argument("--tts-stub", help="自定义TTS替身工厂，格式 package.module:Name")
+    parser.add_argument("--lipsync-stub", help="自定义LatentSync替身类，格式 package.module:Name")
+    parser.add_argument("--text", default=DEFAULT_TEXT)
+    parser.add_argument("--repeat-text", action="store_true", help="所有任务使用相同文本（测试缓存命中）")
+    parser.add_argument("--result-cache", action="store_true", help="启用整体结果缓存")
+    parser.add_argument("--segment-cache", action="store_true", help="启用分句合成缓存")
+    parser.add_argument("--batch", action="store_true", help="通过 /generate/batch 一次提交全部任务")
+    parser.add_argument("--interval", type=float, default=0.0, help="提交间隔（秒），0表示突发提交")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--compare", help="与指定的历史结果对比")
+    parser.add_argument("--no-save", action="store_true", help="不保存结果")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    result = run_benchmark(args)
+    print_report(result, baseline)
+
+    if not args.no_save:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        output = RESULTS_DIR / f"pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{result['revision']}.json"
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\n结果已保存: {output}")
+
+    # 工作线程阻塞在消费循环中，直接退出进程
+    sys.stdout.flush()
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
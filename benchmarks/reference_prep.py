@@ -0,0 +1,79 @@
+"""比较参考音频预处理（去除静音、选取最佳片段、缓存）前后的条件潜变量准备耗时
+
+准备耗时 = 参考音频解码/加载 + 计算条件潜变量，三种情况分别为：
+    full      整段参考音频
+    selected  首次提交：解码后去除静音并选取最佳片段
+    cached    再次提交：直接读取缓存的片段
+
+用法:
+    python -m benchmarks.reference_prep --speaker-wav long_ref.mp3 --repeats 3
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_service.audio_processor.reference_selector import ReferenceSelector, decode_reference
+from audio_service.audio_processor.xtts_voice import XttsVoice
+from audio_service.task_handler.audio_task_handler import XTTS_MODEL_PATH, XTTS_CONFIG_PATH
+
+
+def measure(prepare, voice: XttsVoice, repeats: int) -> dict:
+    """重复执行 prepare() + condition()，返回平均耗时和参考音频时长"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        reference = prepare()
+        voice.condition(reference)
+        timings.append(time.perf_counter() - start)
+    return {
+        "reference_seconds": round(len(reference) / voice.CONDITIONING_SAMPLE_RATE, 2),
+        "mean_seconds": round(sum(timings) / len(timings), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="参考音频预处理加速对比")
+    parser.add_argument("--speaker-wav", required=True, help="参考音频路径（建议使用较长且含静音的录音）")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="结果保存为JSON文件")
+    args = parser.parse_args()
+
+    voice = XttsVoice.load(XTTS_MODEL_PATH, XTTS_CONFIG_PATH)
+    sample_rate = voice.CONDITIONING_SAMPLE_RATE
+    # 预热一次，排除首次推理的初始化开销
+    voice.condition(decode_reference(args.speaker_wav, sample_rate))
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        selector = ReferenceSelector(cache_dir=cache_dir, enabled=True)
+
+        def prepare_selected():
+            # 每次清空缓存，测量未命中时的耗时
+            for entry in os.listdir(cache_dir):
+                os.remove(os.path.join(cache_dir, entry))
+            return selector.load(args.speaker_wav, sample_rate)
+
+        results = {
+            "full": measure(lambda: decode_reference(args.speaker_wav, sample_rate), voice, args.repeats),
+            "selected": measure(prepare_selected, voice, args.repeats),
+            "cached": measure(lambda: selector.load(args.speaker_wav, sample_rate), voice, args.repeats),
+        }
+
+    baseline = results["full"]["mean_seconds"]
+    print(f"{'case':<10} {'ref(s)':>8} {'prepare(s)':>11} {'speedup':>8}")
+    for case, result in results.items():
+        result["speedup"] = round(baseline / result["mean_seconds"], 2)
+        print(f"{case:<10} {result['reference_seconds']:>8} {result['mean_seconds']:>11} {result['speedup']:>8}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
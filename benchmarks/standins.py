@@ -0,0 +1,365 @@
+"""基准测试使用的进程内替身
+
+替换外部依赖（Redis、RabbitMQ、XTTS、LatentSync、ffmpeg），
+使 api_service 和各任务处理器的真实代码路径可以在单进程内运行。
+"""
+import fnmatch
+import importlib
+import queue
+import shutil
+import sys
+import threading
+import time
+import types
+import wave
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+
+class FakeRedis:
+    """线程安全的内存Redis，实现项目中用到的命令子集"""
+
+    def __init__(self):
+        self._data: Dict[str, Any] = {}
+        self._expire_at: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def _alive(self, key: str) -> bool:
+        expire_at = self._expire_at.get(key)
+        if expire_at is not None and expire_at <= time.time():
+            self._data.pop(key, None)
+            self._expire_at.pop(key, None)
+        return key in self._data
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._data.get(key) if self._alive(key) else None
+
+    def set(self, key: str, value: Any, ex: Optional[int] = None, nx: bool = False, **kwargs) -> bool:
+        with self._lock:
+            if nx and self._alive(key):
+                return False
+            self._data[key] = str(value)
+            self._expire_at.pop(key, None)
+            if ex:
+                self._expire_at[key] = time.time() + ex
+            return True
+
+    def mset(self, mapping: Dict[str, Any]) -> bool:
+        with self._lock:
+            for key, value in mapping.items():
+                self.set(key, value)
+            return True
+
+    def mget(self, keys: List[str]) -> List[Optional[str]]:
+        with self._lock:
+            return [self.get(key) for key in keys]
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if self._alive(key):
+                    removed += 1
+                self._data.pop(key, None)
+                self._expire_at.pop(key, None)
+            return removed
+
+    def exists(self, *keys: str) -> int:
+        with self._lock:
+            return sum(1 for key in keys if self._alive(key))
+
+    def expire(self, key: str, seconds: int) -> bool:
+        with self._lock:
+            if not self._alive(key):
+                return False
+            self._expire_at[key] = time.time() + seconds
+            return True
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        with self._lock:
+            value = int(self._data.get(key, 0)) + amount if self._alive(key) else amount
+            self._data[key] = str(value)
+            return value
+
+    def hget(self, key: str, field: str) -> Optional[str]:
+        with self._lock:
+            return self._data.get(key, {}).get(field) if self._alive(key) else None
+
+    def hset(self, key: str, field: str, value: Any) -> int:
+        with self._lock:
+            if not self._alive(key):
+                self._data[key] = {}
+            is_new = field not in self._data[key]
+            self._data[key][field] = str(value)
+            return int(is_new)
+
+    def hincrby(self, key: str, field: str, amount: int = 1) -> int:
+        with self._lock:
+            if not self._alive(key):
+                self._data[key] = {}
+            value = int(self._data[key].get(field, 0)) + amount
+            self._data[key][field] = str(value)
+            return value
+
+    def hdel(self, key: str, *fields: str) -> int:
+        with self._lock:
+            if not self._alive(key):
+                return 0
+            return sum(1 for field in fields if self._data[key].pop(field, None) is not None)
+
+    def hgetall(self, key: str) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._data.get(key, {})) if self._alive(key) else {}
+
+    def keys(self, pattern: str = "*") -> List[str]:
+        with self._lock:
+            return [key for key in list(self._data) if self._alive(key) and fnmatch.fnmatchcase(key, pattern)]
+
+    def scan(self, cursor: int = 0, match: str = "*", count: int = 100):
+        return 0, self.keys(match)
+
+    def close(self) -> None:
+        pass
+
+
+class InProcessBroker:
+    """内存中的AMQP交换机与队列"""
+
+    def __init__(self):
+        self.queues: Dict[str, "queue.Queue"] = defaultdict(queue.Queue)
+        self.bindings: Dict[tuple, str] = {}
+        self.consumers: Dict[str, int] = defaultdict(int)
+        self.running = True
+        self._lock = threading.Lock()
+
+    def route(self, exchange: str, routing_key: str) -> Optional[str]:
+        if exchange == "":
+            # 默认交换机直接路由到同名队列，未声明的队列丢弃消息
+            return routing_key if routing_key in self.queues else None
+        return self.bindings.get((exchange, routing_key))
+
+    def stop(self) -> None:
+        self.running = False
+
+
+class FakeChannel:
+    """实现RabbitMQClient用到的pika channel接口"""
+
+    def __init__(self, broker: InProcessBroker, connection: "FakeConnection" = None):
+        self.broker = broker
+        self.connection = connection
+        self.is_open = True
+        self._consumers: List[tuple] = []
+        self._consuming = False
+        self._prefetch = 0
+        self._unacked = 0
+        self._unacked_lock = threading.Lock()
+
+    def exchange_declare(self, exchange: str, exchange_type: str = "direct", durable: bool = True, **kwargs):
+        pass
+
+    def queue_declare(self, queue: str, durable: bool = True, passive: bool = False, **kwargs):
+        with self.broker._lock:
+            message_count = self.broker.queues[queue].qsize()
+            consumer_count = self.broker.consumers[queue]
+        return SimpleNamespace(method=SimpleNamespace(queue=queue, message_count=message_count,
+                                                      consumer_count=consumer_count))
+
+    def queue_bind(self, queue: str, exchange: str, routing_key: str, **kwargs):
+        with self.broker._lock:
+            self.broker.bindings[(exchange, routing_key)] = queue
+
+    def basic_publish(self, exchange: str, routing_key: str, body, properties=None, **kwargs):
+        queue_name = self.broker.route(exchange, routing_key)
+        if queue_name is None:
+            return
+        headers = dict(getattr(properties, "headers", None) or {})
+        message_id = getattr(properties, "message_id", None)
+        self.broker.queues[queue_name].put((body if isinstance(body, bytes) else body.encode("utf-8"), headers,
+                                            message_id))
+
+    def basic_qos(self, prefetch_count: int = 0, **kwargs):
+        self._prefetch = prefetch_count
+
+    def basic_ack(self, delivery_tag=None, **kwargs):
+        with self._unacked_lock:
+            self._unacked -= 1
+
+    def basic_consume(self, queue: str, on_message_callback, auto_ack: bool = True, **kwargs):
+        self._consumers.append((queue, on_message_callback))
+        with self.broker._lock:
+            self.broker.consumers[queue] += 1
+
+    def start_consuming(self):
+        self._consuming = True
+        while self._consuming and self.broker.running:
+            if self.connection is not None:
+                self.connection.process_data_events()
+            for queue_name, callback in self._consumers:
+                # 与RabbitMQ一致，未确认的消息数达到prefetch时不再投递
+                if self._prefetch and self._unacked >= self._prefetch:
+                    time.sleep(0.01)
+                    continue
+                try:
+                    body, headers, message_id = self.broker.queues[queue_name].get(timeout=0.05)
+                except queue.Empty:
+                    continue
+                with self._unacked_lock:
+                    self._unacked += 1
+                method = SimpleNamespace(delivery_tag=None, routing_key=queue_name, redelivered=False)
+                callback(self, method, SimpleNamespace(headers=headers, message_id=message_id), body)
+
+    def stop_consuming(self):
+        self._consuming = False
+
+
+class FakeConnection:
+    def __init__(self):
+        self.is_closed = False
+        self._callbacks: "queue.Queue" = queue.Queue()
+
+    def add_callback_threadsafe(self, callback):
+        """与pika一致，回调在连接线程下一次处理事件时执行"""
+        self._callbacks.put(callback)
+
+    def process_data_events(self, time_limit=0):
+        while True:
+            try:
+                self._callbacks.get_nowait()()
+            except queue.Empty:
+                return
+
+    def close(self):
+        self.is_closed = True
+
+
+def install_backends(broker: InProcessBroker, redis: FakeRedis) -> None:
+    """将Redis和RabbitMQ客户端切换到进程内替身，需在服务模块导入前调用"""
+    from common.redis_client import RedisClient
+    from common.rabbitmq_client import RabbitMQClient
+
+    RedisClient._instance = redis
+
+    def connect(self):
+        self.connection = FakeConnection()
+        self.channel = FakeChannel(broker, self.connection)
+
+    RabbitMQClient.connect = connect
+
+
+class ModelClock:
+    """按任务累计替身模型的耗时，用于计算各阶段的框架开销"""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def sleep(self, seconds: float) -> None:
+        from common.tracing import tracer
+
+        time.sleep(seconds)
+        context = tracer.current()
+        if context and context.get("task_id"):
+            with self._lock:
+                self.seconds[context["task_id"]] += seconds
+
+
+model_clock = ModelClock()
+
+
+def write_silence(path: str, seconds: float, sample_rate: int = 24000) -> None:
+    """写入指定时长的静音WAV"""
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+
+
+class StubTTS:
+    """XTTS替身：每个分段固定延迟，输出时长与文本长度成正比的静音"""
+
+    latency = 0.05
+    seconds_per_char = 0.06
+
+    def __init__(self, *args, **kwargs):
+        self.synthesizer = SimpleNamespace(output_sample_rate=24000)
+
+    def tts_to_file(self, text: str, file_path: str, **kwargs) -> str:
+        model_clock.sleep(self.latency)
+        write_silence(file_path, max(0.2, len(text) * self.seconds_per_char))
+        return file_path
+
+    def tts(self, text: str, **kwargs) -> list:
+        model_clock.sleep(self.latency)
+        return [0.0] * int(max(0.2, len(text) * self.seconds_per_char) * 24000)
+
+
+class StubVoice:
+    """XttsVoice替身：参考音频不解码，合成委托给tts_factory创建的对象（需提供tts_to_file）"""
+
+    def __init__(self, tts):
+        self.tts = tts
+
+    def load_reference(self, audio_path: str) -> str:
+        return audio_path
+
+    def condition(self, reference: str) -> str:
+        return reference
+
+    def conditioning_for(self, audio_path: str) -> str:
+        return self.condition(self.load_reference(audio_path))
+
+    def synthesize_to_file(self, text: str, conditioning: str, language: str, file_path: str) -> str:
+        return self.tts.tts_to_file(text=text, file_path=file_path, speaker_wav=conditioning, language=language)
+
+
+class StubLatentSyncGenerator:
+    """LatentSync替身：固定延迟后将形象视频复制为输出"""
+
+    latency = 0.2
+
+    def process_video(self, video_path: str, audio_path: str, output_path: str = None, **kwargs) -> str:
+        model_clock.sleep(self.latency)
+        shutil.copyfile(video_path, output_path)
+        return output_path
+
+
+def merge_wavs(input_files: list, output_file: str) -> bool:
+    """ffmpeg concat的替身，按帧拼接同格式的WAV"""
+    with wave.open(input_files[0], "rb") as first:
+        params = first.getparams()
+    with wave.open(output_file, "wb") as out:
+        out.setparams(params)
+        for path in input_files:
+            with wave.open(path, "rb") as f:
+                out.writeframes(f.readframes(f.getnframes()))
+    return True
+
+
+def load_object(spec: str):
+    """按 'package.module:Name' 加载对象，用于替换替身模型"""
+    module_name, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def install_models(tts_factory=StubTTS, lipsync_cls=StubLatentSyncGenerator, stub_ffmpeg: bool = True) -> None:
+    """将模型推理切换到替身，需在任务处理器导入后调用"""
+    from audio_service.audio_processor.device_manager import device_manager
+    from audio_service.audio_processor.audio_converter import AudioConverter
+    from audio_service.audio_processor.xtts_voice import XttsVoice
+
+    device_manager.load_tts = lambda *args, **kwargs: tts_factory()
+    XttsVoice.load = classmethod(lambda cls, *args, **kwargs: StubVoice(tts_factory()))
+    if stub_ffmpeg:
+        from video_service.task_handler.video_task_handler import VideoTaskHandler
+
+        AudioConverter.merge_audio_files = staticmethod(merge_wavs)
+        VideoTaskHandler._faststart = staticmethod(lambda video_path: None)
+
+    # _generate_sync_video在调用时才导入生成器模块，预先放入替身模块
+    module = types.ModuleType("video_service.task_handler.latent_sync_generator")
+    module.LatentSyncGenerator = lipsync_cls
+    sys.modules["video_service.task_handler.latent_sync_generator"] = module
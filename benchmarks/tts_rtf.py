@@ -0,0 +1,99 @@
+"""比较XTTS在不同推理模式下的实时率(RTF)
+
+RTF = 合成耗时 / 生成音频时长，小于1表示快于实时。
+
+用法:
+    python -m benchmarks.tts_rtf --speaker-wav ref.wav --modes cuda cpu cpu-int8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_service.audio_processor.device_manager import DeviceManager
+from audio_service.task_handler.audio_task_handler import XTTS_MODEL_PATH, XTTS_CONFIG_PATH
+from common.result_cache import GENERATION_PARAMS
+
+# 模式名称 -> (设备, 是否量化)
+MODES = {
+    "cuda": ("cuda", False),
+    "cpu": ("cpu", False),
+    "cpu-int8": ("cpu", True),
+}
+
+# 与默认合成语言（GENERATION_PARAMS["language"]，荷兰语）一致
+DEFAULT_TEXT = "Hallo! Welkom bij onze sessie over financiële kennis."
+
+
+def benchmark_mode(mode: str, text: str, speaker_wav: str, language: str, repeats: int) -> dict:
+    """在单一模式下重复合成同一文本并统计RTF"""
+    device, quantize = MODES[mode]
+    manager = DeviceManager(preferred=device, quantize=quantize)
+    if device == "cuda" and manager.is_cpu:
+        return {"mode": mode, "skipped": "CUDA不可用"}
+
+    load_start = time.perf_counter()
+    tts = manager.load_tts(XTTS_MODEL_PATH, XTTS_CONFIG_PATH)
+    load_time = time.perf_counter() - load_start
+    sample_rate = tts.synthesizer.output_sample_rate
+
+    # 预热一次，排除首次推理的初始化开销
+    tts.tts(text=text, speaker_wav=speaker_wav, language=language)
+
+    rtfs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        wav = tts.tts(text=text, speaker_wav=speaker_wav, language=language)
+        elapsed = time.perf_counter() - start
+        rtfs.append(elapsed / (len(wav) / sample_rate))
+
+    return {
+        "mode": mode,
+        "device": str(manager.device),
+        "load_seconds": round(load_time, 3),
+        "rtf_mean": round(sum(rtfs) / len(rtfs), 4),
+        "rtf_min": round(min(rtfs), 4),
+        "rtf_max": round(max(rtfs), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="XTTS推理模式RTF对比")
+    parser.add_argument("--speaker-wav", required=True, help="参考音频路径")
+    parser.add_argument("--text", default=DEFAULT_TEXT, help="合成文本")
+    parser.add_argument("--language", default=GENERATION_PARAMS["language"])
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="结果保存为JSON文件")
+    args = parser.parse_args()
+
+    # 每种模式在独立进程中运行：torch的线程设置每个进程只能生效一次，量化也会改动已加载的模型
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for mode in args.modes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results.append(pool.submit(
+                benchmark_mode, mode, args.text, args.speaker_wav, args.language, args.repeats
+            ).result())
+
+    print(f"{'mode':<10} {'device':<8} {'load(s)':>8} {'rtf_mean':>9} {'rtf_min':>8} {'rtf_max':>8}")
+    for result in results:
+        if "skipped" in result:
+            print(f"{result['mode']:<10} skipped: {result['skipped']}")
+            continue
+        print(f"{result['mode']:<10} {result['device']:<8} {result['load_seconds']:>8} "
+              f"{result['rtf_mean']:>9} {result['rtf_min']:>8} {result['rtf_max']:>8}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
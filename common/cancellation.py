@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from common.redis_client import RedisClient
+from common.logger import get_logger
+
+logger = get_logger()
+
+# 任务取消配置
+CANCEL_FLAG_TTL = int(os.getenv("CANCEL_FLAG_TTL", 24 * 3600))
+# 推理循环中检查取消标记的最小间隔（秒），避免每一步都访问Redis
+CANCEL_CHECK_INTERVAL = float(os.getenv("CANCEL_CHECK_INTERVAL", 0.5))
+
+
+class TaskCancelled(Exception):
+    """任务已被用户取消"""
+
+
+class CancellationRegistry:
+    """任务取消标记
+
+    API服务在Redis中写入 cancel:{task_id}，各服务在出队、分段/分块之间和推理步之间检查，
+    发现标记后抛出TaskCancelled，由任务处理器清理中间产物并记录取消状态。
+    """
+
+    def __init__(self, ttl: int = CANCEL_FLAG_TTL, check_interval: float = CANCEL_CHECK_INTERVAL):
+        self.ttl = ttl
+        self.check_interval = check_interval
+        # 当前线程正在处理的任务，供无法传递任务ID的深层调用（如扩散推理的回调）检查
+        self._local = threading.local()
+
+    @property
+    def redis_client(self):
+        return RedisClient.get_client()
+
+    @staticmethod
+    def _key(task_id: str) -> str:
+        return f"cancel:{task_id}"
+
+    def request(self, task_id: str) -> None:
+        """标记任务为取消"""
+        self.redis_client.set(self._key(task_id), int(time.time()), ex=self.ttl)
+
+    def is_cancelled(self, task_id: str) -> bool:
+        try:
+            return bool(self.redis_client.exists(self._key(task_id)))
+        except Exception as e:
+            logger.warning(f"检查取消标记失败: {task_id} - {str(e)}")
+            return False
+
+    def check(self, task_id: str) -> None:
+        """任务已取消时抛出TaskCancelled"""
+        if self.is_cancelled(task_id):
+            raise TaskCancelled(task_id)
+
+    @contextmanager
+    def watch(self, task_id: str):
+        """在当前线程中登记正在处理的任务，期间可调用check_current"""
+        previous = getattr(self._local, "task_id", None)
+        self._local.task_id = task_id
+        self._local.checked_at = 0.0
+        try:
+            yield
+        finally:
+            self._local.task_id = previous
+
+    def current(self) -> Optional[str]:
+        return getattr(self._local, "task_id", None)
+
+    def check_current(self) -> None:
+        """检查当前线程登记的任务，距上次检查不足check_interval时跳过"""
+        task_id = self.current()
+        if task_id is None:
+            return
+        now = time.monotonic()
+        if now - self._local.checked_at < self.check_interval:
+            return
+        self._local.checked_at = now
+        self.check(task_id)
+
+
+# 创建全局任务取消实例
+cancellation = CancellationRegistry()
@@ -1,11 +1,91 @@
 import os
 import yaml
-from typing import Dict, Any
+from dataclasses import dataclass
+from typing import Dict, Any, Callable, Optional
 from pathlib import Path
 
+from dotenv import load_dotenv
+
+# 加载环境变量，其他模块通过导入本模块（或common.logger等）获得，不再单独调用load_dotenv
+load_dotenv()
+
+CONFIG_DIR = Path(__file__).parent.parent / 'config'
+
+
+@dataclass(frozen=True)
+class DatabaseSettings:
+    host: str
+    port: int
+    username: str
+    password: str
+    database: str
+
+    @property
+    def url(self) -> str:
+        return f"mysql+mysqlconnector://{self.username}:{self.password}@{self.host}:{self.port}/{self.database}"
+
+
+@dataclass(frozen=True)
+class RedisSettings:
+    host: str
+    port: int
+    db: int
+    password: str
+
+
+@dataclass(frozen=True)
+class RabbitMQSettings:
+    host: str
+    port: int
+    username: str
+    password: str
+    virtual_host: str
+    # 每个消费者同时持有的未确认消息数，多个工作进程消费同一队列时按空闲程度分配任务
+    prefetch: int
+    # 心跳间隔（秒），任务在工作线程中执行，消费连接在处理期间仍按时回应心跳
+    heartbeat: int
+
+
+@dataclass(frozen=True)
+class LoggingSettings:
+    level: str
+    dir: str
+    stdout_format: str  # text | json
+    hot_path_rate: float  # 高频日志每个调用点每秒最多输出条数
+
+
+@dataclass(frozen=True)
+class ServiceSettings:
+    upload_base_path: str
+    api_port: int
+    video_port: int
+    audio_port: int
+
+
+@dataclass(frozen=True)
+class Settings:
+    """进程启动时加载一次的类型化配置，优先级：环境变量 > base.yaml > 默认值
+
+    连接地址、端口、路径等只在启动时读取；运行时可调整的性能参数见 common.tunables。
+    """
+    database: DatabaseSettings
+    redis: RedisSettings
+    rabbitmq: RabbitMQSettings
+    logging: LoggingSettings
+    services: ServiceSettings
+
+
+def _setting(env_name: str, section: Dict[str, Any], key: str, default: Any, cast: Callable = str) -> Any:
+    value = os.getenv(env_name)
+    if value is None:
+        value = section.get(key, default)
+    return cast(value) if value is not None else None
+
+
 class Config:
     _instance = None
     _config = None
+    _settings: Optional[Settings] = None
 
     def __new__(cls):
         if cls._instance is None:
@@ -14,14 +94,58 @@ class Config:
         return cls._instance
 
     def _load_config(self):
-        config_dir = Path(__file__).parent.parent / 'config'
-        base_config_path = config_dir / 'base.yaml'
+        base_config_path = CONFIG_DIR / 'base.yaml'
 
         if not base_config_path.exists():
             raise FileNotFoundError(f"基础配置文件不存在: {base_config_path}")
 
         with open(base_config_path, 'r', encoding='utf-8') as f:
-            self._config = yaml.safe_load(f)
+            self._config = yaml.safe_load(f) or {}
+        self._settings = self._build_settings()
+
+    def _build_settings(self) -> Settings:
+        database = self.get_database_config()
+        redis = self.get_redis_config()
+        rabbitmq = self.get_rabbitmq_config()
+        logging = self.get_logging_config()
+        services = self._config.get('services', {})
+        return Settings(
+            database=DatabaseSettings(
+                host=_setting("DB_HOST", database, 'host', "localhost"),
+                port=_setting("DB_PORT", database, 'port', 3306, int),
+                username=_setting("DB_USER", database, 'username', "root"),
+                password=_setting("DB_PASSWORD", database, 'password', ""),
+                database=_setting("DB_NAME", database, 'database', "ai_service"),
+            ),
+            redis=RedisSettings(
+                host=_setting("REDIS_HOST", redis, 'host', "localhost"),
+                port=_setting("REDIS_PORT", redis, 'port', 6379, int),
+                db=_setting("REDIS_DB", redis, 'db', 0, int),
+                password=_setting("REDIS_PASSWORD", redis, 'password', ""),
+            ),
+            rabbitmq=RabbitMQSettings(
+                host=_setting("RABBITMQ_HOST", rabbitmq, 'host', "localhost"),
+                port=_setting("RABBITMQ_PORT", rabbitmq, 'port', 5672, int),
+                username=_setting("RABBITMQ_USER", rabbitmq, 'username', "guest"),
+                password=_setting("RABBITMQ_PASSWORD", rabbitmq, 'password', "guest"),
+                virtual_host=_setting("RABBITMQ_VHOST", rabbitmq, 'virtual_host', "/"),
+                prefetch=_setting("RABBITMQ_PREFETCH", rabbitmq, 'prefetch', 1, int),
+                heartbeat=_setting("RABBITMQ_HEARTBEAT", rabbitmq, 'heartbeat', 60, int),
+            ),
+            logging=LoggingSettings(
+                level=_setting("LOG_LEVEL", logging, 'level', "INFO"),
+                dir=_setting("LOG_DIR", logging, 'dir', "logs"),
+                stdout_format=_setting("LOG_STDOUT_FORMAT", logging, 'stdout_format', "text"),
+                hot_path_rate=_setting("LOG_HOT_PATH_RATE", logging, 'hot_path_rate', 5, float),
+            ),
+            services=ServiceSettings(
+                upload_base_path=_setting("UPLOAD_BASE_PATH", services, 'upload_base_path',
+                                          "/home/featurize/clonevoice/uploads"),
+                api_port=_setting("API_SERVICE_PORT", services, 'api_port', 8000, int),
+                video_port=_setting("VIDEO_SERVICE_PORT", services, 'video_port', 8001, int),
+                audio_port=_setting("AUDIO_SERVICE_PORT", services, 'audio_port', 8002, int),
+            ),
+        )
 
     def get_database_config(self) -> Dict[str, Any]:
         return self._config.get('database', {})
@@ -35,9 +159,17 @@ class Config:
     def get_logging_config(self) -> Dict[str, Any]:
         return self._config.get('logging', {})
 
+    def get_tunables_config(self) -> Dict[str, Any]:
+        return self._config.get('tunables', {})
+
     @property
     def config(self) -> Dict[str, Any]:
         return self._config
 
+    @property
+    def settings(self) -> Settings:
+        return self._settings
+
 # 创建全局配置实例
-config = Config()
\ No newline at end of file
+config = Config()
+settings = config.settings
@@ -2,31 +2,33 @@ from typing import Generator
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from dotenv import load_dotenv
-import os
 
-# 加载环境变量
-load_dotenv()
-
-# 数据库配置
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_NAME = os.getenv("DB_NAME")
+from common.config import settings
 
 # 创建数据库URL
-DATABASE_URL = f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-
-# 创建数据库引擎
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-
-# 创建会话工厂
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+DATABASE_URL = settings.database.url
 
 # 声明基类
 Base = declarative_base()
 
+# 数据库引擎和会话工厂在首次使用时创建，避免服务启动时加载数据库驱动
+_engine = None
+_session_factory = None
+
+def get_engine():
+    """获取数据库引擎"""
+    global _engine
+    if _engine is None:
+        _engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+    return _engine
+
+def SessionLocal() -> Session:
+    """创建数据库会话"""
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+    return _session_factory()
+
 def get_db() -> Generator[Session, None, None]:
     """获取数据库会话"""
     db = SessionLocal()
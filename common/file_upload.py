@@ -4,15 +4,14 @@ from typing import Optional, List, Dict
 from fastapi import UploadFile, HTTPException
 from pathlib import Path
 
+from common.metrics import STAGE_DURATION
+from common.tunables import tunables
+
 class FileUploadManager:
     # 允许的文件类型
     ALLOWED_AUDIO_TYPES = ['.mp3', '.wav', '.ogg', '.m4a']
     ALLOWED_VIDEO_TYPES = ['.mp4', '.avi', '.mov', '.mkv']
     
-    # 文件大小限制（单位：字节）
-    MAX_AUDIO_SIZE = 50 * 1024 * 1024  # 50MB
-    MAX_VIDEO_SIZE = 500 * 1024 * 1024  # 500MB
-    
     def __init__(self, base_upload_path: str):
         """初始化文件上传管理器
         
@@ -55,10 +54,11 @@ class FileUploadManager:
         Returns:
             bool: 是否在允许的大小范围内
         """
+        # 大小上限（MB）可在运行时调整
         if file_type == 'audio':
-            return file_size <= self.MAX_AUDIO_SIZE
+            return file_size <= tunables.get("max_audio_upload_mb") * 1024 * 1024
         elif file_type == 'video':
-            return file_size <= self.MAX_VIDEO_SIZE
+            return file_size <= tunables.get("max_video_upload_mb") * 1024 * 1024
         return False
     
     async def save_file(self, file: UploadFile, file_type: str) -> Dict:
@@ -77,6 +77,11 @@ class FileUploadManager:
         if not self._validate_file_type(file.filename, file_type):
             raise HTTPException(status_code=400, detail=f"不支持的{file_type}文件类型")
         
+        with STAGE_DURATION.labels(stage="upload").time():
+            return await self._save_file(file, file_type)
+
+    async def _save_file(self, file: UploadFile, file_type: str) -> Dict:
+        """读取、校验并写入上传文件"""
         content = await file.read()
         file_size = len(content)
         
@@ -0,0 +1,96 @@
+import os
+import time
+from threading import Lock, Thread
+from typing import Callable, Dict, Optional
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from common.logger import get_logger
+from common.startup_profiler import startup_profiler
+
+logger = get_logger()
+
+# 预热配置
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+
+
+class ServiceHealth:
+    """服务存活与就绪状态
+
+    进程能响应HTTP即为存活；模型预热完成并开始消费队列后才为就绪，
+    滚动重启时负载均衡和进程管理器据此判断何时可以把流量切到新实例。
+    """
+
+    STARTING = "starting"
+    WARMING = "warming"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(self):
+        self.state = self.STARTING
+        self.detail: Optional[str] = None
+        self.changed_at = time.time()
+        self._lock = Lock()
+
+    def set_state(self, state: str, detail: Optional[str] = None) -> None:
+        with self._lock:
+            self.state = state
+            self.detail = detail
+            self.changed_at = time.time()
+        logger.info(f"服务状态: {state}" + (f" ({detail})" if detail else ""))
+
+    @property
+    def is_ready(self) -> bool:
+        return self.state == self.READY
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "status": self.state,
+                "detail": self.detail,
+                "since": self.changed_at,
+            }
+
+    def start_when_warm(self, warmup: Callable[[], None], on_ready: Callable[[], None],
+                        enabled: bool = WARMUP_ENABLED) -> Thread:
+        """在后台线程中预热模型，成功后调用on_ready开始消费队列
+
+        预热失败时状态置为failed且不消费队列，避免把任务分配给无法推理的实例。
+        """
+        def run():
+            try:
+                if enabled:
+                    self.set_state(self.WARMING)
+                    with startup_profiler.phase("warmup"):
+                        warmup()
+                on_ready()
+            except Exception as e:
+                logger.exception(f"模型预热失败: {str(e)}")
+                self.set_state(self.FAILED, str(e))
+                return
+            self.set_state(self.READY)
+            startup_profiler.mark_ready()
+            startup_profiler.report(logger)
+
+        thread = Thread(target=run, name="warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def router(self) -> APIRouter:
+        """/health/live 与 /health/ready 路由，未就绪时返回503"""
+        router = APIRouter(prefix="/health", tags=["health"])
+
+        @router.get("/live")
+        async def live():
+            return {"status": "alive"}
+
+        @router.get("/ready")
+        async def ready():
+            return JSONResponse(status_code=200 if self.is_ready else 503, content=self.snapshot())
+
+        return router
+
+
+# 创建全局服务状态实例
+service_health = ServiceHealth()
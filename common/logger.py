@@ -1,23 +1,117 @@
 from loguru import logger
-from dotenv import load_dotenv
+import json
 import os
 import sys
+import threading
+import time
+import traceback
 from datetime import datetime
+from typing import Dict, Tuple
 
-# 加载环境变量
-load_dotenv()
+from common.config import settings
 
 # 日志配置
-LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
-LOG_DIR = os.getenv("LOG_DIR", "logs")
+LOG_LEVEL = settings.logging.level
+LOG_DIR = settings.logging.dir
+LOG_STDOUT_FORMAT = settings.logging.stdout_format  # text | json
+LOG_HOT_PATH_RATE = settings.logging.hot_path_rate  # 高频日志每个调用点每秒最多输出条数
 
 # 确保日志目录存在
 if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR)
 
+# 结构化日志中单独输出的字段，其余extra字段作为附加信息
+_RESERVED_EXTRA = {"service", "task_id", "sample_rate", "suppressed", "_drop", "_json"}
+
+
+class _CallSiteSampler:
+    """按调用点的令牌桶限流，记录被丢弃的条数"""
+
+    def __init__(self):
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key: str, per_second: float) -> Tuple[bool, int]:
+        now = time.monotonic()
+        capacity = max(per_second, 1.0)
+        with self._lock:
+            # [令牌数, 上次补充时间, 丢弃条数]
+            bucket = self._buckets.setdefault(key, [capacity, now, 0])
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * per_second)
+            bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                suppressed, bucket[2] = bucket[2], 0
+                return True, suppressed
+            bucket[2] += 1
+            return False, 0
+
+
+_sampler = _CallSiteSampler()
+
+
+def _patch_record(record) -> None:
+    """自动绑定任务上下文，并对标记为高频的调用点限流
+
+    patcher在每条日志上只执行一次，限流结果对所有输出共同生效。
+    """
+    extra = record["extra"]
+    if extra.get("task_id") is None:
+        from common.tracing import tracer
+        context = tracer.current()
+        if context:
+            extra["task_id"] = context.get("task_id")
+
+    rate = extra.get("sample_rate")
+    if rate:
+        key = f"{record['name']}:{record['function']}:{record['line']}"
+        allowed, suppressed = _sampler.allow(key, rate)
+        extra["_drop"] = not allowed
+        if suppressed:
+            extra["suppressed"] = suppressed
+
+
+def _not_dropped(record) -> bool:
+    return not record["extra"].get("_drop")
+
+
+def _json_format(record) -> str:
+    """单行JSON格式"""
+    extra = record["extra"]
+    payload = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "service": extra.get("service"),
+        "task_id": extra.get("task_id"),
+        "logger": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "message": record["message"],
+    }
+    if extra.get("suppressed"):
+        payload["suppressed"] = extra["suppressed"]
+    payload.update({k: v for k, v in extra.items() if k not in _RESERVED_EXTRA})
+    if record["exception"]:
+        payload["exception"] = "".join(traceback.format_exception(*record["exception"]))
+    extra["_json"] = json.dumps(payload, ensure_ascii=False, default=str)
+    return "{extra[_json]}\n"
+
+
+def _text_format(record) -> str:
+    """控制台文本格式，存在任务上下文时附带task_id"""
+    task = " | <magenta>{extra[task_id]}</magenta>" if record["extra"].get("task_id") else ""
+    suppressed = " <yellow>(+{extra[suppressed]} suppressed)</yellow>" if record["extra"].get("suppressed") else ""
+    return ("<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level>" + task +
+            " | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>" +
+            suppressed + "\n{exception}")
+
+
 def setup_logger(service_name: str) -> None:
     """配置日志记录器
 
+    日志经后台队列异步写出，调用线程不会阻塞在日志I/O上；
+    文件输出为每行一条的JSON，自动携带服务名和当前任务ID。
+
     Args:
         service_name: 服务名称，用于区分不同服务的日志文件
     """
@@ -27,25 +121,27 @@ def setup_logger(service_name: str) -> None:
         f"{service_name}_{datetime.now().strftime('%Y%m%d')}.log"
     )
 
-    # 配置日志格式
-    log_format = "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
-
     # 移除默认的处理器
     logger.remove()
+    logger.configure(extra={"service": service_name, "task_id": None}, patcher=_patch_record)
 
     # 添加控制台输出
     logger.add(
         sys.stdout,
-        format=log_format,
+        format=_json_format if LOG_STDOUT_FORMAT == "json" else _text_format,
         level=LOG_LEVEL,
-        colorize=True
+        colorize=LOG_STDOUT_FORMAT != "json",
+        filter=_not_dropped,
+        enqueue=True
     )
 
     # 添加文件输出
     logger.add(
         log_file,
-        format=log_format,
+        format=_json_format,
         level=LOG_LEVEL,
+        filter=_not_dropped,
+        enqueue=True,
         rotation="00:00",  # 每天轮换
         retention="30 days",  # 保留30天
         compression="zip",  # 压缩旧日志
@@ -56,4 +152,8 @@ def setup_logger(service_name: str) -> None:
 
 def get_logger():
     """获取日志记录器"""
-    return logger
\ No newline at end of file
+    return logger
+
+def get_sampled_logger(max_per_second: float = LOG_HOT_PATH_RATE):
+    """获取用于高频调用点的日志记录器，每个调用点每秒最多输出max_per_second条"""
+    return logger.bind(sample_rate=max_per_second)
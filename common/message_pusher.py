@@ -8,15 +8,35 @@ from common.logger import get_logger
 
 logger = get_logger()
 
+# 事件通知请求超时（秒）
+EVENT_NOTIFICATION_TIMEOUT = 5
+
 class MessagePusher:
-    def send_event_notification(self, task_id: str) -> bool:
+    def __init__(self):
+        # 复用HTTP连接，频繁的进度通知不必每次重新建立TCP连接
+        self.session = requests.Session()
+
+    @staticmethod
+    def event_body(task_id: str, event: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        /send_event 的请求体：事件内容（event_type、timestamp及stage、percent等）与 message:{task_id} 中的记录一致，
+        消息文本放在content字段；message字段仍为任务ID，兼容只读取任务ID的客户端
+        """
+        event = dict(event or {})
+        event['content'] = event.pop('message', None)
+        event['task_id'] = task_id
+        event['message'] = task_id
+        return event
+
+    def send_event_notification(self, task_id: str, event: Optional[Dict[str, Any]] = None) -> bool:
         """
-        发送事件通知到本地API服务
+        发送事件通知到本地API服务，事件内容随通知一起广播给SSE客户端
         """
         try:            
-            response = requests.post(
+            response = self.session.post(
                 "http://localhost:8000/send_event",
-                json={'message':task_id}
+                json=self.event_body(task_id, event),
+                timeout=EVENT_NOTIFICATION_TIMEOUT
             )
 
             if response.status_code == 200:
@@ -30,17 +50,19 @@ class MessagePusher:
             logger.error(f"事件通知发送失败: {task_id} - {str(e)}")
             return False
 
-    def push_message(self, task_id: str, message: str, event_type: str = "status") -> bool:
+    def push_message(self, task_id: str, message: str, event_type: str = "status",
+                     data: Optional[Dict[str, Any]] = None) -> bool:
         """
         推送消息到Redis并返回是否成功
         :param task_id: 任务ID
         :param message: 消息内容
         :param event_type: 事件类型
+        :param data: 附加的结构化字段，如进度事件的stage和percent
         :return: 是否成功推送
         """
         try:
             # 添加时间戳
-            result = {}
+            result = dict(data or {})
             result["timestamp"] = datetime.now().isoformat()
             result["event_type"] = event_type
             result["message"] = message
@@ -54,7 +76,7 @@ class MessagePusher:
             )
 
             # 创建事件循环来运行异步方法
-            message_pusher.send_event_notification(task_id)
+            self.send_event_notification(task_id, result)
 
             logger.info(f"消息推送成功: {task_id} - {message}")
             return True
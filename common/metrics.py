@@ -0,0 +1,60 @@
+from fastapi import Response
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+# 各服务进程独立采集，同一套指标定义在所有服务中共用
+
+# 处理阶段耗时（秒）
+STAGE_DURATION = Histogram(
+    "ai_service_stage_duration_seconds",
+    "Duration of pipeline stages",
+    ["stage"],  # reference_decode | voice_conditioning | tts_segment | audio_merge | lipsync_inference | upload
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200),
+)
+
+# 任务结果计数
+TASKS_TOTAL = Counter(
+    "ai_service_tasks_total",
+    "Tasks processed by outcome",
+    ["service", "outcome"],  # outcome: completed | failed | cached
+)
+
+# 正在处理的任务数
+TASKS_IN_FLIGHT = Gauge(
+    "ai_service_tasks_in_flight",
+    "Tasks currently being processed",
+    ["service"],
+)
+
+# SSE连接数
+SSE_CLIENTS = Gauge(
+    "ai_service_sse_clients",
+    "Connected SSE clients",
+)
+
+# 队列积压消息数
+QUEUE_DEPTH = Gauge(
+    "ai_service_queue_depth",
+    "Messages waiting in a RabbitMQ queue",
+    ["queue"],
+)
+
+# Redis命令耗时
+REDIS_LATENCY = Histogram(
+    "ai_service_redis_command_seconds",
+    "Latency of Redis commands issued through common.redis_client",
+    ["command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+
+# RabbitMQ调用耗时
+RABBITMQ_LATENCY = Histogram(
+    "ai_service_rabbitmq_call_seconds",
+    "Latency of RabbitMQ calls issued through common.rabbitmq_client",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+
+
+def metrics_response() -> Response:
+    """生成Prometheus文本格式的指标响应"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
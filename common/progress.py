@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from common.logger import get_logger
+from common.message_pusher import message_pusher
+
+logger = get_logger()
+
+# 进度上报配置
+PROGRESS_ENABLED = os.getenv("PROGRESS_ENABLED", "true").lower() == "true"
+# 每个任务每秒最多推送的进度更新数
+PROGRESS_MAX_RATE = float(os.getenv("PROGRESS_MAX_RATE", 2))
+# 百分比变化小于该值时不推送
+PROGRESS_MIN_DELTA = int(os.getenv("PROGRESS_MIN_DELTA", 1))
+
+
+class ProgressReporter:
+    """细粒度进度上报，在来源处限流合并
+
+    推理循环（TTS分段、扩散去噪步、渲染分块）每一步调用advance，只在进度百分比变化足够大
+    且距上次推送超过 1/PROGRESS_MAX_RATE 秒时才生成更新；被限流的最新进度在阶段结束时补发。
+    更新由后台线程发送，同一任务积压的多条更新只发送最新一条，推理线程只在阶段结束时等待发送完成。
+    """
+
+    def __init__(self, enabled: bool = PROGRESS_ENABLED, max_rate: float = PROGRESS_MAX_RATE,
+                 min_delta: int = PROGRESS_MIN_DELTA):
+        self.enabled = enabled
+        self.min_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.min_delta = min_delta
+        # 当前线程正在跟踪的阶段: {"task_id", "stage", "total", "done", "sent", "sent_at", "pending"}
+        self._local = threading.local()
+        # 待发送的最新进度 task_id -> (stage, percent)
+        self._outbox: Dict[str, Tuple[str, int]] = {}
+        self._sending: Dict[str, Tuple[str, int]] = {}
+        self._condition = threading.Condition()
+        self._sender: Optional[threading.Thread] = None
+
+    @contextmanager
+    def track(self, task_id: str, stage: str, total: int = 0):
+        """在当前线程中跟踪一个阶段的进度，退出时补发被限流的最新进度"""
+        previous = getattr(self._local, "state", None)
+        state = {"task_id": task_id, "stage": stage, "total": total, "done": 0,
+                 "sent": None, "sent_at": 0.0, "pending": None}
+        self._local.state = state
+        try:
+            yield
+        finally:
+            if state["pending"] is not None:
+                self._enqueue(task_id, stage, state["pending"])
+            self._local.state = previous
+            # 等待该任务的进度发送完毕，避免晚到的进度覆盖随后推送的阶段消息
+            self._wait_sent(task_id)
+
+    def set_total(self, total: int) -> None:
+        """设置当前阶段的总步数，已完成步数清零"""
+        state = getattr(self._local, "state", None)
+        if state is not None:
+            state["total"] = total
+            state["done"] = 0
+
+    def advance(self, steps: int = 1) -> None:
+        """当前阶段完成steps步"""
+        state = getattr(self._local, "state", None)
+        if state is None or not state["total"] or not self.enabled:
+            return
+        state["done"] += steps
+        percent = min(100, int(state["done"] * 100 / state["total"]))
+
+        last = state["sent"] if state["sent"] is not None else -self.min_delta
+        if percent - last < self.min_delta and percent != 100:
+            return
+        now = time.monotonic()
+        if now - state["sent_at"] < self.min_interval and percent != 100:
+            # 限流期间只保留最新进度
+            state["pending"] = percent
+            return
+        state["sent"], state["sent_at"], state["pending"] = percent, now, None
+        self._enqueue(state["task_id"], state["stage"], percent)
+
+    def _enqueue(self, task_id: str, stage: str, percent: int) -> None:
+        with self._condition:
+            self._outbox[task_id] = (stage, percent)
+            if self._sender is None:
+                self._sender = threading.Thread(target=self._send_loop, name="progress-sender", daemon=True)
+                self._sender.start()
+            self._condition.notify_all()
+
+    def _send_loop(self) -> None:
+        while True:
+            with self._condition:
+                while not self._outbox:
+                    self._condition.wait()
+                self._sending, self._outbox = self._outbox, {}
+            for task_id, (stage, percent) in self._sending.items():
+                try:
+                    message_pusher.push_message(task_id, f"progress,stage:{stage},percent:{percent}", "progress",
+                                                {"stage": stage, "percent": percent})
+                except Exception as e:
+                    logger.warning(f"进度推送失败: {task_id} - {str(e)}")
+            with self._condition:
+                self._sending = {}
+                self._condition.notify_all()
+
+    def _wait_sent(self, task_id: str, timeout: float = 5.0) -> None:
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while task_id in self._outbox or task_id in self._sending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"等待进度推送超时: {task_id}")
+                    return
+                self._condition.wait(remaining)
+
+
+# 创建全局进度上报实例
+progress_reporter = ProgressReporter()
@@ -0,0 +1,105 @@
+import os
+import time
+from typing import Dict, Optional
+
+from common.redis_client import RedisClient
+from common.logger import get_logger
+
+logger = get_logger()
+
+# 单任务处理耗时的指数移动平均系数
+QUEUE_STATS_ALPHA = float(os.getenv("QUEUE_STATS_ALPHA", 0.2))
+
+# 记录已投递未完成任务数的队列及其在ai_service交换机上绑定的路由键，API服务启动时按此绑定；
+# RabbitMQ的message_count不含已投递未确认的消息
+PIPELINE_EXCHANGE = "ai_service"
+PIPELINE_BINDINGS = {
+    "audio_tasks": ("audio", "audio_tasks"),
+    "video_tasks": ("video", "video_tasks"),
+}
+# 已计入完成的消息ID的保留时间（秒），用于跳过重新投递的消息
+BACKLOG_DONE_TTL = int(os.getenv("QUEUE_BACKLOG_DONE_TTL", 24 * 3600))
+
+
+def bound_queue(exchange: str, routing_key: str) -> Optional[str]:
+    """消息按交换机和路由键进入的流水线队列，不属于流水线时返回None"""
+    if exchange == "":
+        return routing_key if routing_key in PIPELINE_BINDINGS else None
+    if exchange != PIPELINE_EXCHANGE:
+        return None
+    for queue, routing_keys in PIPELINE_BINDINGS.items():
+        if routing_key in routing_keys:
+            return queue
+    return None
+
+
+class QueueStats:
+    """记录各队列单条消息的平均处理耗时
+
+    所有工作进程写入同一个Redis哈希 queue_stats:{queue}，
+    自动扩缩容控制器据此估算排空积压所需的实例数。
+    PIPELINE_BINDINGS中的队列另外记录backlog：发布时按绑定的队列加一、处理完成时减一，包含正在处理的任务；
+    同一消息（按message_id）只减一次，消息确认前进程退出导致的重新投递不会重复减去。
+    """
+
+    def __init__(self, alpha: float = QUEUE_STATS_ALPHA):
+        self.alpha = alpha
+
+    @property
+    def redis_client(self):
+        return RedisClient.get_client()
+
+    def record(self, queue: str, seconds: float) -> None:
+        """记录一条消息的处理耗时，多个进程并发更新时结果为近似值"""
+        key = f"queue_stats:{queue}"
+        try:
+            previous = self.redis_client.hget(key, "service_time")
+            average = seconds if previous is None else self.alpha * seconds + (1 - self.alpha) * float(previous)
+            self.redis_client.hset(key, "service_time", round(average, 4))
+            self.redis_client.hset(key, "updated_at", round(time.time(), 3))
+        except Exception as e:
+            logger.warning(f"记录队列处理耗时失败: {str(e)}")
+
+    def enqueued(self, exchange: str, routing_key: str) -> None:
+        """记录一条发布的消息，计入其绑定的流水线队列"""
+        queue = bound_queue(exchange, routing_key)
+        if queue is None:
+            return
+        try:
+            self.redis_client.hincrby(f"queue_stats:{queue}", "backlog", 1)
+        except Exception as e:
+            logger.warning(f"更新队列任务数失败: {str(e)}")
+
+    def dequeued(self, queue: str, message_id: Optional[str] = None, redelivered: bool = False) -> None:
+        """记录一条处理完成的消息
+
+        有message_id时每条消息只减一次；没有时（旧版本发布的消息）跳过重新投递的消息。
+        """
+        if queue not in PIPELINE_BINDINGS:
+            return
+        try:
+            if message_id:
+                if not self.redis_client.set(f"queue_stats:done:{message_id}", 1, nx=True, ex=BACKLOG_DONE_TTL):
+                    return
+            elif redelivered:
+                return
+            self.redis_client.hincrby(f"queue_stats:{queue}", "backlog", -1)
+        except Exception as e:
+            logger.warning(f"更新队列任务数失败: {str(e)}")
+
+    def backlog(self, queue: str) -> Optional[int]:
+        """已发布但尚未处理完成的任务数，包含排队和正在处理的任务，无记录时返回None"""
+        value = self.redis_client.hget(f"queue_stats:{queue}", "backlog")
+        return max(0, int(value)) if value is not None else None
+
+    def service_time(self, queue: str) -> Optional[float]:
+        """单条消息的平均处理耗时（秒），无记录时返回None"""
+        value = self.redis_client.hget(f"queue_stats:{queue}", "service_time")
+        return float(value) if value is not None else None
+
+    def snapshot(self, queue: str) -> Dict:
+        return self.redis_client.hgetall(f"queue_stats:{queue}")
+
+
+# 创建全局队列统计实例
+queue_stats = QueueStats()
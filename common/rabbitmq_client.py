@@ -1,63 +1,123 @@
+import contextvars
+import functools
 import pika
-from typing import Callable, Optional
-from dotenv import load_dotenv
-import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, Dict, Any, Tuple
 from loguru import logger
 
-# 加载环境变量
-load_dotenv()
-
-# RabbitMQ配置
-RABBITMQ_HOST = os.getenv("RABBITMQ_HOST")
-RABBITMQ_PORT = int(os.getenv("RABBITMQ_PORT", 5672))
-RABBITMQ_USER = os.getenv("RABBITMQ_USER")
-RABBITMQ_PASSWORD = os.getenv("RABBITMQ_PASSWORD")
+from common.metrics import RABBITMQ_LATENCY
+from common.tracing import tracer
+from common.queue_stats import queue_stats
+from common.config import settings
 
 class RabbitMQClient:
+    _shared: Optional["SharedRabbitMQClient"] = None
+
     def __init__(self):
         self.connection = None
         self.channel = None
         self.connect()
 
+    @classmethod
+    def shared(cls) -> "SharedRabbitMQClient":
+        """获取进程内共享的客户端，首次使用时才建立连接
+
+        所有调用都转交给同一个专用线程执行，事件循环、线程池中的接口和后台任务可以安全共用。
+        """
+        if RabbitMQClient._shared is None:
+            RabbitMQClient._shared = SharedRabbitMQClient()
+        return RabbitMQClient._shared
+
     def connect(self) -> None:
         """连接到RabbitMQ服务器"""
-        credentials = pika.PlainCredentials(RABBITMQ_USER, RABBITMQ_PASSWORD)
+        rabbitmq = settings.rabbitmq
+        credentials = pika.PlainCredentials(rabbitmq.username, rabbitmq.password)
         parameters = pika.ConnectionParameters(
-            host=RABBITMQ_HOST,
-            port=RABBITMQ_PORT,
-            credentials=credentials
+            host=rabbitmq.host,
+            port=rabbitmq.port,
+            virtual_host=rabbitmq.virtual_host,
+            credentials=credentials,
+            heartbeat=rabbitmq.heartbeat
         )
-        self.connection = pika.BlockingConnection(parameters)
-        self.channel = self.connection.channel()
+        with RABBITMQ_LATENCY.labels(operation="connect").time():
+            self.connection = pika.BlockingConnection(parameters)
+            self.channel = self.connection.channel()
 
-    def publish(self, exchange: str, routing_key: str, message: str) -> None:
-        """发布消息到指定的交换机和路由键"""
-        try:
-            if not self.connection or self.connection.is_closed:
-                self.connect()
-            self.channel.basic_publish(
-                exchange=exchange,
-                routing_key=routing_key,
-                body=message
-            )
-            logger.info(f"消息已发送到 {exchange}:{routing_key}")
-        except Exception as e:
-            logger.error(f"发送消息失败: {str(e)}")
-            self.reconnect()
+    def publish(self, exchange: str, routing_key: str, message: str, headers: Optional[Dict[str, Any]] = None) -> None:
+        """发布消息到指定的交换机和路由键，消息头携带当前追踪上下文
+
+        共享的长连接可能因心跳超时被服务端关闭，发送失败时重连后重试一次。
+        """
+        for attempt in range(2):
+            try:
+                if not self.connection or self.connection.is_closed:
+                    self.connect()
+                start = time.perf_counter()
+                self.channel.basic_publish(
+                    exchange=exchange,
+                    routing_key=routing_key,
+                    body=message,
+                    properties=pika.BasicProperties(headers=tracer.inject(headers), message_id=uuid.uuid4().hex)
+                )
+                RABBITMQ_LATENCY.labels(operation="publish").observe(time.perf_counter() - start)
+                logger.info(f"消息已发送到 {exchange}:{routing_key}")
+                queue_stats.enqueued(exchange, routing_key)
+                return
+            except Exception as e:
+                logger.error(f"发送消息失败: {str(e)}")
+                self.reconnect()
 
     def consume(self, queue: str, callback: Callable) -> None:
-        """从指定队列消费消息"""
+        """从指定队列消费消息，回调在消息头恢复的追踪上下文中执行
+
+        回调在单独的工作线程中依次执行，连接线程继续处理心跳，长时间的渲染不会因心跳或
+        consumer_timeout被服务端断开；处理完成后通过add_callback_threadsafe回到连接线程确认消息，
+        配合prefetch使同一队列的多个消费者按空闲程度领取任务。
+        """
+        worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"consume-{queue}")
+
+        def ack(ch, delivery_tag):
+            if ch.is_open:
+                ch.basic_ack(delivery_tag=delivery_tag)
+            else:
+                logger.warning(f"通道已关闭，消息将被重新投递: {queue} #{delivery_tag}")
+
+        def process(ch, method, properties, body):
+            start = time.perf_counter()
+            try:
+                with tracer.consume_context(queue, properties):
+                    callback(ch, method, properties, body)
+            except Exception as e:
+                logger.error(f"处理消息失败: {queue} - {str(e)}")
+            finally:
+                queue_stats.record(queue, time.perf_counter() - start)
+                queue_stats.dequeued(queue, getattr(properties, "message_id", None),
+                                     getattr(method, "redelivered", False))
+                try:
+                    self.connection.add_callback_threadsafe(functools.partial(ack, ch, method.delivery_tag))
+                except Exception as e:
+                    logger.warning(f"确认消息失败，消息将被重新投递: {queue} - {str(e)}")
+
+        def dispatch(ch, method, properties, body):
+            worker.submit(process, ch, method, properties, body)
+
         try:
+            self.channel.basic_qos(prefetch_count=settings.rabbitmq.prefetch)
             self.channel.basic_consume(
                 queue=queue,
-                on_message_callback=callback,
-                auto_ack=True
+                on_message_callback=dispatch,
+                auto_ack=False
             )
             logger.info(f"开始监听队列: {queue}")
             self.channel.start_consuming()
         except Exception as e:
             logger.error(f"消费消息失败: {str(e)}")
             self.reconnect()
+        finally:
+            worker.shutdown(wait=False)
 
     def declare_exchange(self, exchange: str, exchange_type: str = 'direct') -> None:
         """声明交换机"""
@@ -69,7 +129,20 @@ class RabbitMQClient:
 
     def declare_queue(self, queue: str) -> None:
         """声明队列"""
-        self.channel.queue_declare(queue=queue, durable=True)
+        with RABBITMQ_LATENCY.labels(operation="queue_declare").time():
+            self.channel.queue_declare(queue=queue, durable=True)
+
+    def queue_depth(self, queue: str) -> int:
+        """被动声明队列以获取积压消息数"""
+        return self.queue_info(queue)[0]
+
+    def queue_info(self, queue: str) -> Tuple[int, int]:
+        """被动声明队列，返回 (积压消息数, 消费者数)"""
+        if not self.connection or self.connection.is_closed:
+            self.connect()
+        with RABBITMQ_LATENCY.labels(operation="queue_depth").time():
+            result = self.channel.queue_declare(queue=queue, passive=True)
+        return result.method.message_count, result.method.consumer_count
 
     def bind_queue(self, queue: str, exchange: str, routing_key: str) -> None:
         """绑定队列到交换机"""
@@ -91,4 +164,72 @@ class RabbitMQClient:
     def close(self) -> None:
         """关闭连接"""
         if self.connection and not self.connection.is_closed:
-            self.connection.close()
\ No newline at end of file
+            self.connection.close()
+
+
+class SharedRabbitMQClient:
+    """进程内共享的客户端，所有pika调用在一个专用线程中串行执行
+
+    pika的BlockingConnection不是线程安全的，事件循环中的接口、线程池中的同步接口和后台刷新
+    若直接共用连接会破坏通道状态。调用方的追踪上下文随调用一同传入专用线程。
+    内部持有一个RabbitMQClient，只转交发布、声明和查询接口；消费请使用独立的RabbitMQClient。
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rabbitmq-io")
+        self._io_thread_id = self._executor.submit(threading.get_ident).result()
+        self._client = self._call(RabbitMQClient)
+        # 空闲期间定期处理连接事件以回应心跳，避免长时间没有发布时被服务端断开
+        interval = max(1, settings.rabbitmq.heartbeat // 2) if settings.rabbitmq.heartbeat else 0
+        if interval:
+            threading.Thread(target=self._keepalive, args=(interval,), name="rabbitmq-keepalive", daemon=True).start()
+
+    def _keepalive(self, interval: float) -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                self.submit(self._process_events).result()
+            except Exception as e:
+                logger.warning(f"处理RabbitMQ心跳失败: {str(e)}")
+
+    def _process_events(self) -> None:
+        connection = self._client.connection
+        if connection and not connection.is_closed:
+            connection.process_data_events(time_limit=0)
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """在专用线程中执行fn，返回Future（异步接口中可用asyncio.wrap_future等待）"""
+        context = contextvars.copy_context()
+        return self._executor.submit(context.run, fn, *args, **kwargs)
+
+    def _call(self, fn: Callable, *args, **kwargs):
+        if threading.get_ident() == self._io_thread_id:
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
+
+    def connect(self) -> None:
+        self._call(self._client.connect)
+
+    def publish(self, *args, **kwargs) -> None:
+        self._call(self._client.publish, *args, **kwargs)
+
+    def declare_exchange(self, *args, **kwargs) -> None:
+        self._call(self._client.declare_exchange, *args, **kwargs)
+
+    def declare_queue(self, *args, **kwargs) -> None:
+        self._call(self._client.declare_queue, *args, **kwargs)
+
+    def queue_depth(self, queue: str) -> int:
+        return self._call(self._client.queue_depth, queue)
+
+    def queue_info(self, queue: str) -> Tuple[int, int]:
+        return self._call(self._client.queue_info, queue)
+
+    def bind_queue(self, *args, **kwargs) -> None:
+        self._call(self._client.bind_queue, *args, **kwargs)
+
+    def reconnect(self) -> None:
+        self._call(self._client.reconnect)
+
+    def close(self) -> None:
+        self._call(self._client.close)
@@ -1,15 +1,22 @@
 from redis import Redis
-from dotenv import load_dotenv
-import os
-from typing import Optional, List
+import time
+from typing import Dict, Optional, List
 
-# 加载环境变量
-load_dotenv()
+from common.metrics import REDIS_LATENCY
+from common.logger import get_logger
+from common.config import settings
 
-# Redis配置
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-REDIS_DB = int(os.getenv("REDIS_DB", 0))
+logger = get_logger()
+
+class InstrumentedRedis(Redis):
+    """记录每条命令耗时的Redis客户端"""
+
+    def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            REDIS_LATENCY.labels(command=str(args[0]).lower()).observe(time.perf_counter() - start)
 
 class RedisClient:
     _instance: Optional[Redis] = None
@@ -18,10 +25,11 @@ class RedisClient:
     def get_client(cls) -> Redis:
         """获取Redis客户端单例"""
         if cls._instance is None:
-            cls._instance = Redis(
-                host=REDIS_HOST,
-                port=REDIS_PORT,
-                db=REDIS_DB,
+            cls._instance = InstrumentedRedis(
+                host=settings.redis.host,
+                port=settings.redis.port,
+                db=settings.redis.db,
+                password=settings.redis.password or None,
                 decode_responses=True
             )
         return cls._instance
@@ -42,7 +50,7 @@ class RedisClient:
                 client.expire(key, expire)
             return True
         except Exception as e:
-            print(f"Redis set error: {str(e)}")
+            logger.error(f"Redis set error: {str(e)}")
             return False
             
     def get(self, key: str) -> Optional[str]:
@@ -51,9 +59,28 @@ class RedisClient:
             client = self.get_client()
             return client.get(key)
         except Exception as e:
-            print(f"Redis get error: {str(e)}")
+            logger.error(f"Redis get error: {str(e)}")
             return None
 
+    def set_many(self, mapping: Dict[str, str]) -> bool:
+        """一次往返写入多个键值对"""
+        try:
+            client = self.get_client()
+            client.mset(mapping)
+            return True
+        except Exception as e:
+            logger.error(f"Redis mset error: {str(e)}")
+            return False
+
+    def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        """一次往返读取多个键"""
+        try:
+            client = self.get_client()
+            return client.mget(keys)
+        except Exception as e:
+            logger.error(f"Redis mget error: {str(e)}")
+            return [None] * len(keys)
+
     def scan_keys(self, pattern: str) -> List[str]:
         """通过 scan 获取匹配的键列表"""
         keys = []
@@ -66,7 +93,7 @@ class RedisClient:
                 if cursor == 0:
                     break
         except Exception as e:
-            print(f"Redis scan error: {str(e)}")
+            logger.error(f"Redis scan error: {str(e)}")
         return keys
             
     def keys(self, pattern: str) -> List[str]:
@@ -75,7 +102,7 @@ class RedisClient:
             client = self.get_client()
             return client.keys(pattern)
         except Exception as e:
-            print(f"Redis keys error: {str(e)}")
+            logger.error(f"Redis keys error: {str(e)}")
             return []
 
     def close(self):
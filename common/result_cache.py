@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from common.config import settings
+from common.redis_client import RedisClient
+from common.logger import get_logger
+from common.tunables import tunables
+
+logger = get_logger()
+
+# 结果缓存配置
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_TTL_HOURS = int(os.getenv("RESULT_CACHE_TTL_HOURS", 168))
+# 工作服务以相对路径(如 uploads/out_audio/...)记录输出文件，查找缓存时据此目录解析；
+# 默认为共享上传目录的上级，即工作服务的运行目录在API一侧的挂载位置
+RESULT_CACHE_OUTPUT_ROOT = os.getenv("RESULT_CACHE_OUTPUT_ROOT",
+                                     os.path.dirname(os.path.normpath(settings.services.upload_base_path)))
+
+# 影响生成结果的模型版本，更换模型权重时修改以使旧缓存失效
+MODEL_VERSIONS = {
+    "tts": os.getenv("TTS_MODEL_VERSION", "xtts2"),
+    "lipsync": os.getenv("LIPSYNC_MODEL_VERSION", "latentsync_unet"),
+}
+
+# 完整质量渲染使用的固定生成参数，音频和视频服务共用
+GENERATION_PARAMS = {
+    "language": "nl",
+    "seed": 42,
+}
+
+
+def generation_params() -> Dict[str, Any]:
+    """当前的完整质量生成参数，去噪步数和指导尺度可在运行时调整"""
+    return {
+        **GENERATION_PARAMS,
+        "inference_steps": tunables.get("inference_steps"),
+        "guidance_scale": tunables.get("guidance_scale"),
+    }
+
+
+def content_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """计算文件内容的SHA256哈希
+
+    按(路径, 大小, 修改时间)在Redis中记录已计算的哈希，重复提交同一文件时无需重新读取。
+    """
+    stats = os.stat(file_path)
+    fingerprint = f"{stats.st_size}:{int(stats.st_mtime)}"
+    redis_key = f"file_hash:{os.path.abspath(file_path)}"
+    redis_client = RedisClient.get_client()
+
+    recorded = redis_client.get(redis_key)
+    if recorded and recorded.rsplit(":", 1)[0] == fingerprint:
+        return recorded.rsplit(":", 1)[1]
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    file_hash = digest.hexdigest()
+    redis_client.set(redis_key, f"{fingerprint}:{file_hash}")
+    return file_hash
+
+
+class ResultCache:
+    """完整生成结果缓存
+
+    相同文本、参考音频、形象视频、模型版本和生成参数的请求结果是确定的，
+    命中时任务直接指向已有输出文件完成。
+    """
+
+    def __init__(self, ttl_hours: int = RESULT_CACHE_TTL_HOURS, enabled: bool = RESULT_CACHE_ENABLED,
+                 output_root: str = RESULT_CACHE_OUTPUT_ROOT):
+        self.ttl_seconds = ttl_hours * 3600
+        self.enabled = enabled and self.ttl_seconds > 0
+        self.output_root = output_root
+
+    def resolve_output(self, path: str) -> str:
+        """将工作服务记录的输出路径解析为本进程可访问的路径"""
+        if os.path.isabs(path):
+            return path
+        return os.path.join(self.output_root, path)
+
+    def make_key(self, text: str, audio_path: str, video_path: str) -> str:
+        """根据请求内容生成规范化的缓存键"""
+        payload = {
+            "text": text.strip(),
+            "voice": content_hash(audio_path),
+            "video": content_hash(video_path),
+            "models": MODEL_VERSIONS,
+            "params": generation_params(),
+        }
+        canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """查找缓存结果，输出文件已不存在时视为未命中"""
+        if not self.enabled:
+            return None
+        redis_client = RedisClient.get_client()
+        data = redis_client.get(f"result_cache:{key}")
+        if not data:
+            return None
+
+        result = json.loads(data)
+        outputs = [result.get("audio_output_path"), result.get("video_output_path")]
+        if not all(path and os.path.isfile(self.resolve_output(path)) for path in outputs):
+            redis_client.delete(f"result_cache:{key}")
+            return None
+        return result
+
+    def store(self, key: str, task_data: Dict[str, Any]) -> None:
+        """记录已完成任务的输出文件"""
+        if not self.enabled:
+            return
+        try:
+            result = {
+                "task_id": task_data["task_id"],
+                "audio_output_path": task_data["audio_output_path"],
+                "video_output_path": task_data["video_output_path"],
+                "created_at": datetime.now().isoformat(),
+            }
+            redis_client = RedisClient.get_client()
+            redis_client.set(f"result_cache:{key}", json.dumps(result), ex=self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"写入结果缓存失败: {key} - {str(e)}")
+
+
+# 创建全局结果缓存实例
+result_cache = ResultCache()
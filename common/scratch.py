@@ -0,0 +1,188 @@
+import os
+import shutil
+import socket
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from common.logger import get_logger
+from common.cancellation import TaskCancelled
+
+logger = get_logger()
+
+# 临时工作目录配置
+SCRATCH_DIR = os.getenv("SCRATCH_DIR", "scratch")
+SCRATCH_MAX_BYTES = int(float(os.getenv("SCRATCH_MAX_GB", 20)) * 1024 ** 3)
+# 内存文件系统上的目录（如 /dev/shm/clonevoice），用于分段音频等小体积中间文件，留空不启用
+SCRATCH_RAM_DIR = os.getenv("SCRATCH_RAM_DIR", "")
+SCRATCH_RAM_MAX_BYTES = int(float(os.getenv("SCRATCH_RAM_MAX_MB", 1024)) * 1024 ** 2)
+
+# 正在使用的目录中记录所属主机和进程，其他进程回收空间时跳过
+OWNER_FILE = ".owner"
+# SCRATCH_DIR可能由多台主机共享，无法检查其他主机上的进程，其目录超过该时长未修改才视为遗留
+SCRATCH_FOREIGN_STALE_SECONDS = float(os.getenv("SCRATCH_FOREIGN_STALE_SECONDS", 24 * 3600))
+HOSTNAME = socket.gethostname()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class ScratchRoot:
+    """一个临时文件根目录及其字节预算"""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def entries(self) -> List[Path]:
+        return [entry for entry in self.path.iterdir() if entry.is_dir()]
+
+    def usage(self) -> int:
+        return sum(_dir_size(entry) for entry in self.entries())
+
+    @staticmethod
+    def in_use(entry: Path) -> bool:
+        """目录是否被存活的进程占用，其他主机的目录按最近修改时间判断"""
+        owner = entry / OWNER_FILE
+        try:
+            host, _, pid = owner.read_text().rpartition(":")
+            pid = int(pid)
+        except (OSError, ValueError):
+            return False
+        if host and host != HOSTNAME:
+            try:
+                return time.time() - owner.stat().st_mtime < SCRATCH_FOREIGN_STALE_SECONDS
+            except OSError:
+                return False
+        return _pid_alive(pid)
+
+    @staticmethod
+    def _mtime(entry: Path) -> Optional[float]:
+        try:
+            return entry.stat().st_mtime
+        except OSError:
+            return None
+
+    def reclaim(self, reserve: int = 0) -> int:
+        """按最近修改时间从旧到新删除未被占用的目录，直到占用加reserve不超过预算
+
+        返回删除后的占用字节数。
+        """
+        sizes: Dict[Path, int] = {entry: _dir_size(entry) for entry in self.entries()}
+        usage = sum(sizes.values())
+        if usage + reserve <= self.max_bytes:
+            return usage
+
+        # 其他进程可能同时在回收，已被删除的目录直接跳过
+        idle = []
+        for entry in sizes:
+            mtime = self._mtime(entry)
+            if mtime is not None and not self.in_use(entry):
+                idle.append((mtime, entry))
+        for _, entry in sorted(idle):
+            shutil.rmtree(entry, ignore_errors=True)
+            usage -= sizes[entry]
+            logger.info(f"回收临时目录: {entry} ({sizes[entry] / 1024 ** 2:.1f} MB)")
+            if usage + reserve <= self.max_bytes:
+                break
+        if usage + reserve > self.max_bytes:
+            logger.warning(f"临时目录 {self.path} 占用 {usage / 1024 ** 3:.2f} GB，超过预算且均在使用中")
+        return usage
+
+
+class ScratchSpace:
+    """任务级临时工作目录
+
+    每个任务在根目录下获得独立的子目录，任务结束后无论成功失败都会删除；
+    新目录创建前按LRU回收已结束任务遗留的目录，使总占用不超过字节预算。
+    配置SCRATCH_RAM_DIR后，ram=True的目录放在内存文件系统上，预算不足时回退到磁盘。
+    """
+
+    def __init__(self, root: str = SCRATCH_DIR, max_bytes: int = SCRATCH_MAX_BYTES,
+                 ram_root: str = SCRATCH_RAM_DIR, ram_max_bytes: int = SCRATCH_RAM_MAX_BYTES):
+        self.disk = ScratchRoot(root, max_bytes)
+        self.ram: Optional[ScratchRoot] = None
+        if ram_root:
+            try:
+                self.ram = ScratchRoot(ram_root, ram_max_bytes)
+            except OSError as e:
+                logger.warning(f"内存临时目录不可用，使用磁盘: {str(e)}")
+
+    @property
+    def root(self) -> Path:
+        return self.disk.path
+
+    def _select_root(self, ram: bool, reserve: int) -> ScratchRoot:
+        if ram and self.ram is not None:
+            if self.ram.reclaim(reserve) + reserve <= self.ram.max_bytes:
+                return self.ram
+            logger.warning("内存临时目录空间不足，使用磁盘")
+        self.disk.reclaim(reserve)
+        return self.disk
+
+    @contextmanager
+    def task_dir(self, task_id: str, kind: str, ram: bool = False, reserve: int = 0,
+                 keep_on_error: bool = False) -> Iterator[Path]:
+        """创建任务的临时工作目录，退出时删除
+
+        Args:
+            task_id: 任务ID
+            kind: 用途，区分同一任务的多个目录
+            ram: 是否优先放在内存文件系统上
+            reserve: 预计写入的字节数，用于提前回收空间
+            keep_on_error: 失败时保留目录（如可从检查点恢复的分块），之后按LRU回收；任务被取消时不保留
+        """
+        scratch_root = self._select_root(ram, reserve)
+        path = scratch_root.path / f"{kind}_{task_id}"
+        path.mkdir(parents=True, exist_ok=True)
+        owner = path / OWNER_FILE
+        owner.write_text(f"{HOSTNAME}:{os.getpid()}")
+        try:
+            yield path
+        except BaseException as e:
+            if keep_on_error and not isinstance(e, TaskCancelled):
+                owner.unlink(missing_ok=True)
+                os.utime(path)
+            else:
+                shutil.rmtree(path, ignore_errors=True)
+            raise
+        shutil.rmtree(path, ignore_errors=True)
+
+    def stats(self) -> Dict:
+        roots = {"disk": self.disk}
+        if self.ram is not None:
+            roots["ram"] = self.ram
+        return {
+            name: {
+                "path": str(scratch_root.path),
+                "bytes": scratch_root.usage(),
+                "max_bytes": scratch_root.max_bytes,
+                "directories": len(scratch_root.entries()),
+                "checked_at": time.time(),
+            }
+            for name, scratch_root in roots.items()
+        }
+
+
+# 创建全局临时目录实例
+scratch_space = ScratchSpace()
@@ -0,0 +1,88 @@
+import builtins
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# 启动剖析配置，该模块需在其他依赖之前导入，不依赖dotenv
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "true").lower() == "true"
+STARTUP_PROFILE_TOP_IMPORTS = int(os.getenv("STARTUP_PROFILE_TOP_IMPORTS", 15))
+
+
+class StartupProfiler:
+    """记录服务启动各阶段耗时和导入树耗时
+
+    导入计时通过临时包装 builtins.__import__ 实现，仅统计首次导入的模块，
+    记录包含子模块在内的累计耗时和导入深度，服务就绪后输出报告。
+    """
+
+    def __init__(self, enabled: bool = STARTUP_PROFILE):
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+        # (模块名, 深度, 累计耗时)
+        self.imports: List[Tuple[str, int, float]] = []
+        self.ready_at: Optional[float] = None
+        self._depth = 0
+        self._original_import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            self._depth -= 1
+            self.imports.append((name, self._depth, time.perf_counter() - start))
+
+    @contextmanager
+    def phase(self, name: str, trace_imports: bool = False):
+        """记录一个启动阶段的耗时，trace_imports为True时同时统计导入耗时"""
+        if not self.enabled:
+            yield
+            return
+
+        if trace_imports and self._original_import is None:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._timed_import
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+            if trace_imports and self._original_import is not None:
+                builtins.__import__ = self._original_import
+                self._original_import = None
+
+    def mark_ready(self) -> float:
+        """标记服务就绪，返回从进程开始导入到就绪的秒数"""
+        if self.ready_at is None:
+            self.ready_at = time.perf_counter()
+        return self.ready_at - self.start
+
+    def summary(self) -> Dict:
+        top_level = [item for item in self.imports if item[1] == 0]
+        slowest = sorted(top_level, key=lambda item: item[2], reverse=True)[:STARTUP_PROFILE_TOP_IMPORTS]
+        return {
+            "time_to_ready": round((self.ready_at or time.perf_counter()) - self.start, 4),
+            "phases": [{"name": name, "seconds": round(seconds, 4)} for name, seconds in self.phases],
+            "slowest_imports": [{"module": name, "seconds": round(seconds, 4)} for name, _, seconds in slowest],
+        }
+
+    def report(self, logger) -> None:
+        """将启动剖析结果写入日志"""
+        if not self.enabled:
+            return
+        summary = self.summary()
+        phases = ", ".join(f"{p['name']}={p['seconds']:.3f}s" for p in summary["phases"])
+        logger.info(f"启动耗时 {summary['time_to_ready']:.3f}s: {phases}")
+        if summary["slowest_imports"]:
+            imports = ", ".join(f"{i['module']}={i['seconds']:.3f}s" for i in summary["slowest_imports"])
+            logger.info(f"最慢的顶层导入: {imports}")
+
+
+# 创建全局启动剖析器实例
+startup_profiler = StartupProfiler()
@@ -0,0 +1,184 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from common.logger import get_logger
+
+logger = get_logger()
+
+# 链路追踪配置
+TRACE_DIR = os.getenv("TRACE_DIR", "logs/traces")
+
+# AMQP消息头字段
+HEADER_TRACE_ID = "x-trace-id"
+HEADER_PARENT_SPAN_ID = "x-parent-span-id"
+HEADER_TASK_ID = "x-task-id"
+HEADER_PUBLISHED_AT = "x-published-at"
+
+# 当前线程/协程的追踪上下文: {"trace_id", "span_id", "task_id"}
+_current_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar("trace_context", default=None)
+
+
+class Tracer:
+    """跨服务链路追踪
+
+    追踪上下文在 /generate/task 创建，经RabbitMQ消息头在服务间传递。
+    每个阶段记录排队(queue)和计算(compute)两类span，按trace写入本地JSONL文件。
+    """
+
+    def __init__(self, trace_dir: str = TRACE_DIR):
+        self.trace_dir = Path(trace_dir)
+        self.trace_dir.mkdir(parents=True, exist_ok=True)
+        self.service = "unknown"
+        self._lock = threading.Lock()
+
+    def set_service(self, service_name: str) -> None:
+        """设置当前进程的服务名称"""
+        self.service = service_name
+
+    @staticmethod
+    def current() -> Optional[Dict[str, Any]]:
+        return _current_context.get()
+
+    def start_trace(self, task_id: str) -> str:
+        """为新任务创建追踪上下文，返回trace_id"""
+        trace_id = uuid.uuid4().hex
+        _current_context.set({"trace_id": trace_id, "span_id": None, "task_id": task_id})
+        return trace_id
+
+    @contextmanager
+    def task_context(self, task_data: Dict[str, Any]):
+        """切换到任务自身的追踪上下文，用于一条消息包含多个任务（批量任务）的情况"""
+        if not task_data.get("trace_id"):
+            yield
+            return
+        token = _current_context.set({"trace_id": task_data["trace_id"], "span_id": None,
+                                      "task_id": task_data["task_id"]})
+        try:
+            yield
+        finally:
+            _current_context.reset(token)
+
+    def inject(self, headers: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """将当前追踪上下文写入消息头"""
+        headers = dict(headers or {})
+        headers[HEADER_PUBLISHED_AT] = time.time()
+        context = self.current()
+        if context:
+            headers[HEADER_TRACE_ID] = context["trace_id"]
+            headers[HEADER_TASK_ID] = context["task_id"]
+            if context["span_id"]:
+                headers[HEADER_PARENT_SPAN_ID] = context["span_id"]
+        return headers
+
+    @contextmanager
+    def consume_context(self, queue: str, properties):
+        """从消息头恢复追踪上下文，并记录消息在队列中的等待时间"""
+        headers = getattr(properties, "headers", None) or {}
+        if HEADER_TRACE_ID not in headers:
+            yield
+            return
+
+        context = {
+            "trace_id": headers[HEADER_TRACE_ID],
+            "span_id": headers.get(HEADER_PARENT_SPAN_ID),
+            "task_id": headers.get(HEADER_TASK_ID),
+        }
+        published_at = headers.get(HEADER_PUBLISHED_AT)
+        if published_at:
+            self._export(context, f"queue.{queue}", "queue", float(published_at), time.time())
+
+        token = _current_context.set(context)
+        try:
+            yield
+        finally:
+            _current_context.reset(token)
+
+    @contextmanager
+    def span(self, name: str, kind: str = "compute", **attributes):
+        """记录当前上下文中的一段计算，期间发布的消息以其为父span"""
+        context = self.current()
+        if not context:
+            yield
+            return
+
+        span_id = uuid.uuid4().hex[:16]
+        token = _current_context.set({**context, "span_id": span_id})
+        start = time.time()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            _current_context.reset(token)
+            if error:
+                attributes["error"] = error
+            self._export(context, name, kind, start, time.time(), span_id=span_id, **attributes)
+
+    def _export(self, context: Dict[str, Any], name: str, kind: str, start: float, end: float,
+                span_id: Optional[str] = None, **attributes) -> None:
+        """以JSONL格式追加写入span"""
+        span = {
+            "trace_id": context["trace_id"],
+            "span_id": span_id or uuid.uuid4().hex[:16],
+            "parent_id": context.get("span_id"),
+            "task_id": context.get("task_id"),
+            "service": self.service,
+            "name": name,
+            "kind": kind,
+            "start": start,
+            "end": end,
+            "duration": round(end - start, 6),
+            "attributes": attributes,
+        }
+        try:
+            with self._lock, open(self.trace_dir / f"{context['trace_id']}.jsonl", 'a', encoding='utf-8') as f:
+                f.write(json.dumps(span, ensure_ascii=False) + "\n")
+        except Exception as e:
+            logger.warning(f"写入追踪数据失败: {str(e)}")
+
+    def get_spans(self, trace_id: str) -> List[Dict[str, Any]]:
+        """读取trace的全部span，按开始时间排序"""
+        trace_file = self.trace_dir / f"{trace_id}.jsonl"
+        if not trace_file.exists():
+            return []
+        with open(trace_file, 'r', encoding='utf-8') as f:
+            spans = [json.loads(line) for line in f if line.strip()]
+        return sorted(spans, key=lambda s: s["start"])
+
+    def timeline(self, trace_id: str) -> Dict[str, Any]:
+        """汇总各阶段的排队等待和计算耗时"""
+        spans = self.get_spans(trace_id)
+        stages = [
+            {
+                "name": span["name"],
+                "service": span["service"],
+                "kind": span["kind"],
+                "start": span["start"],
+                "duration": span["duration"],
+                "error": span["attributes"].get("error"),
+            }
+            for span in spans
+        ]
+        queue_wait = sum(s["duration"] for s in spans if s["kind"] == "queue")
+        compute = sum(s["duration"] for s in spans if s["kind"] == "compute")
+        end_to_end = max(s["end"] for s in spans) - spans[0]["start"] if spans else 0.0
+        return {
+            "trace_id": trace_id,
+            "stages": stages,
+            "total_queue_wait": round(queue_wait, 6),
+            "total_compute": round(compute, 6),
+            "end_to_end": round(end_to_end, 6),
+        }
+
+
+# 创建全局追踪器实例
+tracer = Tracer()
@@ -0,0 +1,195 @@
+import hmac
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import yaml
+from fastapi import APIRouter, Depends, Header, HTTPException
+
+from common.config import config, CONFIG_DIR
+from common.logger import get_logger
+
+logger = get_logger()
+
+# 覆盖文件路径和检查间隔（秒）
+TUNABLES_FILE = os.getenv("TUNABLES_FILE", str(CONFIG_DIR / "tunables.yaml"))
+TUNABLES_WATCH_INTERVAL = float(os.getenv("TUNABLES_WATCH_INTERVAL", 2))
+# /admin/tunables 的访问令牌，请求需携带 Authorization: Bearer <令牌>；留空时接口不可用，只能通过文件覆盖
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# 名称 -> (类型, 默认值, 最小值, 最大值)，同名大写环境变量覆盖 base.yaml 中 tunables 段的值
+TUNABLE_DEFINITIONS: Dict[str, Tuple[Callable, Any, float, float]] = {
+    # 完整质量渲染的去噪步数和指导尺度
+    "inference_steps": (int, 20, 1, 100),
+    "guidance_scale": (float, 1.0, 0, 10),
+    # 预览档位的去噪步数和最大高度
+    "preview_inference_steps": (int, 5, 1, 50),
+    "preview_max_height": (int, 360, 64, 2160),
+    # 每次渲染/打包时创建的进程池和线程池大小
+    "video_chunk_workers": (int, 2, 1, 16),
+    "hls_workers": (int, 3, 1, 16),
+    # 上传文件大小上限（MB）
+    "max_audio_upload_mb": (int, 50, 1, 1024),
+    "max_video_upload_mb": (int, 500, 1, 10240),
+    "batch_max_items": (int, 100, 1, 1000),
+    # 准入控制，0表示不限
+    "admission_max_backlog": (int, 200, 0, 100000),
+    "admission_max_eta_seconds": (float, 1800, 0, 86400),
+}
+
+
+def require_admin_token(authorization: str = Header(default="")) -> None:
+    """校验管理接口的访问令牌，未配置ADMIN_TOKEN时拒绝所有请求"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API is disabled")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+
+
+class Tunables:
+    """运行时可调整的性能参数
+
+    启动时的取值为 环境变量 > base.yaml > 默认值；运行时可通过两种方式覆盖，无需重启模型进程：
+    修改 TUNABLES_FILE（各进程后台线程按修改时间重新加载），或调用本服务的 PUT /admin/tunables。
+    接口覆盖优先于文件覆盖，只作用于收到请求的进程。调用方在每次使用时读取，新值从下一个任务开始生效。
+    """
+
+    def __init__(self, file_path: str = TUNABLES_FILE, watch_interval: float = TUNABLES_WATCH_INTERVAL):
+        self.file_path = file_path
+        self.watch_interval = watch_interval
+        self._base = self._load_base()
+        self._file_overrides: Dict[str, Any] = {}
+        self._runtime_overrides: Dict[str, Any] = {}
+        self._file_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self.reload_file()
+
+    @staticmethod
+    def _load_base() -> Dict[str, Any]:
+        configured = config.get_tunables_config()
+        base = {}
+        for name, (cast, default, _, _) in TUNABLE_DEFINITIONS.items():
+            value = os.getenv(name.upper())
+            if value is None:
+                value = configured.get(name, default)
+            base[name] = cast(value)
+        return base
+
+    @staticmethod
+    def validate(values: Dict[str, Any]) -> Dict[str, Any]:
+        """校验并转换参数值，未知名称或超出范围时抛出ValueError"""
+        if not isinstance(values, dict):
+            raise ValueError("参数必须是名称到取值的映射")
+        validated = {}
+        for name, value in values.items():
+            if name not in TUNABLE_DEFINITIONS:
+                raise ValueError(f"未知参数: {name}")
+            cast, _, minimum, maximum = TUNABLE_DEFINITIONS[name]
+            try:
+                value = cast(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"参数 {name} 需要 {cast.__name__} 类型")
+            if value < minimum:
+                raise ValueError(f"参数 {name} 不能小于 {minimum}")
+            if value > maximum:
+                raise ValueError(f"参数 {name} 不能大于 {maximum}")
+            validated[name] = value
+        return validated
+
+    def get(self, name: str) -> Any:
+        with self._lock:
+            if name in self._runtime_overrides:
+                return self._runtime_overrides[name]
+            if name in self._file_overrides:
+                return self._file_overrides[name]
+            return self._base[name]
+
+    def values(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._base, **self._file_overrides, **self._runtime_overrides}
+
+    def update(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """通过接口覆盖参数，返回生效后的全部取值"""
+        validated = self.validate(values)
+        with self._lock:
+            self._runtime_overrides.update(validated)
+        logger.info(f"性能参数已更新: {validated}")
+        return self.values()
+
+    def reset(self) -> Dict[str, Any]:
+        """清除接口覆盖，恢复为文件覆盖或启动时的取值"""
+        with self._lock:
+            self._runtime_overrides = {}
+        return self.values()
+
+    def reload_file(self) -> bool:
+        """覆盖文件的修改时间变化时重新加载，文件内容无效时保留上次的覆盖"""
+        try:
+            mtime = os.path.getmtime(self.file_path)
+        except OSError:
+            mtime = None
+        if mtime == self._file_mtime:
+            return False
+        self._file_mtime = mtime
+
+        overrides = {}
+        if mtime is not None:
+            try:
+                with open(self.file_path, 'r', encoding='utf-8') as f:
+                    overrides = self.validate(yaml.safe_load(f) or {})
+            except (OSError, yaml.YAMLError, ValueError) as e:
+                logger.error(f"性能参数文件无效，保留当前取值: {self.file_path} - {str(e)}")
+                return False
+        with self._lock:
+            changed = overrides != self._file_overrides
+            self._file_overrides = overrides
+        if changed:
+            logger.info(f"已加载性能参数文件: {self.file_path} {overrides}")
+        return changed
+
+    def start_watching(self) -> None:
+        """启动后台线程监视覆盖文件"""
+        if self._watcher is not None or self.watch_interval <= 0:
+            return
+
+        def watch():
+            while True:
+                time.sleep(self.watch_interval)
+                self.reload_file()
+
+        self._watcher = threading.Thread(target=watch, name="tunables-watcher", daemon=True)
+        self._watcher.start()
+
+    def router(self) -> APIRouter:
+        """/admin/tunables 路由：查看、覆盖和重置本进程的性能参数，需携带ADMIN_TOKEN"""
+        router = APIRouter(prefix="/admin/tunables", tags=["admin"], dependencies=[Depends(require_admin_token)])
+
+        @router.get("")
+        async def get_tunables():
+            with self._lock:
+                return {
+                    "values": {**self._base, **self._file_overrides, **self._runtime_overrides},
+                    "file": self.file_path,
+                    "file_overrides": dict(self._file_overrides),
+                    "runtime_overrides": dict(self._runtime_overrides),
+                }
+
+        @router.put("")
+        async def update_tunables(values: Dict[str, Any]):
+            try:
+                return {"values": self.update(values)}
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        @router.delete("")
+        async def reset_tunables():
+            return {"values": self.reset()}
+
+        return router
+
+
+# 创建全局性能参数实例
+tunables = Tunables()
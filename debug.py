@@ -1,9 +1,11 @@
-import subprocess
+import asyncio
+import math
 import sys
 import os
 import signal
 import time
-from typing import Dict, List
+import urllib.request
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
 # Add project root to Python path
@@ -13,156 +15,395 @@ sys.path.append(project_root)
 # Load environment variables
 load_dotenv()
 
+# Supervisor configuration
+STARTUP_TIMEOUT = float(os.getenv('SUPERVISOR_STARTUP_TIMEOUT', 300))  # 等待服务就绪（含模型预热）的秒数
+HEALTH_INTERVAL = float(os.getenv('SUPERVISOR_HEALTH_INTERVAL', 10))
+HEALTH_FAILURES = int(os.getenv('SUPERVISOR_HEALTH_FAILURES', 3))  # 连续存活检查失败次数达到后重启
+BACKOFF_BASE = float(os.getenv('SUPERVISOR_BACKOFF_BASE', 1))
+BACKOFF_MAX = float(os.getenv('SUPERVISOR_BACKOFF_MAX', 60))
+STABLE_SECONDS = float(os.getenv('SUPERVISOR_STABLE_SECONDS', 60))  # 稳定运行超过该时长后重置退避
+REPLICA_PORT_STRIDE = int(os.getenv('SUPERVISOR_REPLICA_PORT_STRIDE', 100))
+
+# Autoscaling configuration
+AUTOSCALE_ENABLED = os.getenv('AUTOSCALE_ENABLED', 'false').lower() == 'true'
+AUTOSCALE_INTERVAL = float(os.getenv('AUTOSCALE_INTERVAL', 5))
+AUTOSCALE_TARGET_DRAIN_SECONDS = float(os.getenv('AUTOSCALE_TARGET_DRAIN_SECONDS', 120))  # 期望的积压排空时间
+AUTOSCALE_UP_COOLDOWN = float(os.getenv('AUTOSCALE_UP_COOLDOWN', 30))
+AUTOSCALE_DOWN_COOLDOWN = float(os.getenv('AUTOSCALE_DOWN_COOLDOWN', 300))
+
 # Service configurations
 SERVICES = {
     'api': {
         'name': 'API Service',
         'module': 'api_service.main',
-        'port': int(os.getenv('API_SERVICE_PORT', 8000))
+        'port_env': 'API_SERVICE_PORT',
+        'port': int(os.getenv('API_SERVICE_PORT', 8000)),
+        # SSE连接保存在进程内存中，API服务只运行一个实例
+        'replicas': 1,
     },
     'video': {
         'name': 'Video Service',
         'module': 'video_service.main',
-        'port': int(os.getenv('VIDEO_SERVICE_PORT', 8001))
+        'port_env': 'VIDEO_SERVICE_PORT',
+        'port': int(os.getenv('VIDEO_SERVICE_PORT', 8001)),
+        'replicas': int(os.getenv('VIDEO_REPLICAS', 1)),
+        'gpus': [gpu for gpu in os.getenv('VIDEO_REPLICA_GPUS', '').split(',') if gpu],
+        'autoscale': {
+            'queue': 'video_tasks',
+            'min': int(os.getenv('VIDEO_MIN_REPLICAS', 1)),
+            'max': int(os.getenv('VIDEO_MAX_REPLICAS', 2)),
+            'default_service_time': float(os.getenv('VIDEO_DEFAULT_SERVICE_TIME', 120)),
+        },
     },
     'audio': {
         'name': 'Audio Service',
         'module': 'audio_service.main',
-        'port': int(os.getenv('AUDIO_SERVICE_PORT', 8002))
+        'port_env': 'AUDIO_SERVICE_PORT',
+        'port': int(os.getenv('AUDIO_SERVICE_PORT', 8002)),
+        'replicas': int(os.getenv('AUDIO_REPLICAS', 1)),
+        'gpus': [gpu for gpu in os.getenv('AUDIO_REPLICA_GPUS', '').split(',') if gpu],
+        'autoscale': {
+            'queue': 'audio_tasks',
+            'min': int(os.getenv('AUDIO_MIN_REPLICAS', 1)),
+            'max': int(os.getenv('AUDIO_MAX_REPLICAS', 4)),
+            'default_service_time': float(os.getenv('AUDIO_DEFAULT_SERVICE_TIME', 10)),
+        },
     }
 }
 
+
+def http_ok(url: str, timeout: float = 2) -> bool:
+    """请求健康检查接口，返回是否为200"""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status == 200
+    except Exception:
+        return False
+
+
+def tasks_in_flight(url: str, timeout: float = 2) -> Optional[float]:
+    """从实例的 /metrics 读取正在处理的任务数，读取失败时返回None"""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            for line in response.read().decode().splitlines():
+                if line.startswith("ai_service_tasks_in_flight{"):
+                    return float(line.rsplit(" ", 1)[1])
+    except Exception:
+        return None
+    return 0.0
+
+
+def initial_replicas(service_id: str) -> int:
+    """启动时的实例数，启用自动扩缩容时限制在[min, max]内，避免启动后立即被缩容"""
+    config = SERVICES[service_id]
+    count = config['replicas']
+    policy = config.get('autoscale')
+    if not AUTOSCALE_ENABLED or not policy:
+        return count
+    clamped = max(policy['min'], min(policy['max'], count))
+    if clamped != count:
+        print(f"⚠️ {config['name']} 实例数 {count} 超出自动扩缩容范围 "
+              f"[{policy['min']}, {policy['max']}]，按 {clamped} 启动")
+    return clamped
+
+
+class Replica:
+    """一个服务实例进程及其重启状态"""
+
+    def __init__(self, service_id: str, index: int):
+        config = SERVICES[service_id]
+        self.service_id = service_id
+        self.index = index
+        self.port = config['port'] + index * REPLICA_PORT_STRIDE
+        self.name = config['name'] + (f" #{index}" if index else "")
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.started_at = 0.0
+        self.failures = 0
+        self.stopping = False
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.port}{path}"
+
+
 class ServiceManager:
+    """基于asyncio的服务进程管理器
+
+    所有子进程的stdout/stderr由事件循环统一读取，互不阻塞；
+    通过 /health/ready 判断启动完成，/health/live 检测卡死，
+    进程退出或失去响应后按指数退避重启；音频、视频服务可在同一主机上运行多个实例。
+    """
+
     def __init__(self):
-        self.processes: Dict[str, subprocess.Popen] = {}
+        self.replicas: Dict[str, List[Replica]] = {service_id: [] for service_id in SERVICES}
         self.is_running = True
-        self.startup_timeout = 30  # Seconds to wait for service startup
+        self.startup_timeout = STARTUP_TIMEOUT
+
+    def replica_env(self, replica: Replica) -> dict:
+        """为实例生成环境变量：独立端口、轮流分配GPU、按实例数划分CPU线程"""
+        config = SERVICES[replica.service_id]
+        env = os.environ.copy()
+        env["PYTHONPATH"] = project_root
+        env[config['port_env']] = str(replica.port)
+        if config.get('gpus'):
+            env["CUDA_VISIBLE_DEVICES"] = config['gpus'][replica.index % len(config['gpus'])]
+        if replica.service_id == 'audio' and int(env.get("TTS_CPU_INTRA_OP_THREADS", 0)) == 0:
+            count = max(1, len(self.replicas['audio']))
+            env["TTS_CPU_INTRA_OP_THREADS"] = str(max(1, (os.cpu_count() or 1) // count))
+        return env
+
+    async def pump_output(self, replica: Replica, stream: asyncio.StreamReader, is_error: bool):
+        """逐行转发子进程输出"""
+        label = f"[{replica.name} ERROR]" if is_error else f"[{replica.name}]"
+        while True:
+            line = await stream.readline()
+            if not line:
+                break
+            print(f"{label} {line.decode(errors='replace').rstrip()}", flush=True)
+
+    async def spawn(self, replica: Replica):
+        """启动实例进程"""
+        replica.ready.clear()
+        replica.process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", SERVICES[replica.service_id]['module'],
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=project_root,
+            env=self.replica_env(replica)
+        )
+        replica.started_at = time.time()
+        asyncio.create_task(self.pump_output(replica, replica.process.stdout, False))
+        asyncio.create_task(self.pump_output(replica, replica.process.stderr, True))
 
-    def start_service(self, service_id: str, service_config: dict):
-        """Start a single service"""
+    async def probe(self, replica: Replica, path: str) -> bool:
+        return await asyncio.to_thread(http_ok, replica.url(path))
+
+    async def wait_ready(self, replica: Replica) -> bool:
+        """轮询 /health/ready 直到就绪、进程退出或超时"""
+        deadline = time.time() + self.startup_timeout
+        while time.time() < deadline:
+            if not replica.running:
+                print(f"❌ {replica.name} exited with code {replica.process.returncode}")
+                return False
+            if await self.probe(replica, "/health/ready"):
+                replica.ready.set()
+                print(f"✅ {replica.name} started on port {replica.port}")
+                return True
+            await asyncio.sleep(0.5)
+        print(f"❌ {replica.name} startup timeout after {self.startup_timeout}s")
+        return False
+
+    async def watch(self, replica: Replica):
+        """等待进程退出或连续多次存活检查失败"""
+        failures = 0
+        while self.is_running and not replica.stopping:
+            try:
+                await asyncio.wait_for(asyncio.shield(replica.process.wait()), HEALTH_INTERVAL)
+                return
+            except asyncio.TimeoutError:
+                pass
+            if await self.probe(replica, "/health/live"):
+                failures = 0
+                continue
+            failures += 1
+            if failures >= HEALTH_FAILURES:
+                print(f"⚠️ {replica.name} 连续 {failures} 次存活检查失败")
+                return
+
+    async def terminate(self, replica: Replica):
+        """先发送SIGTERM，超时后强制结束"""
+        if not replica.running:
+            return
+        replica.process.terminate()
         try:
-            # Set PYTHONPATH and working directory
-            env = os.environ.copy()
-            env["PYTHONPATH"] = project_root
-            
-            # Use project root as working directory instead of individual service dirs
-            process = subprocess.Popen(
-                [sys.executable, "-m", service_config['module']],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                universal_newlines=True,
-                cwd=project_root,  # Changed to use project root
-                env=env
-            )
-            
-            # Wait for service to initialize
-            start_time = time.time()
-            while time.time() - start_time < self.startup_timeout:
-                if process.poll() is not None:
-                    raise Exception(f"Service exited with code {process.poll()}")
-                
-                # Check stdout/stderr for startup messages
-                line = process.stdout.readline() if process.stdout else ""
-                error = process.stderr.readline() if process.stderr else ""
-                
-                if "服务启动" in line or "service started" in line.lower():
-                    self.processes[service_id] = process
-                    print(f"✅ {service_config['name']} started on port {service_config['port']}")
-                    return True
-                    
-                if error:
-                    print(f"[{service_config['name']} ERROR] {error.strip()}")
-                    
-                time.sleep(0.1)
-                
-            raise TimeoutError(f"Service startup timeout after {self.startup_timeout}s")
-            
-        except Exception as e:
-            print(f"❌ {service_config['name']} failed to start: {str(e)}")
-            if service_id in self.processes:
-                self.processes[service_id].terminate()
-                del self.processes[service_id]
-            return False
+            await asyncio.wait_for(replica.process.wait(), 10)
+            print(f"✅ {replica.name} 已停止")
+        except asyncio.TimeoutError:
+            replica.process.kill()
+            await replica.process.wait()
+            print(f"⚠️ {replica.name} 被强制终止")
+
+    async def supervise(self, replica: Replica):
+        """启动实例并在退出或失去响应后按指数退避重启"""
+        while self.is_running and not replica.stopping:
+            await self.spawn(replica)
+            if await self.wait_ready(replica):
+                await self.watch(replica)
+            replica.ready.clear()
+            if not self.is_running or replica.stopping:
+                break
+            await self.terminate(replica)
+
+            if time.time() - replica.started_at > STABLE_SECONDS:
+                replica.failures = 0
+            replica.failures += 1
+            delay = min(BACKOFF_BASE * 2 ** (replica.failures - 1), BACKOFF_MAX)
+            print(f"⚠️ {replica.name} 已停止运行，{delay:.0f}s 后重启（第 {replica.failures} 次）")
+            await asyncio.sleep(delay)
 
-    def start_all_services(self):
+    def start_replica(self, service_id: str) -> Replica:
+        """以最小未使用的序号启动一个新实例"""
+        used = {replica.index for replica in self.replicas[service_id]}
+        index = next(i for i in range(len(used) + 1) if i not in used)
+        replica = Replica(service_id, index)
+        self.replicas[service_id].append(replica)
+        replica.task = asyncio.create_task(self.supervise(replica))
+        return replica
+
+    async def is_idle(self, replica: Replica) -> bool:
+        in_flight = await asyncio.to_thread(tasks_in_flight, replica.url("/metrics"))
+        return in_flight == 0
+
+    async def stop_replica(self, replica: Replica):
+        replica.stopping = True
+        await self.terminate(replica)
+        if replica.task:
+            replica.task.cancel()
+        self.replicas[replica.service_id].remove(replica)
+
+    async def scale(self, service_id: str, count: int, idle_only: bool = False) -> int:
+        """将服务实例数调整为count，缩容时优先停止序号最大的实例
+
+        idle_only为True时只停止没有正在处理任务的实例，返回调整后的实例数。
+        """
+        while len(self.replicas[service_id]) < count:
+            self.start_replica(service_id)
+        for replica in sorted(self.replicas[service_id], key=lambda r: r.index, reverse=True):
+            if len(self.replicas[service_id]) <= count:
+                break
+            if idle_only and replica.ready.is_set() and not await self.is_idle(replica):
+                continue
+            await self.stop_replica(replica)
+        return len(self.replicas[service_id])
+
+    async def start_all_services(self):
         """Start all services in correct order"""
         print("🚀 Starting all services...")
-        
-        # Start services in dependency order
+
+        # Start services in dependency order, each waits until all replicas are ready
         service_order = ['api', 'video', 'audio']
         for service_id in service_order:
-            if not self.start_service(service_id, SERVICES[service_id]):
+            await self.scale(service_id, initial_replicas(service_id))
+            waiters = [replica.ready.wait() for replica in self.replicas[service_id]]
+            try:
+                await asyncio.wait_for(asyncio.gather(*waiters), self.startup_timeout)
+            except asyncio.TimeoutError:
                 print(f"❌ Failed to start {SERVICES[service_id]['name']}, stopping all services...")
-                self.stop_all_services()
+                await self.stop_all_services()
                 sys.exit(1)
-            time.sleep(2)  # Wait between service starts
-
-    def monitor_output(self):
-        """监控所有服务的输出"""
-        while self.is_running:
-            for service_id, process in self.processes.items():
-                service_name = SERVICES[service_id]['name']
-                
-                # 检查stdout
-                if process.stdout and process.stdout.readable():
-                    while True:
-                        output = process.stdout.readline()
-                        if not output:
-                            break
-                        print(f"[{service_name}] {output.strip()}")
-                
-                # 检查stderr
-                if process.stderr and process.stderr.readable():
-                    while True:
-                        error = process.stderr.readline()
-                        if not error:
-                            break
-                        print(f"[{service_name} ERROR] {error.strip()}")
-
-                # 检查进程状态
-                if process.poll() is not None:
-                    print(f"⚠️ {service_name} 已停止运行，正在尝试重启...")
-                    self.start_service(service_id, SERVICES[service_id])
-
-            time.sleep(0.1)
-
-    def stop_all_services(self):
+
+    async def stop_all_services(self):
         """停止所有服务"""
         print("\n🛑 正在停止所有服务...")
         self.is_running = False
-        for service_id, process in self.processes.items():
-            service_name = SERVICES[service_id]['name']
-            try:
-                process.terminate()
-                process.wait(timeout=5)
-                print(f"✅ {service_name} 已停止")
-            except subprocess.TimeoutExpired:
-                process.kill()
-                print(f"⚠️ {service_name} 被强制终止")
-            except Exception as e:
-                print(f"❌ {service_name} 停止失败: {str(e)}")
-
-def signal_handler(signum, frame):
-    """信号处理函数"""
-    print("\n收到终止信号，正在关闭服务...")
-    manager.stop_all_services()
-    sys.exit(0)
+        for service_id in reversed(list(SERVICES)):
+            for replica in list(self.replicas[service_id]):
+                try:
+                    await self.stop_replica(replica)
+                except Exception as e:
+                    print(f"❌ {replica.name} 停止失败: {str(e)}")
+
+
+class Autoscaler:
+    """按队列积压和单任务处理耗时调整工作进程数
+
+    所需实例数 = ceil((积压消息数 + 处理中任务数) * 平均处理耗时 / 期望排空时间)，限制在[min, max]内；
+    积压消息数不含已投递未确认的消息，处理中任务数从各实例 /metrics 的 tasks_in_flight 读取；
+    扩容立即生效，缩容每次只停止一个空闲实例，两者分别有冷却时间。
+    队列为空时逐步缩到最小实例数，释放模型占用的内存和显存。
+    """
+
+    def __init__(self, manager: ServiceManager, target_drain_seconds: float = AUTOSCALE_TARGET_DRAIN_SECONDS):
+        from common.rabbitmq_client import RabbitMQClient
+        from common.queue_stats import queue_stats
+
+        self.manager = manager
+        self.target_drain_seconds = target_drain_seconds
+        self.mq_client = RabbitMQClient()
+        self.queue_stats = queue_stats
+        self.last_scaled: Dict[str, float] = {}
+
+    def observe(self, queue: str):
+        """读取队列积压数和平均处理耗时"""
+        try:
+            depth = self.mq_client.queue_depth(queue)
+        except Exception as e:
+            print(f"⚠️ 读取队列 {queue} 积压数失败: {str(e)}")
+            self.mq_client.reconnect()
+            return None, None
+        return depth, self.queue_stats.service_time(queue)
+
+    async def in_flight(self, service_id: str) -> int:
+        """各就绪实例正在处理的任务数之和，读取失败的实例按1计"""
+        replicas = [replica for replica in self.manager.replicas[service_id] if replica.ready.is_set()]
+        counts = await asyncio.gather(*(asyncio.to_thread(tasks_in_flight, replica.url("/metrics"))
+                                        for replica in replicas))
+        return sum(1 if count is None else int(count) for count in counts)
+
+    def desired_replicas(self, depth: int, service_time: float, policy: dict) -> int:
+        needed = math.ceil(depth * service_time / self.target_drain_seconds) if depth else 0
+        return max(policy['min'], min(policy['max'], needed))
+
+    async def step(self, service_id: str):
+        policy = SERVICES[service_id]['autoscale']
+        depth, service_time = await asyncio.to_thread(self.observe, policy['queue'])
+        if depth is None:
+            return
+        service_time = service_time or policy['default_service_time']
+        in_flight = await self.in_flight(service_id)
+        current = len(self.manager.replicas[service_id])
+        desired = self.desired_replicas(depth + in_flight, service_time, policy)
+        since = time.time() - self.last_scaled.get(service_id, 0)
+
+        if desired > current and since >= AUTOSCALE_UP_COOLDOWN:
+            count = await self.manager.scale(service_id, desired)
+        elif desired < current and since >= AUTOSCALE_DOWN_COOLDOWN:
+            count = await self.manager.scale(service_id, current - 1, idle_only=True)
+        else:
+            return
+        if count != current:
+            self.last_scaled[service_id] = time.time()
+            print(f"📈 {SERVICES[service_id]['name']}: {current} -> {count} 个实例 "
+                  f"(积压 {depth}, 处理中 {in_flight}, 平均处理耗时 {service_time:.1f}s)")
+
+    async def run(self):
+        while self.manager.is_running:
+            for service_id, config in SERVICES.items():
+                if 'autoscale' in config:
+                    try:
+                        await self.step(service_id)
+                    except Exception as e:
+                        print(f"❌ {config['name']} 自动扩缩容失败: {str(e)}")
+            await asyncio.sleep(AUTOSCALE_INTERVAL)
+
+
+async def main():
+    manager = ServiceManager()
+    stop_event = asyncio.Event()
 
-if __name__ == "__main__":
     # 注册信号处理器
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
 
     try:
-        manager = ServiceManager()
-        manager.start_all_services()
+        await manager.start_all_services()
+        if AUTOSCALE_ENABLED:
+            asyncio.create_task(Autoscaler(manager).run())
         print("\n🔍 正在监控服务输出...按 Ctrl+C 停止所有服务\n")
-        manager.monitor_output()
-    except KeyboardInterrupt:
-        manager.stop_all_services()
+        await stop_event.wait()
+        print("\n收到终止信号，正在关闭服务...")
     except Exception as e:
         print(f"❌ 发生错误: {str(e)}")
-        manager.stop_all_services()
-        sys.exit(1)
\ No newline at end of file
+        await manager.stop_all_services()
+        sys.exit(1)
+    await manager.stop_all_services()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,22 @@
+import os
+import tempfile
+
+# 在导入服务模块之前设置，模块级的缓存、临时目录和日志实例不写入仓库目录
+_workspace = tempfile.mkdtemp(prefix="ai_service_tests_")
+for _name, _sub in (("SCRATCH_DIR", "scratch"), ("TRACE_DIR", "traces"), ("LOG_DIR", "logs"),
+                    ("TTS_SEGMENT_CACHE_DIR", "cache/tts_segments"), ("REFERENCE_CACHE_DIR", "cache/references"),
+                    ("AUDIO_FEATURE_CACHE_DIR", "cache/audio_features")):
+    os.environ.setdefault(_name, os.path.join(_workspace, _sub))
+
+import pytest
+
+from benchmarks.standins import FakeRedis
+from common.redis_client import RedisClient
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """以进程内的FakeRedis替换Redis客户端单例"""
+    redis = FakeRedis()
+    monkeypatch.setattr(RedisClient, "_instance", redis)
+    return redis
@@ -0,0 +1,71 @@
+import pytest
+from fastapi import HTTPException
+
+from api_service.controllers import generate_controller
+from api_service.services.admission import AdmissionController, AdmissionRejected
+
+# 音频：4个积压、1个消费者、每个10秒；视频：2个积压、2个消费者、每个30秒
+SNAPSHOT = {
+    "audio_tasks": {"depth": 4, "consumers": 1, "service_time": 10.0},
+    "video_tasks": {"depth": 2, "consumers": 2, "service_time": 30.0},
+}
+
+
+def _controller(monkeypatch, **kwargs):
+    controller = AdmissionController(**{"enabled": True, "max_backlog": 0, "max_eta_seconds": 0, **kwargs})
+    monkeypatch.setattr(controller, "_refresh", lambda: SNAPSHOT)
+    assert controller.refresh()
+    return controller
+
+
+def test_estimate_drains_backlog_at_the_slowest_stage(monkeypatch):
+    estimate = _controller(monkeypatch).estimate()
+
+    # 视频阶段最慢：前序6个任务每个15秒，再加上新任务自身的10 + 30秒
+    assert estimate["backlog"] == 6
+    assert estimate["bottleneck_seconds_per_task"] == 15.0
+    assert estimate["eta_seconds"] == 130.0
+
+
+def test_admitted_tasks_count_until_next_refresh(monkeypatch):
+    controller = _controller(monkeypatch)
+    controller.admit(items=3)
+    assert controller.estimate()["backlog"] == 9
+
+    controller.refresh()
+    assert controller.estimate()["backlog"] == 6
+
+
+def test_backlog_limit_rejects_with_retry_after(monkeypatch):
+    controller = _controller(monkeypatch, max_backlog=6)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit(items=2)
+    # 超出2个任务，按瓶颈阶段每个15秒排空
+    assert rejected.value.retry_after == 30
+
+
+def test_eta_limit_rejects_with_retry_after(monkeypatch):
+    controller = _controller(monkeypatch, max_eta_seconds=100)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit()
+    assert rejected.value.retry_after == 30
+
+
+def test_admits_without_snapshot_or_when_disabled(monkeypatch):
+    controller = AdmissionController(enabled=True, max_backlog=1, max_eta_seconds=1)
+    assert controller.admit()["eta_seconds"] is None
+
+    disabled = _controller(monkeypatch, enabled=False, max_backlog=1)
+    assert disabled.admit()["eta_seconds"] == 130.0
+
+
+def test_rejection_becomes_429_with_retry_after_header(monkeypatch):
+    monkeypatch.setattr(generate_controller, "admission_controller", _controller(monkeypatch, max_backlog=6))
+
+    with pytest.raises(HTTPException) as error:
+        generate_controller.admit_or_reject(items=2)
+    assert error.value.status_code == 429
+    assert error.value.headers == {"Retry-After": "30"}
+    assert error.value.detail["retry_after"] == 30 and error.value.detail["backlog"] == 6
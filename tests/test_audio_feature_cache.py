@@ -0,0 +1,49 @@
+import os
+import time
+
+import pytest
+
+from video_service.task_handler.audio_feature_cache import AudioFeatureCache
+
+
+def _entry(cache, name, size, age):
+    path = cache.cache_dir / f"{name}.pt"
+    path.write_bytes(b"\0" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+
+
+def test_make_key_depends_on_audio_content_and_encoder_config(fake_redis, tmp_path):
+    cache = AudioFeatureCache(cache_dir=str(tmp_path / "cache"))
+    audio = tmp_path / "a.wav"
+    copy = tmp_path / "b.wav"
+    audio.write_bytes(b"audio")
+    copy.write_bytes(b"audio")
+
+    key = cache.make_key(str(audio), {"model": "tiny", "fps": 25})
+    assert cache.make_key(str(copy), {"fps": 25, "model": "tiny"}) == key
+    assert cache.make_key(str(audio), {"model": "tiny", "fps": 30}) != key
+
+
+def test_evict_removes_least_recently_used_entries(tmp_path):
+    cache = AudioFeatureCache(cache_dir=str(tmp_path / "cache"), max_bytes=250)
+    _entry(cache, "old", 100, age=30)
+    _entry(cache, "middle", 100, age=20)
+    _entry(cache, "new", 100, age=10)
+    (cache.cache_dir / "new.123.456.tmp").write_bytes(b"\0" * 100)
+
+    cache._evict()
+
+    assert sorted(p.stem for p in cache.cache_dir.glob("*.pt")) == ["middle", "new"]
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["size_bytes"] == 200
+
+
+def test_get_and_put_round_trip(tmp_path):
+    torch = pytest.importorskip("torch")
+    cache = AudioFeatureCache(cache_dir=str(tmp_path / "cache"))
+
+    assert cache.get("key") is None
+    cache.put("key", torch.ones(2, 3))
+    assert torch.equal(cache.get("key"), torch.ones(2, 3))
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
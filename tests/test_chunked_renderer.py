@@ -0,0 +1,34 @@
+from video_service.task_handler.chunked_renderer import plan_chunks, BATCH_FRAMES
+
+
+def test_plan_chunks_boundaries_are_batch_aligned_and_cover_audio():
+    # 10秒共250帧，分块50帧向下取整为48帧，重叠12帧
+    chunks = plan_chunks(duration=10, chunk_seconds=2, overlap_seconds=0.48, fps=25)
+
+    assert [c["index"] for c in chunks] == list(range(len(chunks)))
+    assert all(c["overlap_frames"] == 12 for c in chunks)
+    for previous, current in zip(chunks, chunks[1:]):
+        assert previous["num_frames"] == 48
+        assert current["start_frame"] == previous["start_frame"] + 48 - 12
+    assert chunks[-1]["start_frame"] + chunks[-1]["num_frames"] == 250
+
+
+def test_plan_chunks_clamps_overlap_to_half_a_chunk():
+    chunks = plan_chunks(duration=10, chunk_seconds=2, overlap_seconds=5, fps=25)
+
+    assert chunks[0]["overlap_frames"] == 24
+    assert chunks[1]["start_frame"] == 24
+
+
+def test_plan_chunks_merges_short_last_chunk():
+    # 60帧：第二块只剩12帧，不足半块，并入第一块
+    assert plan_chunks(duration=2.4, chunk_seconds=2, overlap_seconds=0, fps=25) == [
+        {"index": 0, "start_frame": 0, "num_frames": 60, "overlap_frames": 0},
+    ]
+
+
+def test_plan_chunks_short_audio_and_minimum_chunk_size():
+    assert plan_chunks(duration=1, chunk_seconds=30, overlap_seconds=1, fps=25) == [
+        {"index": 0, "start_frame": 0, "num_frames": 25, "overlap_frames": 25},
+    ]
+    assert plan_chunks(duration=10, chunk_seconds=0.1, overlap_seconds=0, fps=25)[0]["num_frames"] == BATCH_FRAMES
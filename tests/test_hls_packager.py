@@ -0,0 +1,23 @@
+import pytest
+
+from video_service.task_handler.hls_packager import bitrate_to_bps, parse_renditions
+
+
+def test_parse_renditions_sorts_by_height_and_skips_empty_items():
+    assert parse_renditions(" 480:1200k, 1080:5M,,720:2500k ") == [
+        (1080, "5M"),
+        (720, "2500k"),
+        (480, "1200k"),
+    ]
+    assert parse_renditions("") == []
+
+
+def test_parse_renditions_rejects_malformed_items():
+    with pytest.raises(ValueError):
+        parse_renditions("720")
+
+
+def test_bitrate_to_bps_units():
+    assert bitrate_to_bps("2500k") == 2_500_000
+    assert bitrate_to_bps("1.5M") == 1_500_000
+    assert bitrate_to_bps("800000") == 800_000
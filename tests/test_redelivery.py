@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from audio_service.task_handler.audio_task_handler import AudioTaskHandler
+from video_service.task_handler.video_task_handler import VideoTaskHandler
+
+
+def _handler(cls, redis):
+    # 只检查任务状态，不加载模型也不创建输出目录
+    handler = cls.__new__(cls)
+    handler.redis_client = redis
+    return handler
+
+
+def _store(redis, task_id, **fields):
+    redis.set(f"task:{task_id}", json.dumps({"task_id": task_id, **fields}))
+
+
+@pytest.mark.parametrize("status, skipped", [
+    ("0", False), ("1", False), ("2", True), ("4", True), ("failed", True), ("cancelled", True),
+])
+def test_audio_skips_tasks_past_the_audio_stage(fake_redis, status, skipped):
+    _store(fake_redis, "t1", status=status)
+    assert _handler(AudioTaskHandler, fake_redis)._already_processed("t1") is skipped
+
+
+def test_audio_processes_unknown_or_corrupt_records(fake_redis):
+    handler = _handler(AudioTaskHandler, fake_redis)
+    assert not handler._already_processed("missing")
+    fake_redis.set("task:bad", "not json")
+    assert not handler._already_processed("bad")
+
+
+def test_audio_redelivery_leaves_finished_task_untouched(fake_redis):
+    _store(fake_redis, "t1", status="2", audio_output_path="uploads/out_audio/t1.wav")
+    _handler(AudioTaskHandler, fake_redis).process_audio_task({"task_id": "t1", "status": "0", "text": "Hallo"})
+    assert json.loads(fake_redis.get("task:t1"))["status"] == "2"
+
+
+def test_video_skips_final_statuses_for_every_tier(fake_redis):
+    handler = _handler(VideoTaskHandler, fake_redis)
+    for status in ("4", "failed", "cancelled"):
+        _store(fake_redis, "t1", status=status)
+        assert handler._already_processed("t1", "full")
+        assert handler._already_processed("t1", "preview")
+
+
+def test_video_skips_preview_once_rendered_or_superseded(fake_redis):
+    handler = _handler(VideoTaskHandler, fake_redis)
+
+    _store(fake_redis, "t1", status="2")
+    assert not handler._already_processed("t1", "preview")
+    assert not handler._already_processed("t1", "full")
+
+    _store(fake_redis, "t1", status="2", preview_output_path="uploads/out_video/preview_t1.mp4")
+    assert handler._already_processed("t1", "preview")
+    assert not handler._already_processed("t1", "full")
+
+    _store(fake_redis, "t1", status="2", render_tier="full")
+    assert handler._already_processed("t1", "preview")
@@ -0,0 +1,26 @@
+import pytest
+
+from common.tunables import tunables
+from video_service.task_handler.video_task_handler import render_tier_params
+
+
+@pytest.fixture(autouse=True)
+def reset_tunables():
+    tunables.reset()
+    yield
+    tunables.reset()
+
+
+def test_full_tier_uses_generation_params_at_full_resolution():
+    tunables.update({"inference_steps": 12, "guidance_scale": 1.5})
+    assert render_tier_params("full") == {"inference_steps": 12, "guidance_scale": 1.5, "max_height": None}
+
+
+def test_preview_tier_uses_preview_steps_and_height():
+    tunables.update({"preview_inference_steps": 3, "preview_max_height": 240, "guidance_scale": 2.0})
+    assert render_tier_params("preview") == {"inference_steps": 3, "guidance_scale": 2.0, "max_height": 240}
+
+
+def test_unknown_tier_is_rejected():
+    with pytest.raises(ValueError):
+        render_tier_params("draft")
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from common.result_cache import ResultCache
+from common.tunables import tunables
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    voice = tmp_path / "voice.wav"
+    video = tmp_path / "avatar.mp4"
+    voice.write_bytes(b"voice")
+    video.write_bytes(b"video")
+    return str(voice), str(video)
+
+
+def test_make_key_depends_on_content_not_paths(fake_redis, tmp_path, inputs):
+    voice, video = inputs
+    cache = ResultCache(enabled=True)
+    copy = tmp_path / "copy.wav"
+    copy.write_bytes(b"voice")
+
+    key = cache.make_key("Hallo wereld", voice, video)
+    assert cache.make_key("  Hallo wereld\n", str(copy), video) == key
+    assert cache.make_key("Hallo wereld!", voice, video) != key
+
+    (tmp_path / "avatar.mp4").write_bytes(b"other video")
+    assert cache.make_key("Hallo wereld", voice, video) != key
+
+
+def test_make_key_changes_with_generation_params(fake_redis, inputs):
+    cache = ResultCache(enabled=True)
+    tunables.reset()
+    try:
+        key = cache.make_key("Hallo", *inputs)
+        tunables.update({"inference_steps": tunables.get("inference_steps") + 1})
+        assert cache.make_key("Hallo", *inputs) != key
+    finally:
+        tunables.reset()
+
+
+def test_lookup_resolves_worker_relative_paths(fake_redis, tmp_path):
+    cache = ResultCache(enabled=True, output_root=str(tmp_path))
+    (tmp_path / "uploads" / "out_audio").mkdir(parents=True)
+    (tmp_path / "uploads" / "out_video").mkdir(parents=True)
+    (tmp_path / "uploads" / "out_audio" / "a.wav").write_bytes(b"a")
+    (tmp_path / "uploads" / "out_video" / "v.mp4").write_bytes(b"v")
+    cache.store("key", {
+        "task_id": "t1",
+        "audio_output_path": "uploads/out_audio/a.wav",
+        "video_output_path": "uploads/out_video/v.mp4",
+    })
+
+    assert cache.lookup("key")["task_id"] == "t1"
+
+    (tmp_path / "uploads" / "out_video" / "v.mp4").unlink()
+    assert cache.lookup("key") is None
+    assert fake_redis.get("result_cache:key") is None
+
+
+def test_disabled_cache_never_hits(fake_redis):
+    cache = ResultCache(enabled=False)
+    fake_redis.set("result_cache:key", json.dumps({"audio_output_path": "/", "video_output_path": "/"}))
+    assert cache.lookup("key") is None
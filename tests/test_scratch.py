@@ -0,0 +1,67 @@
+import os
+import time
+
+import pytest
+
+from common.cancellation import TaskCancelled
+from common.scratch import HOSTNAME, OWNER_FILE, ScratchRoot, ScratchSpace
+
+
+def _leftover(root, name, size, age, owner=None):
+    path = root / name
+    path.mkdir()
+    (path / "data").write_bytes(b"\0" * size)
+    if owner:
+        (path / OWNER_FILE).write_text(owner)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_reclaim_removes_oldest_idle_directories_until_within_budget(tmp_path):
+    root = ScratchRoot(str(tmp_path), max_bytes=300)
+    _leftover(tmp_path, "oldest", 100, age=30)
+    _leftover(tmp_path, "older", 100, age=20)
+    _leftover(tmp_path, "recent", 100, age=10)
+
+    assert root.reclaim(reserve=100) == 200
+    assert sorted(p.name for p in root.entries()) == ["older", "recent"]
+
+
+def test_reclaim_skips_directories_owned_by_live_processes(tmp_path):
+    root = ScratchRoot(str(tmp_path), max_bytes=100)
+    _leftover(tmp_path, "running", 100, age=30, owner=f"{HOSTNAME}:{os.getpid()}")
+    _leftover(tmp_path, "other_host", 100, age=20, owner="elsewhere:1")
+    _leftover(tmp_path, "finished", 100, age=10)
+
+    # 剩余目录都在使用中，占用仍超过预算
+    assert root.reclaim() > root.max_bytes
+    assert sorted(p.name for p in root.entries()) == ["other_host", "running"]
+
+
+def test_task_dir_cleanup_on_success_error_and_cancel(tmp_path):
+    scratch = ScratchSpace(root=str(tmp_path), max_bytes=1024)
+
+    with scratch.task_dir("t1", "audio") as path:
+        assert (path / OWNER_FILE).exists()
+    assert not path.exists()
+
+    with pytest.raises(RuntimeError):
+        with scratch.task_dir("t2", "chunks", keep_on_error=True) as path:
+            raise RuntimeError("render failed")
+    assert path.exists() and not (path / OWNER_FILE).exists()
+
+    with pytest.raises(TaskCancelled):
+        with scratch.task_dir("t3", "chunks", keep_on_error=True) as path:
+            raise TaskCancelled("t3")
+    assert not path.exists()
+
+
+def test_ram_root_falls_back_to_disk_when_over_budget(tmp_path):
+    scratch = ScratchSpace(root=str(tmp_path / "disk"), max_bytes=1024,
+                           ram_root=str(tmp_path / "ram"), ram_max_bytes=100)
+
+    with scratch.task_dir("t1", "segments", ram=True, reserve=50) as path:
+        assert path.parent == tmp_path / "ram"
+    with scratch.task_dir("t2", "segments", ram=True, reserve=500) as path:
+        assert path.parent == tmp_path / "disk"
@@ -0,0 +1,52 @@
+import os
+import time
+
+from audio_service.audio_processor.segment_cache import SegmentCache
+
+
+def _store(cache, tmp_path, key, size, age=0.0):
+    source = tmp_path / f"{key}.src"
+    source.write_bytes(b"\0" * size)
+    cache.store(key, str(source))
+    if age:
+        mtime = time.time() - age
+        os.utime(cache.cache_dir / f"{key}.wav", (mtime, mtime))
+
+
+def test_make_key_normalizes_whitespace_and_unicode(tmp_path):
+    cache = SegmentCache(cache_dir=str(tmp_path / "cache"))
+    key = cache.make_key("Goedemorgen  allemaal", "voice", "nl")
+    assert cache.make_key(" Goedemorgen\tallemaal ", "voice", "nl") == key
+    assert cache.make_key("Goedemorgen allemaal", "other", "nl") != key
+
+
+def test_fetch_copies_entry_and_counts_misses(tmp_path):
+    cache = SegmentCache(cache_dir=str(tmp_path / "cache"))
+    _store(cache, tmp_path, "a", 10)
+
+    output = tmp_path / "out.wav"
+    assert cache.fetch("a", str(output))
+    assert output.read_bytes() == b"\0" * 10
+    assert not cache.fetch("missing", str(tmp_path / "none.wav"))
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_evicts_least_recently_used_entries_over_capacity(tmp_path):
+    cache = SegmentCache(cache_dir=str(tmp_path / "cache"), max_bytes=250)
+    _store(cache, tmp_path, "old", 100, age=30)
+    _store(cache, tmp_path, "used", 100, age=20)
+    assert cache.fetch("used", str(tmp_path / "out.wav"))  # 命中刷新最近使用时间
+    _store(cache, tmp_path, "new", 100)
+
+    assert sorted(p.stem for p in cache.cache_dir.glob("*.wav")) == ["new", "used"]
+    assert cache.stats()["size_bytes"] == 200
+    assert not list(cache.cache_dir.glob("*.tmp"))
+
+
+def test_expired_entries_are_misses_and_evicted(tmp_path):
+    cache = SegmentCache(cache_dir=str(tmp_path / "cache"), max_age_days=1)
+    _store(cache, tmp_path, "stale", 10, age=2 * 24 * 3600)
+
+    assert not cache.fetch("stale", str(tmp_path / "out.wav"))
+    _store(cache, tmp_path, "fresh", 10)
+    assert [p.stem for p in cache.cache_dir.glob("*.wav")] == ["fresh"]
@@ -0,0 +1,28 @@
+from audio_service.audio_processor.text_processor import TextProcessor
+
+
+def test_split_sentences_keeps_decimals_times_and_abbreviations():
+    text = "Het kost 3.14 euro. Dr. Jansen komt om 10.30 uur!"
+    assert TextProcessor.split_sentences(text) == [
+        "Het kost 3.14 euro.",
+        "Dr. Jansen komt om 10.30 uur!",
+    ]
+
+
+def test_split_sentences_initials_and_ellipsis():
+    text = "Hallo... Wat? J. de Vries zegt bijv. ja. Klaar"
+    assert TextProcessor.split_sentences(text) == [
+        "Hallo...",
+        "Wat?",
+        "J. de Vries zegt bijv. ja.",
+        "Klaar",
+    ]
+
+
+def test_split_sentences_chinese_punctuation_without_spaces():
+    assert TextProcessor.split_sentences("你好。今天好吗？很好！") == ["你好。", "今天好吗？", "很好！"]
+
+
+def test_split_sentences_single_sentence_and_empty():
+    assert TextProcessor.split_sentences("Eén zin") == ["Eén zin"]
+    assert TextProcessor.split_sentences("   ") == []
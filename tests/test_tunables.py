@@ -0,0 +1,74 @@
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from common import tunables as tunables_module
+from common.tunables import Tunables
+
+
+@pytest.fixture
+def tunables(tmp_path):
+    return Tunables(file_path=str(tmp_path / "tunables.yaml"), watch_interval=0)
+
+
+@pytest.fixture
+def client(tunables, monkeypatch):
+    monkeypatch.setattr(tunables_module, "ADMIN_TOKEN", "secret")
+    app = FastAPI()
+    app.include_router(tunables.router())
+    return TestClient(app)
+
+
+def test_validate_casts_and_enforces_bounds():
+    assert Tunables.validate({"inference_steps": "12", "guidance_scale": 2}) == {
+        "inference_steps": 12, "guidance_scale": 2.0,
+    }
+    for values in ({"inference_steps": 0}, {"preview_max_height": 10000}, {"hls_workers": "many"},
+                   {"unknown": 1}, ["inference_steps"]):
+        with pytest.raises(ValueError):
+            Tunables.validate(values)
+
+
+def test_runtime_overrides_take_precedence_over_file(tunables, tmp_path):
+    (tmp_path / "tunables.yaml").write_text("inference_steps: 8\n")
+    assert tunables.reload_file()
+    assert tunables.get("inference_steps") == 8
+
+    tunables.update({"inference_steps": 4})
+    assert tunables.get("inference_steps") == 4
+    tunables.reset()
+    assert tunables.get("inference_steps") == 8
+
+
+def test_invalid_file_keeps_previous_values(tunables, tmp_path):
+    path = tmp_path / "tunables.yaml"
+    path.write_text("inference_steps: 8\n")
+    tunables.reload_file()
+
+    path.write_text("inference_steps: 1000\n")
+    os.utime(path, (path.stat().st_mtime + 10,) * 2)  # 同一时间粒度内重写时修改时间可能不变
+    assert not tunables.reload_file()
+    assert tunables.get("inference_steps") == 8
+
+
+def test_admin_api_requires_bearer_token(client):
+    assert client.get("/admin/tunables").status_code == 401
+    assert client.get("/admin/tunables", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/admin/tunables", headers={"Authorization": "secret"}).status_code == 401
+    assert client.get("/admin/tunables", headers={"Authorization": "Bearer secret"}).status_code == 200
+
+
+def test_admin_api_is_disabled_without_token(client, monkeypatch):
+    monkeypatch.setattr(tunables_module, "ADMIN_TOKEN", "")
+    assert client.get("/admin/tunables", headers={"Authorization": "Bearer "}).status_code == 403
+
+
+def test_admin_api_rejects_out_of_range_values(client, tunables):
+    headers = {"Authorization": "Bearer secret"}
+    assert client.put("/admin/tunables", json={"inference_steps": 500}, headers=headers).status_code == 400
+
+    response = client.put("/admin/tunables", json={"inference_steps": 10}, headers=headers)
+    assert response.status_code == 200 and response.json()["values"]["inference_steps"] == 10
+    assert client.delete("/admin/tunables", headers=headers).json()["values"] == tunables.values()
@@ -4,55 +4,94 @@ import os
 # Add the parent directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import FastAPI
-from dotenv import load_dotenv
-import uvicorn
-import json
-import os
-import cv2
-import numpy as np
-from threading import Thread
+from common.startup_profiler import startup_profiler
+
+with startup_profiler.phase("imports", trace_imports=True):
+    from fastapi import FastAPI
+    import uvicorn
+    from threading import Thread
 
-# 导入公共组件
-from common.redis_client import RedisClient
-from common.rabbitmq_client import RabbitMQClient
-from common.logger import setup_logger, get_logger
+    # 导入公共组件
+    from common.redis_client import RedisClient
+    from common.rabbitmq_client import RabbitMQClient
+    from common.logger import setup_logger, get_logger
+    from common.tracing import tracer
+    from common.metrics import metrics_response
+    from common.health import service_health
+    from common.config import settings
+    from common.tunables import tunables
 
-# 加载环境变量
-load_dotenv()
+    # LatentSync、torch等重量级依赖在首次渲染时才导入
+    from video_service.task_handler.video_task_handler import VideoTaskHandler
+    from video_service.task_handler.audio_feature_cache import audio_feature_cache
+    from video_service.task_handler.avatar_cache import avatar_cache
+    from common.scratch import scratch_space
+    from video_service.task_handler.chunked_renderer import CHUNK_QUEUE, VIDEO_CHUNK_MODE
 
 # 初始化日志系统
-setup_logger("video_service")
-logger = get_logger()
+with startup_profiler.phase("logging"):
+    setup_logger("video_service")
+    tracer.set_service("video_service")
+    logger = get_logger()
 
 # 创建FastAPI应用
 app = FastAPI(title="Video Generation Service", version="1.0.0")
+app.include_router(service_health.router())
+app.include_router(tunables.router())
 
 # 初始化RabbitMQ客户端
-mq_client = RabbitMQClient()
-
-from video_service.task_handler.video_task_handler import VideoTaskHandler
+with startup_profiler.phase("rabbitmq"):
+    mq_client = RabbitMQClient()
 
 # 初始化视频任务处理器
-video_task_handler = VideoTaskHandler()
+with startup_profiler.phase("handler_init"):
+    video_task_handler = VideoTaskHandler()
 
 def handle_video_task(ch, method, properties, body):
     """处理从消息队列接收到的视频任务"""
     video_task_handler.handle_message(ch, method, properties, body)
 
+def start_consumers():
+    """开始消费视频任务队列，模型预热完成后调用"""
+    Thread(target=mq_client.consume, args=("video_tasks", handle_video_task)).start()
+
+    # 分布式分块模式下同时承接其他视频服务投递的分块子任务
+    if VIDEO_CHUNK_MODE == "distributed":
+        chunk_mq_client = RabbitMQClient()
+        chunk_mq_client.declare_exchange("ai_service")
+        chunk_mq_client.declare_queue(CHUNK_QUEUE)
+        chunk_mq_client.bind_queue(CHUNK_QUEUE, "ai_service", CHUNK_QUEUE)
+        Thread(target=chunk_mq_client.consume,
+               args=(CHUNK_QUEUE, video_task_handler.chunk_renderer.handle_chunk_message)).start()
+
 @app.on_event("startup")
 async def startup_event():
     """服务启动时的处理"""
     try:
         # 确保视频输出目录存在
         os.makedirs("output", exist_ok=True)
+        tunables.start_watching()
         
-        # 开始消费视频任务队列
-        Thread(target=mq_client.consume, args=("video_tasks", handle_video_task)).start()
-        logger.info("视频生成服务启动成功")
+        # 模型预热完成后才开始消费队列
+        service_health.start_when_warm(warmup=video_task_handler.warm_up, on_ready=start_consumers)
+        logger.info("视频生成服务启动成功，等待模型预热")
     except Exception as e:
         logger.error(f"服务启动失败: {str(e)}")
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """音频特征缓存、形象预处理缓存的命中率和占用空间，以及临时目录占用"""
+    return {
+        "audio_features": audio_feature_cache.stats(),
+        "avatars": avatar_cache.stats(),
+        "scratch": scratch_space.stats(),
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus指标接口"""
+    return metrics_response()
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """服务关闭时的处理"""
@@ -61,7 +100,7 @@ async def shutdown_event():
     logger.info("视频生成服务关闭")
 
 if __name__ == "__main__":
-    port = int(os.getenv("VIDEO_SERVICE_PORT", 8001))
+    port = settings.services.video_port
     uvicorn.run("video_service.main:app", host="0.0.0.0", port=port, reload=True)
     # task = {'task_id': 'fa11e4ed-2ccf-41f6-ba07-105e815bb4d8', 'status': '2', 'text': 'Halo! Selamat datang di sesi pengetahuan finansial bersama kami.', 'video_path': '/home/featurize/clonevoice/uploads/video/347fb1d0-8812-4883-a7dc-82e6df4c1573.mp4', 'audio_path': '/home/featurize/clonevoice/uploads/audio/fdf73042-3459-4958-abf8-44d6b75a0cec.wav', 'audio_output_path': 'output/audio_fa11e4ed-2ccf-41f6-ba07-105e815bb4d8.wav'}
     # video_task_handler.process_video_task(task)
\ No newline at end of file
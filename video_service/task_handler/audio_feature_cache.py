@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from common.logger import get_logger
+from common.result_cache import content_hash
+
+logger = get_logger()
+
+# 音频特征缓存配置
+AUDIO_FEATURE_CACHE_DIR = os.getenv("AUDIO_FEATURE_CACHE_DIR", "cache/audio_features")
+AUDIO_FEATURE_CACHE_MAX_MB = int(os.getenv("AUDIO_FEATURE_CACHE_MAX_MB", 2048))
+
+
+class AudioFeatureCache:
+    """音频编码器(whisper)特征的磁盘缓存
+
+    键由音频内容哈希和编码器配置共同决定，同一段音频在重试、
+    更换视频或调整参数重新渲染时可以直接复用特征，跳过音频编码器。
+    """
+
+    def __init__(self, cache_dir: str = AUDIO_FEATURE_CACHE_DIR, max_bytes: int = AUDIO_FEATURE_CACHE_MAX_MB * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def make_key(self, audio_path: str, encoder_config: Dict[str, Any]) -> str:
+        """根据音频内容和编码器配置生成缓存键"""
+        config_str = json.dumps(encoder_config, sort_keys=True, default=str)
+        return hashlib.sha256(f"{content_hash(audio_path)}:{config_str}".encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pt"
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存的特征，未命中时返回None"""
+        import torch
+
+        entry_path = self._entry_path(key)
+        with self._lock:
+            try:
+                features = torch.load(entry_path, map_location="cpu")
+                # 更新访问时间，供LRU淘汰使用
+                os.utime(entry_path, None)
+                self.hits += 1
+                return features
+            except OSError:
+                # 不存在或被其他实例同时淘汰
+                self.misses += 1
+                return None
+            except Exception as e:
+                logger.warning(f"读取音频特征缓存失败: {key} - {str(e)}")
+                entry_path.unlink(missing_ok=True)
+                self.misses += 1
+                return None
+
+    def put(self, key: str, features: Any) -> None:
+        """写入特征并按容量上限淘汰最久未使用的条目"""
+        import torch
+
+        if hasattr(features, "detach"):
+            features = features.detach().cpu()
+
+        entry_path = self._entry_path(key)
+        # 临时文件名带进程和线程标识，多个实例同时写入同一条目时互不覆盖
+        tmp_path = entry_path.with_name(f"{entry_path.stem}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with self._lock:
+            try:
+                torch.save(features, tmp_path)
+                os.replace(tmp_path, entry_path)
+            except Exception as e:
+                logger.warning(f"写入音频特征缓存失败: {key} - {str(e)}")
+                tmp_path.unlink(missing_ok=True)
+                return
+            self._evict()
+
+    def _stat_entries(self) -> List[Tuple[float, int, Path]]:
+        """(修改时间, 大小, 路径)，已被其他实例删除的条目跳过"""
+        entries = []
+        for path in self.cache_dir.glob("*.pt"):
+            try:
+                stats = path.stat()
+            except OSError:
+                continue
+            entries.append((stats.st_mtime, stats.st_size, path))
+        return entries
+
+    def _evict(self) -> None:
+        """按最近使用时间淘汰至容量上限以内"""
+        entries = sorted(self._stat_entries())
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total_size <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_size -= size
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存命中率和占用空间"""
+        with self._lock:
+            entries = self._stat_entries()
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(entries),
+                "size_bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# 创建全局音频特征缓存实例
+audio_feature_cache = AudioFeatureCache()
@@ -0,0 +1,67 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from common.logger import get_logger
+from common.result_cache import content_hash
+
+logger = get_logger()
+
+# 形象视频预处理缓存配置
+# 每个条目包含整段视频的原始帧和对齐后的人脸，占用内存较大，默认只保留最近一个形象
+AVATAR_CACHE_ENTRIES = int(os.getenv("AVATAR_CACHE_ENTRIES", 1))
+
+
+class AvatarCache:
+    """形象视频预处理结果（人脸检测与仿射对齐）的进程内缓存
+
+    批量任务使用同一形象视频渲染多段文本，预处理结果只与视频内容有关，
+    同一工作进程连续处理时可直接复用，跳过逐帧的人脸检测。
+    """
+
+    def __init__(self, max_entries: int = AVATAR_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def make_key(self, video_path: str) -> str:
+        return content_hash(video_path)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def put(self, key: str, result: Any) -> None:
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存命中率"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# 创建全局形象预处理缓存实例
+avatar_cache = AvatarCache()
@@ -0,0 +1,391 @@
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from common.redis_client import RedisClient
+from common.rabbitmq_client import RabbitMQClient
+from common.logger import get_logger
+from common.tracing import tracer
+from common.scratch import scratch_space
+from common.cancellation import cancellation, TaskCancelled
+from common.progress import progress_reporter
+from common.tunables import tunables
+
+logger = get_logger()
+
+# 分块渲染配置
+VIDEO_CHUNK_ENABLED = os.getenv("VIDEO_CHUNK_ENABLED", "true").lower() == "true"
+VIDEO_CHUNK_MIN_SECONDS = float(os.getenv("VIDEO_CHUNK_MIN_SECONDS", 60))
+VIDEO_CHUNK_SECONDS = float(os.getenv("VIDEO_CHUNK_SECONDS", 30))
+VIDEO_CHUNK_OVERLAP_SECONDS = float(os.getenv("VIDEO_CHUNK_OVERLAP_SECONDS", 0.4))
+VIDEO_CHUNK_MODE = os.getenv("VIDEO_CHUNK_MODE", "local")  # local: 本机多进程, distributed: 分发给其他视频服务
+VIDEO_CHUNK_MAX_RETRIES = int(os.getenv("VIDEO_CHUNK_MAX_RETRIES", 2))
+VIDEO_CHUNK_TIMEOUT = int(os.getenv("VIDEO_CHUNK_TIMEOUT", 3600))
+
+CHUNK_QUEUE = "video_chunk_tasks"
+# LatentSync统一以25fps输出，并按16帧一批推理，不足一批的尾部帧会被丢弃
+OUTPUT_FPS = 25
+BATCH_FRAMES = 16
+
+
+def probe_duration(media_path: str) -> float:
+    """使用ffprobe获取媒体时长（秒）"""
+    command = [
+        'ffprobe',
+        '-v', 'error',
+        '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        media_path
+    ]
+    result = subprocess.run(command, check=True, capture_output=True, text=True)
+    return float(result.stdout.strip())
+
+
+def plan_chunks(duration: float, chunk_seconds: float, overlap_seconds: float, fps: int = OUTPUT_FPS) -> List[Dict]:
+    """按帧切分重叠的时间窗口
+
+    非末尾分块的帧数取BATCH_FRAMES的整数倍，保证渲染结果与计划帧数一致，
+    拼接时的过渡偏移可以精确到帧。
+    """
+    total_frames = int(round(duration * fps))
+    chunk_frames = max(BATCH_FRAMES, int(round(chunk_seconds * fps)) // BATCH_FRAMES * BATCH_FRAMES)
+    overlap_frames = min(int(round(overlap_seconds * fps)), chunk_frames // 2)
+    step = chunk_frames - overlap_frames
+
+    chunks = []
+    start = 0
+    while True:
+        end = min(start + chunk_frames, total_frames)
+        chunks.append({"index": len(chunks), "start_frame": start, "num_frames": end - start})
+        if end >= total_frames:
+            break
+        start += step
+
+    # 末尾分块过短时并入前一块
+    if len(chunks) > 1 and chunks[-1]["num_frames"] < chunk_frames // 2:
+        chunks.pop()
+        chunks[-1]["num_frames"] = total_frames - chunks[-1]["start_frame"]
+
+    for chunk in chunks:
+        chunk["overlap_frames"] = overlap_frames
+    return chunks
+
+
+def denoising_steps(audio_path: str, inference_steps: int) -> int:
+    """估算整段渲染的去噪总步数：每批BATCH_FRAMES帧执行inference_steps步，不足一批的尾部帧被丢弃"""
+    try:
+        with wave.open(audio_path, "rb") as f:
+            duration = f.getnframes() / f.getframerate()
+    except (OSError, wave.Error):
+        return 0
+    return max(1, int(duration * OUTPUT_FPS) // BATCH_FRAMES) * inference_steps
+
+
+def render_chunk(spec: Dict) -> str:
+    """渲染单个分块，供本地进程池和分布式子任务共用"""
+    from video_service.task_handler.latent_sync_generator import LatentSyncGenerator
+
+    # 推理步之间检查所属任务是否已取消
+    with cancellation.watch(spec["task_id"]):
+        LatentSyncGenerator().process_video(
+            video_path=spec["video_path"],
+            audio_path=spec["audio_path"],
+            output_path=spec["output_path"],
+            guidance_scale=spec["guidance_scale"],
+            inference_steps=spec["inference_steps"],
+            seed=spec["seed"],
+        )
+    return spec["output_path"]
+
+
+class ChunkedRenderer:
+    """将长视频切分为重叠的时间窗口并行渲染，再按帧融合拼接
+
+    每个分块完成后在Redis中记录检查点，失败的分块可以单独重试，
+    任务重新投递时已完成的分块会被跳过。分布式模式要求各视频服务共享临时目录（SCRATCH_DIR）。
+    """
+
+    def __init__(self, mode: str = VIDEO_CHUNK_MODE, workers: Optional[int] = None):
+        self.mode = mode
+        self.workers = workers
+        self.redis_client = RedisClient.get_client()
+
+    @staticmethod
+    def should_chunk(audio_path: str) -> bool:
+        """音频时长超过阈值时启用分块渲染"""
+        if not VIDEO_CHUNK_ENABLED:
+            return False
+        try:
+            return probe_duration(audio_path) >= VIDEO_CHUNK_MIN_SECONDS
+        except Exception as e:
+            logger.warning(f"获取音频时长失败，使用整段渲染: {str(e)}")
+            return False
+
+    @staticmethod
+    def _checkpoint_key(render_key: str) -> str:
+        return f"video_chunks:{render_key}"
+
+    @staticmethod
+    def _failure_key(render_key: str) -> str:
+        return f"video_chunk_failures:{render_key}"
+
+    def render(self, task_id: str, video_path: str, audio_path: str, output_path: str,
+               guidance_scale: float, inference_steps: int, seed: int, render_key: Optional[str] = None) -> str:
+        """分块渲染并拼接输出
+
+        分块目录在失败时保留，任务重新投递后可从检查点继续，长期未恢复的目录按LRU回收；
+        任务取消时分块目录和检查点一并删除。
+
+        Args:
+            task_id: 所属任务ID，分块据此检查取消
+            render_key: 区分同一任务多次渲染（如预览和完整渲染）的临时目录和检查点，默认为task_id
+        """
+        render_key = render_key or task_id
+        try:
+            with scratch_space.task_dir(render_key, "chunks", keep_on_error=True) as chunk_dir:
+                return self._render(chunk_dir, task_id, render_key, video_path, audio_path, output_path,
+                                    guidance_scale, inference_steps, seed)
+        except TaskCancelled:
+            self.redis_client.delete(self._checkpoint_key(render_key), self._failure_key(render_key))
+            raise
+
+    def _render(self, chunk_dir: Path, task_id: str, render_key: str, video_path: str, audio_path: str,
+                output_path: str, guidance_scale: float, inference_steps: int, seed: int) -> str:
+        duration = probe_duration(audio_path)
+        chunks = plan_chunks(duration, VIDEO_CHUNK_SECONDS, VIDEO_CHUNK_OVERLAP_SECONDS)
+        logger.info(f"分块渲染: {task_id}, 时长 {duration:.1f}s, 共 {len(chunks)} 块, 模式 {self.mode}")
+
+        driving_video = chunk_dir / "driving.mp4"
+        if not driving_video.exists():
+            self._prepare_driving_video(video_path, duration, driving_video)
+
+        specs = []
+        for chunk in chunks:
+            index = chunk["index"]
+            spec = {
+                "task_id": task_id,
+                "render_key": render_key,
+                "index": index,
+                "video_path": str(chunk_dir / f"chunk_{index}_src.mp4"),
+                "audio_path": str(chunk_dir / f"chunk_{index}_src.wav"),
+                "output_path": str(chunk_dir / f"chunk_{index}_out.mp4"),
+                "guidance_scale": guidance_scale,
+                "inference_steps": inference_steps,
+                "seed": seed,
+            }
+            if not self._is_done(spec):
+                self._cut_chunk(driving_video, audio_path, chunk, spec)
+            specs.append(spec)
+
+        pending = [spec for spec in specs if not self._is_done(spec)]
+        if len(pending) < len(specs):
+            logger.info(f"从检查点恢复: {task_id}, 已完成 {len(specs) - len(pending)}/{len(specs)} 块")
+        # 分块在其他进程中渲染，按完成的分块数上报进度
+        progress_reporter.set_total(len(specs))
+        progress_reporter.advance(len(specs) - len(pending))
+
+        if self.mode == "distributed":
+            self._dispatch_distributed(task_id, render_key, pending)
+        else:
+            self._dispatch_local(task_id, pending)
+
+        self._stitch(chunks, [spec["output_path"] for spec in specs], audio_path, output_path, chunk_dir)
+
+        # 拼接成功后清理检查点，分块目录随临时目录删除
+        self.redis_client.delete(self._checkpoint_key(render_key), self._failure_key(render_key))
+        return output_path
+
+    @staticmethod
+    def _render_key(spec: Dict) -> str:
+        return spec.get("render_key") or spec["task_id"]
+
+    def _is_done(self, spec: Dict) -> bool:
+        recorded = self.redis_client.hget(self._checkpoint_key(self._render_key(spec)), str(spec["index"]))
+        return recorded == spec["output_path"] and os.path.exists(spec["output_path"])
+
+    def _mark_done(self, spec: Dict) -> None:
+        key = self._checkpoint_key(self._render_key(spec))
+        self.redis_client.hset(key, str(spec["index"]), spec["output_path"])
+        self.redis_client.expire(key, 24 * 3600)
+
+    def _prepare_driving_video(self, video_path: str, duration: float, output_path: Path) -> None:
+        """将形象视频统一为25fps并循环补足到音频时长"""
+        command = [
+            'ffmpeg',
+            '-stream_loop', '-1',
+            '-i', video_path,
+            '-t', f"{duration:.6f}",
+            '-r', str(OUTPUT_FPS),
+            '-an',
+            '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '18',
+            '-y',
+            str(output_path)
+        ]
+        subprocess.run(command, check=True, capture_output=True)
+
+    def _cut_chunk(self, driving_video: Path, audio_path: str, chunk: Dict, spec: Dict) -> None:
+        """按帧精确切出分块的视频和音频"""
+        start = chunk["start_frame"] / OUTPUT_FPS
+        length = chunk["num_frames"] / OUTPUT_FPS
+        # 输入端seek并重新编码，ffmpeg可以保证帧精确
+        subprocess.run([
+            'ffmpeg',
+            '-ss', f"{start:.6f}",
+            '-i', str(driving_video),
+            '-frames:v', str(chunk["num_frames"]),
+            '-an',
+            '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '18',
+            '-y',
+            spec["video_path"]
+        ], check=True, capture_output=True)
+        subprocess.run([
+            'ffmpeg',
+            '-ss', f"{start:.6f}",
+            '-t', f"{length:.6f}",
+            '-i', audio_path,
+            '-acodec', 'pcm_s16le',
+            '-y',
+            spec["audio_path"]
+        ], check=True, capture_output=True)
+
+    def _dispatch_local(self, task_id: str, pending: List[Dict]) -> None:
+        """使用本地进程池渲染，失败的分块单独重试"""
+        context = multiprocessing.get_context("spawn")
+        attempt = 0
+        # 进程池按任务创建，未指定workers时使用运行时可调整的video_chunk_workers
+        workers = self.workers or tunables.get("video_chunk_workers")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            while pending:
+                futures = {pool.submit(render_chunk, spec): spec for spec in pending}
+                failed = []
+                for future in as_completed(futures):
+                    spec = futures[future]
+                    try:
+                        future.result()
+                        self._mark_done(spec)
+                        progress_reporter.advance()
+                        logger.info(f"分块渲染完成: {task_id} #{spec['index']}")
+                        # 分块之间检查取消，尚未开始的分块不再渲染
+                        cancellation.check(task_id)
+                    except TaskCancelled:
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        raise
+                    except Exception as e:
+                        logger.error(f"分块渲染失败: {task_id} #{spec['index']} - {str(e)}")
+                        failed.append(spec)
+                attempt += 1
+                if failed and attempt > VIDEO_CHUNK_MAX_RETRIES:
+                    raise Exception(f"分块渲染重试次数耗尽: {[spec['index'] for spec in failed]}")
+                pending = failed
+
+    def _dispatch_distributed(self, task_id: str, render_key: str, pending: List[Dict]) -> None:
+        """将分块作为子任务投递给其他视频服务，并轮询检查点等待完成"""
+        mq_client = RabbitMQClient()
+        mq_client.declare_exchange("ai_service")
+        mq_client.declare_queue(CHUNK_QUEUE)
+        mq_client.bind_queue(CHUNK_QUEUE, "ai_service", CHUNK_QUEUE)
+
+        attempts = {spec["index"]: 0 for spec in pending}
+        waiting = {spec["index"]: spec for spec in pending}
+        for spec in pending:
+            mq_client.publish("ai_service", CHUNK_QUEUE, json.dumps(spec))
+
+        failure_key = self._failure_key(render_key)
+        deadline = time.time() + VIDEO_CHUNK_TIMEOUT
+        try:
+            while waiting:
+                # 其他服务上的分块在推理步之间自行检查取消
+                cancellation.check(task_id)
+                if time.time() > deadline:
+                    raise TimeoutError(f"分块渲染超时: {sorted(waiting)}")
+                for index, spec in list(waiting.items()):
+                    if self._is_done(spec):
+                        del waiting[index]
+                        progress_reporter.advance()
+                        continue
+                    error = self.redis_client.hget(failure_key, str(index))
+                    if error is None:
+                        continue
+                    self.redis_client.hdel(failure_key, str(index))
+                    attempts[index] += 1
+                    if attempts[index] > VIDEO_CHUNK_MAX_RETRIES:
+                        raise Exception(f"分块 #{index} 重试次数耗尽: {error}")
+                    logger.warning(f"分块 #{index} 失败，重新投递: {error}")
+                    mq_client.publish("ai_service", CHUNK_QUEUE, json.dumps(spec))
+                time.sleep(1)
+        finally:
+            mq_client.close()
+
+    def handle_chunk_message(self, ch, method, properties, body):
+        """处理其他视频服务投递的分块子任务"""
+        spec = json.loads(body)
+        task_id = spec["task_id"]
+        try:
+            if cancellation.is_cancelled(task_id):
+                logger.info(f"任务已取消，跳过分块子任务: {task_id} #{spec['index']}")
+                return
+            if not self._is_done(spec):
+                with tracer.span("video.chunk", index=spec["index"]):
+                    render_chunk(spec)
+                self._mark_done(spec)
+            logger.info(f"分块子任务完成: {task_id} #{spec['index']}")
+        except Exception as e:
+            logger.error(f"分块子任务失败: {task_id} #{spec['index']} - {str(e)}")
+            self.redis_client.hset(self._failure_key(self._render_key(spec)), str(spec["index"]), str(e))
+
+    def _stitch(self, chunks: List[Dict], chunk_outputs: List[str], audio_path: str, output_path: str, chunk_dir: Path) -> None:
+        """在重叠区间内逐帧交叉融合拼接分块，再与完整音频复用封装"""
+        overlap_frames = chunks[0]["overlap_frames"]
+        stitched = chunk_dir / "stitched.mp4"
+
+        if len(chunk_outputs) == 1:
+            shutil.copyfile(chunk_outputs[0], stitched)
+        elif overlap_frames == 0:
+            list_file = chunk_dir / "concat.txt"
+            with open(list_file, 'w', encoding='utf-8') as f:
+                for path in chunk_outputs:
+                    f.write(f"file '{Path(path).absolute().as_posix()}'\n")
+            subprocess.run([
+                'ffmpeg', '-f', 'concat', '-safe', '0', '-i', str(list_file),
+                '-an', '-c:v', 'copy', '-y', str(stitched)
+            ], check=True, capture_output=True)
+        else:
+            inputs = []
+            filters = []
+            for i, path in enumerate(chunk_outputs):
+                inputs += ['-i', path]
+                filters.append(f"[{i}:v]fps={OUTPUT_FPS},settb=AVTB,setpts=PTS-STARTPTS[s{i}]")
+            previous = "[s0]"
+            overlap = overlap_frames / OUTPUT_FPS
+            for i in range(1, len(chunk_outputs)):
+                # 第i块在输出时间轴上从start_frame开始，过渡持续重叠帧数
+                offset = chunks[i]["start_frame"] / OUTPUT_FPS
+                label = f"[v{i}]"
+                filters.append(f"{previous}[s{i}]xfade=transition=fade:duration={overlap:.6f}:offset={offset:.6f}{label}")
+                previous = label
+            subprocess.run([
+                'ffmpeg', *inputs,
+                '-filter_complex', ';'.join(filters),
+                '-map', previous,
+                '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '18', '-pix_fmt', 'yuv420p',
+                '-y', str(stitched)
+            ], check=True, capture_output=True)
+
+        # 视频流直接复制，仅音频编码为AAC；moov索引前置，浏览器无需下载完整文件即可播放
+        subprocess.run([
+            'ffmpeg',
+            '-i', str(stitched),
+            '-i', audio_path,
+            '-map', '0:v', '-map', '1:a',
+            '-c:v', 'copy', '-c:a', 'aac',
+            '-shortest',
+            '-movflags', '+faststart',
+            '-y', output_path
+        ], check=True, capture_output=True)
@@ -0,0 +1,143 @@
+import json
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from common.logger import get_logger
+from common.metrics import STAGE_DURATION
+from common.tunables import tunables
+
+logger = get_logger()
+
+# HLS打包配置
+HLS_ENABLED = os.getenv("HLS_ENABLED", "false").lower() == "true"
+# 各档位 高度:视频码率，高于源视频的档位会被跳过
+HLS_RENDITIONS = os.getenv("HLS_RENDITIONS", "720:2500k,480:1200k,360:600k")
+HLS_SEGMENT_SECONDS = int(os.getenv("HLS_SEGMENT_SECONDS", 4))
+HLS_AUDIO_BITRATE = os.getenv("HLS_AUDIO_BITRATE", "128k")
+
+MASTER_PLAYLIST = "master.m3u8"
+
+
+def parse_renditions(spec: str) -> List[Tuple[int, str]]:
+    """解析 '720:2500k,480:1200k' 格式的档位配置，按高度从高到低排列"""
+    renditions = []
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        height, bitrate = item.strip().split(":")
+        renditions.append((int(height), bitrate))
+    return sorted(renditions, reverse=True)
+
+
+def bitrate_to_bps(bitrate: str) -> int:
+    units = {"k": 1000, "m": 1000 ** 2}
+    suffix = bitrate[-1].lower()
+    return int(float(bitrate[:-1]) * units[suffix]) if suffix in units else int(bitrate)
+
+
+def probe_video(video_path: str) -> Dict:
+    """获取视频宽高和帧率"""
+    result = subprocess.run([
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'stream=width,height,r_frame_rate',
+        '-of', 'json',
+        video_path
+    ], check=True, capture_output=True, text=True)
+    stream = json.loads(result.stdout)["streams"][0]
+    numerator, denominator = stream["r_frame_rate"].split("/")
+    return {
+        "width": int(stream["width"]),
+        "height": int(stream["height"]),
+        "fps": float(numerator) / float(denominator),
+    }
+
+
+class HlsPackager:
+    """将生成的视频打包为多码率的fMP4分片HLS
+
+    各档位并行转码，关键帧按分片时长对齐，客户端可在档位间无缝切换；
+    输出目录结构为 {task_id}/master.m3u8 与 {task_id}/{height}p/index.m3u8。
+    """
+
+    def __init__(self, output_dir: Path, renditions: str = HLS_RENDITIONS, workers: Optional[int] = None):
+        self.output_dir = Path(output_dir)
+        self.renditions = parse_renditions(renditions)
+        self.workers = workers
+
+    def package(self, task_id: str, video_path: str) -> str:
+        """打包视频并返回主播放列表路径"""
+        source = probe_video(video_path)
+        renditions = [(h, b) for h, b in self.renditions if h <= source["height"]]
+        if not renditions:
+            # 源视频低于所有档位时按源分辨率输出最低码率的一档
+            renditions = [(source["height"], self.renditions[-1][1])]
+
+        task_dir = self.output_dir / task_id
+        shutil.rmtree(task_dir, ignore_errors=True)
+        task_dir.mkdir(parents=True)
+
+        # 未指定workers时使用运行时可调整的hls_workers
+        workers = self.workers or tunables.get("hls_workers")
+        with STAGE_DURATION.labels(stage="hls_packaging").time(), \
+                ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(self._encode_rendition, video_path, task_dir, height, bitrate, source)
+                for height, bitrate in renditions
+            ]
+            variants = [future.result() for future in futures]
+
+        master_path = task_dir / MASTER_PLAYLIST
+        self._write_master(master_path, variants)
+        logger.info(f"HLS打包完成: {task_id}, 档位 {[v['name'] for v in variants]}")
+        return str(master_path)
+
+    def _encode_rendition(self, video_path: str, task_dir: Path, height: int, bitrate: str, source: Dict) -> Dict:
+        name = f"{height}p"
+        rendition_dir = task_dir / name
+        rendition_dir.mkdir()
+        width = int(round(source["width"] * height / source["height"] / 2)) * 2
+        gop = max(1, round(source["fps"] * HLS_SEGMENT_SECONDS))
+        max_rate = bitrate_to_bps(bitrate) * 3 // 2
+
+        subprocess.run([
+            'ffmpeg',
+            '-i', video_path,
+            '-vf', f"scale={width}:{height}",
+            '-c:v', 'libx264', '-preset', 'veryfast', '-profile:v', 'main',
+            '-b:v', bitrate, '-maxrate', str(max_rate), '-bufsize', str(max_rate * 2),
+            # 固定GOP且关闭场景切换关键帧，使各档位分片边界一致
+            '-g', str(gop), '-keyint_min', str(gop), '-sc_threshold', '0',
+            '-c:a', 'aac', '-b:a', HLS_AUDIO_BITRATE,
+            '-f', 'hls',
+            '-hls_time', str(HLS_SEGMENT_SECONDS),
+            '-hls_playlist_type', 'vod',
+            '-hls_segment_type', 'fmp4',
+            '-hls_fmp4_init_filename', 'init.mp4',
+            '-hls_segment_filename', str(rendition_dir / 'seg_%04d.m4s'),
+            '-y', str(rendition_dir / 'index.m3u8')
+        ], check=True, capture_output=True)
+
+        return {
+            "name": name,
+            "width": width,
+            "height": height,
+            "bandwidth": max_rate + bitrate_to_bps(HLS_AUDIO_BITRATE),
+            "average_bandwidth": bitrate_to_bps(bitrate) + bitrate_to_bps(HLS_AUDIO_BITRATE),
+        }
+
+    @staticmethod
+    def _write_master(master_path: Path, variants: List[Dict]) -> None:
+        lines = ["#EXTM3U", "#EXT-X-VERSION:7", "#EXT-X-INDEPENDENT-SEGMENTS"]
+        for variant in variants:
+            lines.append(
+                f"#EXT-X-STREAM-INF:BANDWIDTH={variant['bandwidth']},"
+                f"AVERAGE-BANDWIDTH={variant['average_bandwidth']},"
+                f"RESOLUTION={variant['width']}x{variant['height']}"
+            )
+            lines.append(f"{variant['name']}/index.m3u8")
+        master_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
@@ -1,10 +1,108 @@
-import gradio as gr
 from pathlib import Path
-from LatentSync.scripts.inference import main
-from omegaconf import OmegaConf
 import argparse
 from datetime import datetime
 
+from common.logger import get_logger
+from common.cancellation import cancellation
+from common.progress import progress_reporter
+from .audio_feature_cache import audio_feature_cache
+from .avatar_cache import avatar_cache
+
+logger = get_logger()
+
+
+def _install_audio_feature_cache():
+    """将LatentSync推理脚本使用的Audio2Feature替换为带缓存的子类
+
+    main()在内部自行构建音频编码器，因此在其模块命名空间中替换类，
+    命中缓存时直接返回特征，跳过whisper编码。
+    """
+    import LatentSync.scripts.inference as inference_script
+
+    encoder_cls = inference_script.Audio2Feature
+    if getattr(encoder_cls, "feature_cache", None) is not None:
+        return
+
+    class CachedAudio2Feature(encoder_cls):
+        feature_cache = audio_feature_cache
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            # 设备不影响特征结果，不计入缓存键
+            self.encoder_config = {
+                "encoder": encoder_cls.__qualname__,
+                "args": [str(arg) for arg in args],
+                "kwargs": {k: str(v) for k, v in kwargs.items() if k != "device"},
+            }
+
+        def audio2feat(self, audio_path):
+            key = self.feature_cache.make_key(audio_path, self.encoder_config)
+            features = self.feature_cache.get(key)
+            if features is not None:
+                logger.info(f"音频特征缓存命中: {audio_path}")
+                return features
+            features = super().audio2feat(audio_path)
+            self.feature_cache.put(key, features)
+            return features
+
+    inference_script.Audio2Feature = CachedAudio2Feature
+
+
+def _install_avatar_cache():
+    """为LatentSync管线的形象视频预处理(affine_transform_video)加上进程内缓存
+
+    只缓存以视频文件路径调用的情况，其他调用方式直接交给原方法处理。
+    """
+    import LatentSync.scripts.inference as inference_script
+
+    pipeline_cls = inference_script.LipsyncPipeline
+    if not avatar_cache.enabled or getattr(pipeline_cls, "avatar_cache", None) is not None:
+        return
+
+    affine_transform_video = pipeline_cls.affine_transform_video
+
+    def cached_affine_transform_video(self, video_path, *args, **kwargs):
+        if args or kwargs or not isinstance(video_path, str):
+            return affine_transform_video(self, video_path, *args, **kwargs)
+        key = avatar_cache.make_key(video_path)
+        result = avatar_cache.get(key)
+        if result is not None:
+            logger.info(f"形象预处理缓存命中: {video_path}")
+            return result
+        result = affine_transform_video(self, video_path)
+        avatar_cache.put(key, result)
+        return result
+
+    pipeline_cls.avatar_cache = avatar_cache
+    pipeline_cls.affine_transform_video = cached_affine_transform_video
+
+
+def _on_denoising_step(step, timestep, latents):
+    # 检查当前任务是否已取消，并上报去噪进度
+    cancellation.check_current()
+    progress_reporter.advance()
+
+
+def _install_step_callback():
+    """在LatentSync管线的去噪循环中逐步回调，用于取消检查和进度上报
+
+    管线由推理脚本内部调用，通过每步回调(callback)介入，取消时抛出TaskCancelled中断推理。
+    """
+    import LatentSync.scripts.inference as inference_script
+
+    pipeline_cls = inference_script.LipsyncPipeline
+    if getattr(pipeline_cls, "step_callback_installed", False):
+        return
+
+    pipeline_call = pipeline_cls.__call__
+
+    def call_with_step_callback(self, *args, **kwargs):
+        kwargs.setdefault("callback", _on_denoising_step)
+        return pipeline_call(self, *args, **kwargs)
+
+    pipeline_cls.step_callback_installed = True
+    pipeline_cls.__call__ = call_with_step_callback
+
 
 class LatentSyncGenerator:
     def __init__(self):
@@ -21,20 +119,23 @@ class LatentSyncGenerator:
         seed: int = 42,
     ):
         """Process video with LatentSync model"""
-        # Create the temp directory if it doesn't exist
-        output_dir = Path("./temp")
-        output_dir.mkdir(parents=True, exist_ok=True)
-
         # Convert paths to absolute Path objects and normalize them
         video_file_path = Path(video_path)
         video_path = video_file_path.absolute().as_posix()
         audio_path = Path(audio_path).absolute().as_posix()
 
         # Set output path if not provided
+        # 未指定输出路径时写入 ./temp，不放在会被回收的临时根目录下
         if output_path is None:
+            output_dir = Path("./temp")
+            output_dir.mkdir(parents=True, exist_ok=True)
             current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
             output_path = str(output_dir / f"{video_file_path.stem}_{current_time}.mp4")
 
+        # LatentSync推理脚本会导入torch和diffusers，在首次渲染时才加载
+        from LatentSync.scripts.inference import main
+        from omegaconf import OmegaConf
+
         # Load and update config
         config = OmegaConf.load(self.config_path)
         config["run"].update({
@@ -52,15 +153,20 @@ class LatentSyncGenerator:
             seed=seed
         )
 
+        _install_audio_feature_cache()
+        _install_avatar_cache()
+        _install_step_callback()
+
         try:
             result = main(
                 config=config,
                 args=args,
             )
-            print("Processing completed successfully.")
+            logger.info("LatentSync processing completed successfully.")
+            logger.info(f"音频特征缓存统计: {audio_feature_cache.stats()}")
             return output_path
         except Exception as e:
-            print(f"Error during processing: {str(e)}")
+            logger.error(f"LatentSync error during processing: {str(e)}")
             raise
 
 
@@ -1,25 +1,107 @@
 import json
 import os
+import subprocess
 from pathlib import Path
 from threading import Thread
 from common.redis_client import RedisClient
+from common.rabbitmq_client import RabbitMQClient
 from common.logger import get_logger
-from common.message_pusher import MessagePusher
+from common.message_pusher import message_pusher
+from common.metrics import STAGE_DURATION, TASKS_TOTAL, TASKS_IN_FLIGHT
+from common.tracing import tracer
+from common.result_cache import result_cache, GENERATION_PARAMS, generation_params
+from common.scratch import scratch_space
+from common.cancellation import cancellation, TaskCancelled
+from common.progress import progress_reporter
+from common.tunables import tunables
+from .chunked_renderer import ChunkedRenderer, denoising_steps
+from .hls_packager import HlsPackager, HLS_ENABLED
 
 logger = get_logger()
 
+# 渲染档位：preview为低步数、低分辨率的草稿，用于快速检查口型时间轴
+RENDER_TIERS = ("full", "preview")
+
+
+def render_tier_params(render_tier: str) -> dict:
+    """档位的渲染参数，每个任务开始时读取，步数和预览高度可在运行时调整"""
+    if render_tier not in RENDER_TIERS:
+        raise ValueError(f"未知的渲染档位: {render_tier}")
+    params = generation_params()
+    if render_tier == "preview":
+        return {
+            "inference_steps": tunables.get("preview_inference_steps"),
+            "guidance_scale": params["guidance_scale"],
+            "max_height": tunables.get("preview_max_height"),
+        }
+    return {
+        "inference_steps": params["inference_steps"],
+        "guidance_scale": params["guidance_scale"],
+        "max_height": None,
+    }
+
+# 已结束的任务状态，重新投递的消息遇到这些状态时直接跳过
+FINAL_STATUSES = {"4", "failed", "cancelled"}
+
+# 预热配置：提供短视频和音频时以预览档位渲染一次，否则只加载推理依赖并初始化CUDA
+VIDEO_WARMUP_VIDEO = os.getenv("VIDEO_WARMUP_VIDEO", "")
+VIDEO_WARMUP_AUDIO = os.getenv("VIDEO_WARMUP_AUDIO", "")
+
 class VideoTaskHandler:
     def __init__(self):
         self.redis_client = RedisClient.get_client()
         self.output_dir = Path("uploads/out_video")
-        self.temp_dir = self.output_dir / "temp"
         self.video_dir = Path("videos")
+        self.chunk_renderer = ChunkedRenderer()
+        self.hls_packager = HlsPackager(self.output_dir / "hls")
         
         # 确保目录存在
         self.output_dir.mkdir(exist_ok=True)
-        self.temp_dir.mkdir(exist_ok=True)
         self.video_dir.mkdir(exist_ok=True)
         
+    def warm_up(self):
+        """预热LatentSync推理环境，使首个任务不承担冷启动开销
+
+        推理脚本每次调用时自行构建管线，预热主要完成依赖导入、CUDA上下文初始化，
+        并将模型权重读入页缓存。
+        """
+        import torch
+        import LatentSync.scripts.inference  # noqa: F401
+
+        if torch.cuda.is_available():
+            torch.zeros(1, device="cuda")
+        if not (VIDEO_WARMUP_VIDEO and VIDEO_WARMUP_AUDIO):
+            logger.warning("未配置VIDEO_WARMUP_VIDEO/VIDEO_WARMUP_AUDIO，跳过预热渲染")
+            return
+
+        from .latent_sync_generator import LatentSyncGenerator
+        tier_params = render_tier_params("preview")
+        with scratch_space.task_dir(f"warmup_{os.getpid()}", "video") as work_dir, \
+                STAGE_DURATION.labels(stage="lipsync_warmup").time():
+            LatentSyncGenerator().process_video(
+                video_path=VIDEO_WARMUP_VIDEO,
+                audio_path=VIDEO_WARMUP_AUDIO,
+                output_path=str(work_dir / "warmup.mp4"),
+                guidance_scale=tier_params["guidance_scale"],
+                inference_steps=tier_params["inference_steps"],
+                seed=GENERATION_PARAMS["seed"]
+            )
+        logger.info("LatentSync预热完成")
+
+    def _already_processed(self, task_id: str, render_tier: str) -> bool:
+        """消息确认前进程退出或连接断开时消息会被重新投递，已完成的档位不再重复渲染"""
+        stored = self.redis_client.get(f"task:{task_id}")
+        if not stored:
+            return False
+        try:
+            stored = json.loads(stored)
+        except (TypeError, ValueError):
+            return False
+        if stored.get("status") in FINAL_STATUSES:
+            return True
+        # 预览已生成或已排队完整渲染时，预览消息无需再处理
+        return render_tier == "preview" and (stored.get("render_tier") == "full" or bool(stored.get("preview_output_path")))
+
     def process_video_task(self, task_data: dict):
         """处理视频生成任务"""
         try:
@@ -28,9 +110,15 @@ class VideoTaskHandler:
             audio_path = task_data.get("audio_output_path")  # 使用生成的音频路径
             
             logger.info(f"开始处理视频生成任务: {task_id}")
+            # 排队期间已取消的任务直接跳过
+            cancellation.check(task_id)
+            render_tier = task_data.get("render_tier") or ("preview" if task_data.get("preview") else "full")
+            if self._already_processed(task_id, render_tier):
+                logger.info(f"视频任务已处理，跳过重新投递的消息: {task_id} ({render_tier})")
+                return
 
             # 更新任务状态为处理中
-            MessagePusher.push_message(task_id, "video_start","2")
+            message_pusher.push_message(task_id, "video_start","2")
 
             # 验证输入文件
             if not audio_path or not os.path.exists(audio_path):
@@ -38,64 +126,221 @@ class VideoTaskHandler:
             if not video_path or not os.path.exists(video_path):
                 raise Exception("视频文件不存在")
 
+            # 预览任务先渲染草稿，完整渲染随后进行或等待用户确认
+            tier_params = render_tier_params(render_tier)
+            if render_tier == "preview":
+                self._process_preview(task_data, video_path, audio_path, tier_params)
+                return
+
             # 生成输出文件路径
             output_path = self.output_dir / f"video_{task_id}.mp4"
 
             # 生成唇形同步视频
-            MessagePusher.push_message(task_id, "video_generating","3")
-            print(output_path)
-            self._generate_sync_video(
-                audio_path=audio_path,
-                video_path=video_path,
-                output_path=str(output_path)
-            )
+            message_pusher.push_message(task_id, "video_generating","3")
+            logger.debug(f"视频输出路径: {output_path}")
+            with progress_reporter.track(task_id, "video"):
+                self._generate_sync_video(
+                    audio_path=audio_path,
+                    video_path=video_path,
+                    output_path=str(output_path),
+                    task_id=task_id,
+                    guidance_scale=tier_params["guidance_scale"],
+                    inference_steps=tier_params["inference_steps"]
+                )
+            cancellation.check(task_id)
 
             # 更新任务状态为完成
             task_data["video_output_path"] = str(output_path)
             task_data["status"] = "4"
             task_data["end_time"] = "4"
             url = str(output_path).replace("uploads", "static")
-            MessagePusher.push_message(task_id, 
+            message_pusher.push_message(task_id, 
                                        f"video generate finish, path : <a>{url}</a>","4")
             
             logger.info(f'task_data:{task_data}')
             self.redis_client.set(f"task:{task_id}", json.dumps(task_data))
+
+            # MP4完成通知后再打包HLS，打包失败不影响任务结果
+            if HLS_ENABLED:
+                self._package_hls(task_data)
+            if task_data.get("result_key"):
+                result_cache.store(task_data["result_key"], task_data)
             logger.info(f"视频生成任务完成: {task_id}")
+            TASKS_TOTAL.labels(service="video", outcome="completed").inc()
+
+        except TaskCancelled:
+            self._handle_cancelled(task_data)
 
         except Exception as e:
             logger.error(f"视频生成任务失败: {str(e)}")
-            MessagePusher.push_message(task_id, "video_done" , "4")
+            TASKS_TOTAL.labels(service="video", outcome="failed").inc()
+            message_pusher.push_message(task_id, "video_done" , "4")
+
+    def _handle_cancelled(self, task_data: dict):
+        """删除已生成的部分输出并记录取消状态，分块和预览的中间文件随临时目录删除"""
+        task_id = task_data["task_id"]
+        logger.info(f"视频任务已取消: {task_id}")
+        TASKS_TOTAL.labels(service="video", outcome="cancelled").inc()
+        for path in (self.output_dir / f"video_{task_id}.mp4", self.output_dir / f"preview_{task_id}.mp4"):
+            path.unlink(missing_ok=True)
+        task_data.pop("preview_output_path", None)
+        task_data["status"] = "cancelled"
+        self.redis_client.set(f"task:{task_id}", json.dumps(task_data))
+        message_pusher.push_message(task_id, "task_cancelled", "cancelled")
 
-    def _generate_sync_video(self, audio_path: str, video_path: str, output_path: str):
-        """使用LatentSync模型生成唇形同步的视频"""
+    def _package_hls(self, task_data: dict):
+        """将完成的视频打包为多码率HLS，播放列表由API服务的 /generate/task/{id}/playlist.m3u8 提供"""
+        task_id = task_data["task_id"]
+        try:
+            master_path = self.hls_packager.package(task_id, task_data["video_output_path"])
+        except Exception as e:
+            logger.error(f"HLS打包失败: {task_id} - {str(e)}")
+            return
+        task_data["hls_master_path"] = master_path
+        self.redis_client.set(f"task:{task_id}", json.dumps(task_data))
+        message_pusher.push_message(task_id,
+                                   f"video hls ready, path : <a>/generate/task/{task_id}/playlist.m3u8</a>","hls")
+
+    def _process_preview(self, task_data: dict, video_path: str, audio_path: str, tier_params: dict):
+        """渲染预览草稿并通过SSE推送，随后按配置排队完整渲染"""
+        task_id = task_data["task_id"]
+        preview_path = self.output_dir / f"preview_{task_id}.mp4"
+
+        message_pusher.push_message(task_id, "video_preview_generating","3")
+        with scratch_space.task_dir(task_id, "preview") as work_dir, progress_reporter.track(task_id, "preview"):
+            source_video = self._downscale_video(video_path, tier_params["max_height"], work_dir)
+            self._generate_sync_video(
+                audio_path=audio_path,
+                video_path=source_video,
+                output_path=str(preview_path),
+                task_id=task_id,
+                render_key=f"{task_id}_preview",
+                guidance_scale=tier_params["guidance_scale"],
+                inference_steps=tier_params["inference_steps"]
+            )
+
+        task_data["preview_output_path"] = str(preview_path)
+        url = str(preview_path).replace("uploads", "static")
+        message_pusher.push_message(task_id,
+                                   f"video preview ready, path : <a>{url}</a>","preview")
+
+        cancellation.check(task_id)
+        if task_data.get("full_render", "auto") == "auto":
+            self.queue_full_render(task_data)
+        else:
+            task_data["awaiting_confirmation"] = True
+            self.redis_client.set(f"task:{task_id}", json.dumps(task_data))
+        logger.info(f"视频预览生成完成: {task_id}")
+
+    def queue_full_render(self, task_data: dict):
+        """将任务以完整质量重新投递到视频队列"""
+        task_data["render_tier"] = "full"
+        task_data["awaiting_confirmation"] = False
+        self.redis_client.set(f"task:{task_data['task_id']}", json.dumps(task_data))
+
+        rabbitmq_client = RabbitMQClient()
+        rabbitmq_client.publish(
+            exchange="ai_service",
+            routing_key="video_tasks",
+            message=json.dumps(task_data)
+        )
+        rabbitmq_client.close()
+
+    def _downscale_video(self, video_path: str, max_height: int, work_dir: Path) -> str:
+        """将形象视频缩放到指定高度以内，失败时使用原视频"""
+        if not max_height:
+            return video_path
+        output_path = work_dir / "preview_src.mp4"
+        command = [
+            'ffmpeg',
+            '-i', video_path,
+            '-vf', f"scale=-2:'min(ih,{max_height})'",
+            '-an',
+            '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23',
+            '-y',
+            str(output_path)
+        ]
+        try:
+            subprocess.run(command, check=True, capture_output=True)
+            return str(output_path)
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"预览视频缩放失败，使用原视频: {str(e)}")
+            return video_path
+
+    @staticmethod
+    def _faststart(video_path: str) -> None:
+        """将MP4的moov索引移到文件开头，失败时保留原文件"""
+        temp_path = f"{video_path}.faststart.mp4"
+        command = [
+            'ffmpeg',
+            '-i', video_path,
+            '-map', '0',
+            '-c', 'copy',
+            '-movflags', '+faststart',
+            '-y',
+            temp_path
+        ]
+        try:
+            with STAGE_DURATION.labels(stage="faststart").time():
+                subprocess.run(command, check=True, capture_output=True)
+            os.replace(temp_path, video_path)
+        except (subprocess.CalledProcessError, OSError) as e:
+            logger.warning(f"MP4索引前置失败，使用原文件: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _generate_sync_video(self, audio_path: str, video_path: str, output_path: str, task_id: str = None,
+                             guidance_scale: float = 1, inference_steps: int = 20, render_key: str = None):
+        """使用LatentSync模型生成唇形同步的视频，长音频切分为分块并行渲染
+
+        Args:
+            task_id: 所属任务ID，分块渲染据此检查取消
+            render_key: 分块临时目录和检查点的标识，区分同一任务的预览和完整渲染，默认为task_id
+            guidance_scale: 控制生成效果的指导尺度
+            inference_steps: 推理步数
+        """
         try:
             from .latent_sync_generator import LatentSyncGenerator
-            # 创建临时输出目录
-            temp_dir = Path("./temp")
-            temp_dir.mkdir(parents=True, exist_ok=True)
-            
+
             # 配置生成参数
-            guidance_scale = 1  # 控制生成效果的指导尺度
-            inference_steps = 20  # 推理步数
-            seed = 42  # 随机种子，保证结果可复现
+            seed = GENERATION_PARAMS["seed"]  # 随机种子，保证结果可复现
             
-            # 初始化生成器并处理视频
+            if task_id and ChunkedRenderer.should_chunk(audio_path):
+                with STAGE_DURATION.labels(stage="lipsync_inference").time():
+                    self.chunk_renderer.render(
+                        task_id=task_id,
+                        video_path=video_path,
+                        audio_path=audio_path,
+                        output_path=str(output_path),
+                        guidance_scale=guidance_scale,
+                        inference_steps=inference_steps,
+                        seed=seed,
+                        render_key=render_key
+                    )
+                logger.info(f"成功生成唇形同步视频(分块): {output_path}")
+                return
+
+            # 初始化生成器并处理视频，按去噪步上报进度
             generator = LatentSyncGenerator()
+            progress_reporter.set_total(denoising_steps(audio_path, inference_steps))
             
-            generator.process_video(
-                video_path=video_path,
-                audio_path=audio_path,
-                output_path=str(output_path),
-                guidance_scale=guidance_scale,
-                inference_steps=inference_steps,
-                seed=seed
-            )
-            print(f"video_path:{video_path}")
+            with STAGE_DURATION.labels(stage="lipsync_inference").time():
+                generator.process_video(
+                    video_path=video_path,
+                    audio_path=audio_path,
+                    output_path=str(output_path),
+                    guidance_scale=guidance_scale,
+                    inference_steps=inference_steps,
+                    seed=seed
+                )
+            self._faststart(str(output_path))
             logger.info(f"成功生成唇形同步视频: {output_path}")
             
         except ImportError as e:
             logger.error(f"LatentSync模型导入失败，请确保已安装所有依赖: {str(e)}")
             raise
+        except TaskCancelled:
+            raise
         except Exception as e:
             logger.error(f"生成同步视频失败: {str(e)}")
             raise
@@ -104,8 +349,10 @@ class VideoTaskHandler:
         """处理从消息队列接收到的视频任务"""
         try:
             task_data = json.loads(body)
-            print(task_data)
             # 在新线程中处理任务，避免阻塞消息队列
-            self.process_video_task(task_data)
+            render_tier = task_data.get("render_tier") or ("preview" if task_data.get("preview") else "full")
+            with TASKS_IN_FLIGHT.labels(service="video").track_inprogress(), \
+                    tracer.span(f"video.process.{render_tier}"), cancellation.watch(task_data.get("task_id")):
+                self.process_video_task(task_data)
         except Exception as e:
             logger.error(f"处理视频任务消息失败: {str(e)}")